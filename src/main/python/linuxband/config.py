@@ -34,6 +34,7 @@ class Config(object):
     __PREFERENCES = "Preferences"
     __MMA_PATH = "mma_path"
     __MMA_GROOVES_PATH = "mma_grooves_path"
+    __MMA_WORKER = "mma_worker"
     __CHORD_SHEET_FONT = "chord_sheet_font"
     __JACK_CONNECT_STARTUP = "jack_connect_startup"
     __TEMPLATE_FILE = "template_file"
@@ -114,6 +115,14 @@ class Config(object):
     def set_mma_grooves_path(self, path):
         self.__config.set(Config.__PREFERENCES, Config.__MMA_GROOVES_PATH, path)
 
+    def get_mma_worker(self):
+        if not self.__config.has_option(Config.__PREFERENCES, Config.__MMA_WORKER):
+            return False
+        return self.__config.getboolean(Config.__PREFERENCES, Config.__MMA_WORKER)
+
+    def set_mma_worker(self, value):
+        self.__config.set(Config.__PREFERENCES, Config.__MMA_WORKER, str(value))
+
     def get_jack_connect_startup(self):
         return self.__config.getboolean(Config.__PREFERENCES, Config.__JACK_CONNECT_STARTUP)
 
@@ -44,7 +44,7 @@ class AboutDialog(object):
         dialog.set_license(license_text)
         Common.connect_signals(glade, self)
 
-    def help_about_callback(self, menuitem):
+    def present(self):
         self.__about_dialog.present()
 
     def about_dialog_response_callback(self, dialog, response):
@@ -22,8 +22,10 @@ import gtk
 
 from gtk.gdk import CONTROL_MASK
 
+from linuxband.gui.chord_names_model import ChordNamesModel
 from linuxband.gui.common import Common
-from linuxband.mma.chord_table import chordlist
+from linuxband.mma.chord_names import ChordNames
+from linuxband.mma.chord_parser import ChordParser
 
 
 class ChordEntries(object):
@@ -31,7 +33,7 @@ class ChordEntries(object):
     def __init__(self, glade, song, chord_sheet):
         self.__song = song
         self.__completion_match = False
-        self.__init_gui(glade, self.__get_chord_names())
+        self.__init_gui(glade)
         self.__chord_sheet = chord_sheet
 
     def refresh(self):
@@ -121,7 +123,7 @@ class ChordEntries(object):
         entry = self.__find_focused_entry()
         entry.select_region(0, -1)
 
-    def __init_gui(self, glade, chord_names):
+    def __init_gui(self, glade):
         Common.connect_signals(glade, self)
         self.__hbox6 = glade.get_widget("hbox6")
         self.__entries = [ glade.get_widget("entry1"),
@@ -132,13 +134,14 @@ class ChordEntries(object):
                          glade.get_widget("entry6"),
                          glade.get_widget("entry7"),
                          glade.get_widget("entry8") ]
+        # invalid chords are shown in red
+        self.__text_color = self.__entries[0].get_style().text[gtk.STATE_NORMAL]
+        self.__error_color = gtk.gdk.color_parse('red')
         # Initialize chord entry completion
-        model = gtk.ListStore(str)
-        for chord in chord_names:
-            model.append([chord])
         for entry in self.__entries:
+            # must run before the completion's own handler, which filters the model
+            entry.connect("changed", self.__on_entry_changed)
             completion = gtk.EntryCompletion()
-            completion.set_model(model)
             completion.set_text_column(0)
             completion.set_match_func(self.__match_function)
             completion.connect("match-selected", self.__on_completion_match)
@@ -153,32 +156,21 @@ class ChordEntries(object):
         focus_chain.append(self.__entries[0])
         self.__hbox6.set_focus_chain(focus_chain)
 
-    def __get_chord_names(self):
-        """
-        Generate a list with all possible chords.
-        
-        It is used for entry completion
-        """
-        base = ['C', 'D', 'E', 'F', 'G', 'A', 'B']
-        base_ext = []
-        for c in base:
-            base_ext.append(c)
-            base_ext.append(c + '#')
-            base_ext.append(c + 'b')
-
-        chord_names = []
-        for c in base_ext:
-            for k in chordlist.iterkeys():
-                chord_names.append(c + k)
-
-        chord_names.sort()
-        return chord_names
+    def __on_entry_changed(self, entry):
+        """ Give the completion only the chord names beginning with the entry text, check the chord. """
+        text = entry.get_text()
+        start, end = ChordNames.find_prefix(text)
+        entry.get_completion().set_model(ChordNamesModel(ChordNames.get_names(), start, end))
+        error = text and ChordParser.get_error(text)
+        if error:
+            entry.modify_text(gtk.STATE_NORMAL, self.__error_color)
+        else:
+            entry.modify_text(gtk.STATE_NORMAL, self.__text_color)
+        entry.set_tooltip_text(error or None)
 
     def __match_function(self, completion, key, it):
-        # key is case-insensitive
-        model = completion.get_model()
-        key = completion.get_entry().get_text()
-        return model[it][0].startswith(key)
+        # the model contains the matching chords only
+        return True
 
     def __on_completion_match(self, completion, model, it):
         self.__completion_match = True
@@ -17,15 +17,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import copy
 import logging
 
+import gobject
 import gtk
 import pango
 
 from gtk.gdk import CONTROL_MASK, SHIFT_MASK, BUTTON1_MASK
 
 from linuxband.gui.common import Common
+from linuxband.lru_cache import LruCache
 from linuxband.mma.bar_chords import BarChords
 from linuxband.mma.bar_info import BarInfo
 
@@ -36,13 +37,21 @@ class ChordSheet(object):
     __cell_padding = 2
     __max_bar_chords_font = 40
     __bars_per_line = 4
+    __bar_number_font = 'Monospace Bold 8'
+    # number of shaped text layouts kept
+    __layout_cache_size = 512
+    # the sheet is rendered in tiles of whole rows, only the tiles around the visible area are kept
+    __tile_rows = 8
+    __max_tiles = 8
 
     __color_no_song = "honeydew3"
-    __color_playhead = "black"
     __color_selection = "SteelBlue"
     __color_cursor = "yellow"
     __color_events = "grey73"
     __color_song = "honeydew2"
+    __color_text = "black"
+    __color_playhead = "black"
+    __color_playhead_text = "white"
 
     def __init__(self, glade, song, gui, config):
         self.__song = song
@@ -54,34 +63,72 @@ class ChordSheet(object):
         self.__clipboard = []
         self.__gui = gui
         self.__config = config
+        # fields waiting to be rendered, field number -> chords shown instead of the song chords
+        self.__damaged = {}
+        self.__flush_pending = False
+        # tile number -> backing pixmap
+        self.__tiles = LruCache(ChordSheet.__max_tiles)
+        # graphics contexts by role, created when realized
+        self.__gcs = {}
+        # (text, font, width, height) -> (layout, y offset)
+        self.__chord_layouts = LruCache(ChordSheet.__layout_cache_size)
+        # bar number -> (layout, y offset)
+        self.__number_layouts = LruCache(ChordSheet.__layout_cache_size)
         self.__init_gui(glade)
 
     def drawing_area_realize_event_callback(self, widget):
         self.drawable = self.__area.window
         self.gc = self.drawable.new_gc()
-        # Create a new backing pixmap of the appropriate size
-        self.pixmap = gtk.gdk.Pixmap(self.drawable, self.__drawing_area_width, self.__drawing_area_height, depth=-1)
-        gc = self.drawable.new_gc()
-        gc.copy(self.gc)
-        green = self.__colormap.alloc_color(ChordSheet.__color_no_song, True, True)
-        gc.set_foreground(green)
-        self.pixmap.draw_rectangle(gc, True, 0, 0, self.__drawing_area_width, self.__drawing_area_height)
+        # allocate the colors once, the fields are rendered with these
+        roles = { 'no_song': ChordSheet.__color_no_song,
+                  'selection': ChordSheet.__color_selection,
+                  'cursor': ChordSheet.__color_cursor,
+                  'events': ChordSheet.__color_events,
+                  'song': ChordSheet.__color_song,
+                  'text': ChordSheet.__color_text,
+                  'playhead': ChordSheet.__color_playhead,
+                  'playhead_text': ChordSheet.__color_playhead_text }
+        for role, color_code in roles.iteritems():
+            gc = self.drawable.new_gc()
+            gc.copy(self.gc)
+            gc.set_foreground(self.__colormap.alloc_color(color_code))
+            self.__gcs[role] = gc
+        if self.__damaged: self.__schedule_flush()
         return True
 
     def drawing_area_expose_event_callback(self, widget, event):
-        """ Redraw the screen from the backing pixmap. """
+        """
+        Redraw the screen from the backing tiles, the missing tiles are rendered first.
+        The playhead is drawn over the tiles.
+        """
         x, y, width, height = event.area
-        widget.window.draw_drawable(widget.get_style().fg_gc[gtk.STATE_NORMAL],
-        self.pixmap, x, y, x, y, width, height)
+        tile_height = ChordSheet.__tile_rows * ChordSheet.__bar_height
+        first = max(0, y / tile_height)
+        last = (y + height - 1) / tile_height
+        gc = widget.get_style().fg_gc[gtk.STATE_NORMAL]
+        for tile_num in range(first, last + 1):
+            tile_y = tile_num * tile_height
+            top = max(y, tile_y)
+            bottom = min(y + height, tile_y + tile_height)
+            widget.window.draw_drawable(gc, self.__get_tile(tile_num), x, top - tile_y, x, top, width, bottom - top)
+        if self.__playhead_pos > -1:
+            self.__draw_playhead(widget.window, event.area)
+        # render the neighbouring tiles in advance, scrolling will need them
+        margin = [tile_num for tile_num in [first - 1, last + 1]
+                  if 0 <= tile_num <= self.__get_tile_num(self.__end_position) and tile_num not in self.__tiles]
+        if margin:
+            gobject.idle_add(self.__prefetch_tiles, margin)
         return True
 
     def move_playhead_to(self, pos):
+        """ The playhead is not rendered into the tiles, only the two fields are redrawn. """
         new_pos = pos * 2 + 1 if pos > -1 else -1
         old_pos = self.__playhead_pos
         if old_pos != new_pos:
             self.__playhead_pos = new_pos
-            self.__render_field(old_pos)
-            self.__render_field(new_pos)
+            for field_num in [old_pos, new_pos]:
+                if field_num > -1:
+                    self.__area.queue_draw_area(*self.__get_field_rect(field_num))
 
     def drawing_area_keypress_event_callback(self, widget, event):
         key = event.keyval
@@ -144,9 +191,9 @@ class ChordSheet(object):
         for field_num in sorted(sel):
             bar_num = field_num / 2
             if self.__is_bar_chords(field_num):
-                self.__clipboard.append(copy.deepcopy(self.__song.get_data().get_bar_chords(bar_num)))
+                self.__clipboard.append(self.__song.get_data().get_bar_chords(bar_num).copy())
             else:
-                self.__clipboard.append(copy.deepcopy(self.__song.get_data().get_bar_info(bar_num)))
+                self.__clipboard.append(self.__song.get_data().get_bar_info(bar_num).copy())
 
     def paste_selection(self):
         """ Paste fields from the clipboard. """
@@ -250,6 +297,7 @@ class ChordSheet(object):
             fields_to_render = range(new_end, self.__end_position + 1)
             for field in fields_to_render: self.__render_field(field)
         self.__end_position = new_end
+        self.__update_size()
 
         if new_end == 0:
             self.__cursor_pos = 0
@@ -261,10 +309,12 @@ class ChordSheet(object):
 
     def set_song_bar_count(self, bar_count):
         new_end = bar_count * 2
-        maxlast = max(self.__end_position, new_end)
-        fields_to_render = range(0, maxlast + 1)
-        for field in fields_to_render: self.__render_field(field)
+        # render everything again, starting with the visible tiles
+        self.__tiles.clear()
+        self.__damaged = {}
+        self.__area.queue_draw()
         self.__end_position = new_end
+        self.__update_size()
 
         if new_end == 0:
             self.__cursor_pos = 0
@@ -299,69 +349,86 @@ class ChordSheet(object):
         Common.connect_signals(glade, self)
         self.__area = glade.get_widget("drawingarea1")
         self.__colormap = self.__area.get_colormap()
-        self.__drawing_area_width, self.__drawing_area_height = self.__area.get_size_request()
+        # the area grows with the song but is never smaller than designed
+        self.__drawing_area_width, self.__min_height = self.__area.get_size_request()
         self.__bar_width = self.__drawing_area_width / self.__song.get_data().get_beats_per_bar()
         self.__bar_chords_width = self.__bar_width * 9 / 10
         self.__bar_info_width = self.__bar_width - self.__bar_chords_width
         self.__area.show()
 
-    def __render_chord_xy(self, chord, x, y, width, height, playhead):
+    def __draw_playhead(self, drawable, area):
+        """ The playhead field is black with white chords whatever is underneath, GTK clips it to the exposed area. """
+        bar_num = self.__playhead_pos / 2
+        if bar_num >= self.__song.get_data().get_bar_count():
+            return
+        rect = self.__get_field_rect(self.__playhead_pos)
+        playhead = rect.intersect(area)
+        if playhead.width <= 0 or playhead.height <= 0:
+            return
+        drawable.draw_rectangle(self.__gcs['playhead'], True, *rect)
+        chords = self.__song.get_data().get_bar_chords(bar_num).get_chords()
+        if chords:
+            self.__render_chords_text(drawable, chords, rect.x, rect.y, self.__gcs['playhead_text'])
+
+    def __render_chord_xy(self, pixmap, chord, x, y, width, height, gc):
         """ Render one chord on position x,y. """
-        if playhead: color = self.__colormap.alloc_color('white')
-        else: color = self.__colormap.alloc_color('black')
-        gc = self.pixmap.new_gc()
-        gc.copy(self.gc)
-        # gc.set_line_attributes(1, gtk.gdk.LINE_SOLID, gtk.gdk.CAP_ROUND, gtk.gdk.JOIN_ROUND)
-        gc.set_foreground(color)
-        # self.pixmap.draw_rectangle(gc, False, x , y, width, height)
-
-        pango_layout = self.__area.create_pango_layout("")
-        pango_layout.set_text(chord)
-        fd = pango.FontDescription(self.__config.get_chord_sheet_font())
-
-        size = (ChordSheet.__max_bar_chords_font + 1) * pango.SCALE
-        while True:
-            size = size - pango.SCALE
-            fd.set_size(size)
+        pango_layout, offset = self.__get_chord_layout(chord, width, height)
+        pixmap.draw_layout(gc, x, y + offset, pango_layout)
+
+    def __get_chord_layout(self, chord, width, height):
+        """ Returns the layout of the chord with the biggest font fitting into the cell. """
+        font = self.__config.get_chord_sheet_font()
+        key = (chord, font, width, height)
+        res = self.__chord_layouts.get(key)
+        if res is None:
+            pango_layout = self.__area.create_pango_layout("")
+            pango_layout.set_text(chord)
+            fd = pango.FontDescription(font)
+
+            size = (ChordSheet.__max_bar_chords_font + 1) * pango.SCALE
+            while True:
+                size = size - pango.SCALE
+                fd.set_size(size)
+                pango_layout.set_font_description(fd)
+                text_width, text_height = pango_layout.get_pixel_size()
+                if text_width <= width and text_height <= height:
+                    break
+
+            ink, logical = pango_layout.get_pixel_extents() #@UnusedVariable
+            res = (pango_layout, height - ink[1] - ink[3])
+            self.__chord_layouts.put(key, res)
+        return res
+
+    def __get_bar_number_layout(self, chord_num):
+        res = self.__number_layouts.get(chord_num)
+        if res is None:
+            pango_layout = self.__area.create_pango_layout("")
+            pango_layout.set_text(str(chord_num))
+            fd = pango.FontDescription(ChordSheet.__bar_number_font)
             pango_layout.set_font_description(fd)
-            text_width, text_height = pango_layout.get_pixel_size()
-            if text_width <= width and text_height <= height:
-                break
-
-        ink, logical = pango_layout.get_pixel_extents() #@UnusedVariable
-        self.pixmap.draw_layout(gc, x, y + (height - ink[1] - ink[3]), pango_layout)
+            ink, logical = pango_layout.get_pixel_extents() #@UnusedVariable
+            res = (pango_layout, ChordSheet.__bar_height - ink[1] - ink[3] - ChordSheet.__cell_padding)
+            self.__number_layouts.put(chord_num, res)
+        return res
 
-    def __render_chords_xy(self, bar_num, chords, bar_x, bar_y, playhead, cursor, selection):
+    def __render_chords_xy(self, pixmap, bar_num, chords, bar_x, bar_y, cursor, selection):
         if bar_num >= self.__song.get_data().get_bar_count():
-            color_code = ChordSheet.__color_no_song
-        elif playhead:
-            color_code = ChordSheet.__color_playhead
+            role = 'no_song'
         elif selection:
-            color_code = ChordSheet.__color_selection
+            role = 'selection'
         elif cursor:
-            color_code = ChordSheet.__color_cursor
+            role = 'cursor'
         else:
-            color_code = ChordSheet.__color_song
+            role = 'song'
 
-        color = self.__colormap.alloc_color(color_code)
-        gc = self.pixmap.new_gc()
-        gc.copy(self.gc)
-        gc.set_foreground(color)
-        self.pixmap.draw_rectangle(gc, True, bar_x , bar_y, self.__bar_chords_width, ChordSheet.__bar_height)
+        pixmap.draw_rectangle(self.__gcs[role], True, bar_x , bar_y, self.__bar_chords_width, ChordSheet.__bar_height)
         if cursor: # black border
-            color = self.__colormap.alloc_color("black")
-            gc.set_foreground(color)
-            self.pixmap.draw_rectangle(gc, False, bar_x , bar_y, self.__bar_chords_width - 1, ChordSheet.__bar_height - 1)
-
-        if not chords:
-            return
+            pixmap.draw_rectangle(self.__gcs['text'], False, bar_x , bar_y, self.__bar_chords_width - 1, ChordSheet.__bar_height - 1)
 
-        if playhead:
-            color = self.__colormap.alloc_color("white")
-        else:
-            color = self.__colormap.alloc_color("black")
-        gc.set_foreground(color)
+        if chords:
+            self.__render_chords_text(pixmap, chords, bar_x, bar_y, self.__gcs['text'])
 
+    def __render_chords_text(self, pixmap, chords, bar_x, bar_y, gc):
         bar_chords_width = self.__bar_chords_width - (self.__song.get_data().get_beats_per_bar()) * ChordSheet.__cell_padding
         bar_chords_height = ChordSheet.__bar_height - 2 * ChordSheet.__cell_padding
         chord_width = bar_chords_width / self.__song.get_data().get_beats_per_bar()
@@ -375,76 +442,61 @@ class ChordSheet(object):
                 and i + 1 < self.__song.get_data().get_beats_per_bar() \
                 and (i + 1 >= len(chords) or chords[i + 1][0] == '/' or chords[i + 1][0] == ''):
                 # the next beat has no chord we can expand us
-                self.__render_chord_xy(chords[i][0],
+                self.__render_chord_xy(pixmap, chords[i][0],
                                 bar_x + (chord_width + ChordSheet.__cell_padding) * i,
                                 bar_y + ChordSheet.__cell_padding,
                                 chord_width + ChordSheet.__cell_padding + chord_width,
-                                bar_chords_height,
-                                playhead)
+                                bar_chords_height, gc)
             else:
-                self.__render_chord_xy(chords[i][0],
+                self.__render_chord_xy(pixmap, chords[i][0],
                                 bar_x + (chord_width + ChordSheet.__cell_padding) * i,
                                 bar_y + ChordSheet.__cell_padding,
                                 chord_width,
-                                bar_chords_height,
-                                playhead)
+                                bar_chords_height, gc)
             i = i + 1
 
-    def __draw_repetition(self, x, y, gc, end):
+    def __draw_repetition(self, pixmap, x, y, gc, end):
         # draw line
         middle_x = x + self.__bar_info_width / 2
         start_y = y + ChordSheet.__cell_padding
         width = ChordSheet.__cell_padding
         height = ChordSheet.__bar_height - 2 * ChordSheet.__cell_padding
-        self.pixmap.draw_rectangle(gc, True, middle_x, start_y, width, height)
+        pixmap.draw_rectangle(gc, True, middle_x, start_y, width, height)
         # draw points
         point_size = ChordSheet.__cell_padding * 2
         upper_y = y + ChordSheet.__bar_height / 4
         lower_y = y + ChordSheet.__bar_height * 3 / 4 - point_size
         if end: x = x + self.__bar_info_width / 5
         else: x = x + self.__bar_info_width * 4 / 5 - point_size
-        self.pixmap.draw_arc(self.gc, True, x, upper_y, point_size, point_size, 0, 360 * 64)
-        self.pixmap.draw_arc(self.gc, True, x, lower_y, point_size, point_size, 0, 360 * 64)
+        pixmap.draw_arc(gc, True, x, upper_y, point_size, point_size, 0, 360 * 64)
+        pixmap.draw_arc(gc, True, x, lower_y, point_size, point_size, 0, 360 * 64)
 
-    def __render_bar_info_xy(self, bar_num, chord_num, bar_info, x, y, cursor, selection):
+    def __render_bar_info_xy(self, pixmap, bar_num, chord_num, bar_info, x, y, cursor, selection):
         if bar_num > self.__song.get_data().get_bar_count():
-            color_code = ChordSheet.__color_no_song
+            role = 'no_song'
         elif selection:
-            color_code = ChordSheet.__color_selection
+            role = 'selection'
         elif cursor:
-            color_code = ChordSheet.__color_cursor
+            role = 'cursor'
         elif bar_info.has_events():
-            color_code = ChordSheet.__color_events
+            role = 'events'
         else:
-            color_code = ChordSheet.__color_song
-
-        color = self.__colormap.alloc_color(color_code)
+            role = 'song'
 
-        gc = self.drawable.new_gc()
-        gc.copy(self.gc)
-        gc.set_foreground(color)
-        self.pixmap.draw_rectangle(gc, True, x, y, self.__bar_info_width, ChordSheet.__bar_height)
+        pixmap.draw_rectangle(self.__gcs[role], True, x, y, self.__bar_info_width, ChordSheet.__bar_height)
+        gc = self.__gcs['text']
         if cursor:  # black border
-            color = self.__colormap.alloc_color('black')
-            gc.set_foreground(color)
-            self.pixmap.draw_rectangle(gc, False, x, y, self.__bar_info_width - 1, ChordSheet.__bar_height - 1)
+            pixmap.draw_rectangle(gc, False, x, y, self.__bar_info_width - 1, ChordSheet.__bar_height - 1)
 
-        color = self.__colormap.alloc_color('black')
-        gc.set_foreground(color)
         repeat_begin = bar_info.has_repeat_begin() if bar_info else False
         repeat_end = bar_info.has_repeat_end() if bar_info else False
         if repeat_begin or repeat_end: # draw repetitions
-            if repeat_begin: self.__draw_repetition(x, y, gc, False)
-            if repeat_end: self.__draw_repetition(x, y, gc, True)
+            if repeat_begin: self.__draw_repetition(pixmap, x, y, gc, False)
+            if repeat_end: self.__draw_repetition(pixmap, x, y, gc, True)
         else:
             if bar_num < self.__song.get_data().get_bar_count() and chord_num:  # draw bar number
-                pango_layout = self.__area.create_pango_layout("")
-                pango_layout.set_text(str(chord_num))
-                fd = pango.FontDescription('Monospace Bold 8')
-                pango_layout.set_font_description(fd)
-                ink, logical = pango_layout.get_pixel_extents() #@UnusedVariable
-                self.pixmap.draw_layout(gc, x + ChordSheet.__cell_padding,
-                                    y + (ChordSheet.__bar_height - ink[1] - ink[3]) - ChordSheet.__cell_padding, pango_layout)
+                pango_layout, offset = self.__get_bar_number_layout(chord_num)
+                pixmap.draw_layout(gc, x + ChordSheet.__cell_padding, y + offset, pango_layout)
 
     def __get_pos_x(self, pos):
         return (pos / 2 % ChordSheet.__bars_per_line) * self.__bar_width \
@@ -460,20 +512,88 @@ class ChordSheet(object):
         return field_num % 2 == 1
 
     def __render_field(self, field_num, chords=None):
+        """
+        Marks the field as damaged. The damaged fields are rendered together before
+        the next redraw and the area they cover is invalidated at once.
+        """
+        if field_num < 0: return
+        self.__damaged[field_num] = chords
+        self.__schedule_flush()
+
+    def __schedule_flush(self):
+        # runs before gtk redraws the widgets
+        if not self.__flush_pending:
+            self.__flush_pending = True
+            gobject.idle_add(self.__flush_damage, priority=gobject.PRIORITY_HIGH_IDLE)
+
+    def __flush_damage(self):
+        self.__flush_pending = False
+        if not self.__gcs:  # not realized yet, will be flushed later
+            return False
+        damaged = self.__damaged
+        self.__damaged = {}
+        region = gtk.gdk.Region()
+        for field_num, chords in damaged.iteritems():
+            # fields outside of the rendered tiles are rendered with their tile
+            tile_num = self.__get_tile_num(field_num)
+            tile = self.__tiles.get(tile_num)
+            if tile is not None:
+                self.__draw_field(tile, tile_num, field_num, chords)
+            region.union_with_rect(self.__get_field_rect(field_num))
+        self.__area.window.invalidate_region(region, False)
+        return False
+
+    def __update_size(self):
+        """ Resize the area to fit the song and an empty row below it. """
+        rows = self.__end_position / 2 / ChordSheet.__bars_per_line + 2
+        height = max(self.__min_height, rows * ChordSheet.__bar_height)
+        if height != self.__area.get_size_request()[1]:
+            self.__area.set_size_request(self.__drawing_area_width, height)
+
+    def __get_tile_num(self, field_num):
+        return field_num / 2 / ChordSheet.__bars_per_line / ChordSheet.__tile_rows
+
+    def __get_tile(self, tile_num):
+        """ Returns the tile, renders it if it is not kept. """
+        tile = self.__tiles.get(tile_num)
+        if tile is None:
+            width = self.__drawing_area_width
+            height = ChordSheet.__tile_rows * ChordSheet.__bar_height
+            tile = gtk.gdk.Pixmap(self.drawable, width, height, depth=-1)
+            tile.draw_rectangle(self.__gcs['no_song'], True, 0, 0, width, height)
+            fields_per_tile = ChordSheet.__tile_rows * ChordSheet.__bars_per_line * 2
+            first = tile_num * fields_per_tile
+            for field_num in range(first, min(first + fields_per_tile, self.__end_position + 1)):
+                self.__draw_field(tile, tile_num, field_num, None)
+            self.__tiles.put(tile_num, tile)
+        return tile
+
+    def __prefetch_tiles(self, tile_nums):
+        for tile_num in tile_nums:
+            self.__get_tile(tile_num)
+        return False
+
+    def __get_field_rect(self, field_num):
+        if self.__is_bar_chords(field_num):
+            width = self.__bar_chords_width
+        else:
+            width = self.__bar_info_width
+        return gtk.gdk.Rectangle(self.__get_pos_x(field_num), self.__get_pos_y(field_num), width, ChordSheet.__bar_height)
+
+    def __draw_field(self, tile, tile_num, field_num, chords):
+        """ Renders the field into its tile. """
         cursor = self.__cursor_pos == field_num
-        playhead = self.__playhead_pos == field_num
         selection = field_num in self.__selection
 
         field_x = self.__get_pos_x(field_num)
-        field_y = self.__get_pos_y(field_num)
+        field_y = self.__get_pos_y(field_num) - tile_num * ChordSheet.__tile_rows * ChordSheet.__bar_height
         bar_num = field_num / 2
 
         if self.__is_bar_chords(field_num):
             if chords is None and bar_num < self.__song.get_data().get_bar_count():
                 chords = self.__song.get_data().get_bar_chords(bar_num).get_chords()
 
-            self.__render_chords_xy(bar_num, chords, field_x, field_y, playhead, cursor, selection)
-            self.__area.queue_draw_area(field_x, field_y, self.__bar_chords_width, ChordSheet.__bar_height)
+            self.__render_chords_xy(tile, bar_num, chords, field_x, field_y, cursor, selection)
         else:
             bar_info = None
             if bar_num <= self.__song.get_data().get_bar_count():
@@ -483,8 +603,7 @@ class ChordSheet(object):
             if bar_num < self.__song.get_data().get_bar_count():
                 chord_num = self.__song.get_data().get_bar_chords(bar_num).get_number()
 
-            self.__render_bar_info_xy(bar_num, chord_num, bar_info, field_x, field_y, cursor, selection)
-            self.__area.queue_draw_area(field_x, field_y, self.__bar_info_width, ChordSheet.__bar_height)
+            self.__render_bar_info_xy(tile, bar_num, chord_num, bar_info, field_x, field_y, cursor, selection)
 
     def __refresh_entries_and_events(self):
         self.__gui.refresh_bar(self.is_cursor_on_bar_chords())
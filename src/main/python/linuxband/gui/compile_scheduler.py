@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import logging
+import threading
+
+import gobject
+
+
+class CompileScheduler(object):
+    """
+    Compiles the song in a background thread so that the GUI is not blocked by MMA.
+
+    Only one compilation runs at a time. A new request replaces the request waiting
+    for its turn, the callback of the replaced request is never called. If the song
+    changes during the compilation the MMA process is terminated and the request is
+    compiled again with the changed song. The callbacks are called from the gobject
+    main loop with the finished CompileJob as the argument.
+    """
+
+    # how often check whether the song changed during the compilation (ms)
+    __POLL_INTERVAL = 100
+
+    def __init__(self, song, midi_generator):
+        self.__song = song
+        self.__midi_generator = midi_generator
+        self.__waiting = None
+        self.__running = None
+
+    def compile(self, callback, generate_midi=False, bars=None):
+        """ Request the compilation, see Song.create_compile_job for the arguments. """
+        self.__waiting = (callback, generate_midi, bars)
+        if self.__running is None:
+            self.__start_next()
+
+    def cancel(self):
+        """ Forget the waiting request and terminate the running one. """
+        self.__waiting = None
+        if self.__running is not None:
+            self.__running[0] = None
+            self.__running[3].cancel()
+            self.__midi_generator.cancel()
+
+    def is_busy(self):
+        return self.__running is not None
+
+    def __start_next(self):
+        callback, generate_midi, bars = self.__waiting
+        self.__waiting = None
+        job = self.__song.create_compile_job(generate_midi, bars)
+        # the callback is set to None when the request is cancelled
+        self.__running = [callback, generate_midi, bars, job]
+        thread = threading.Thread(target=self.__run_job, args=(job,))
+        thread.setDaemon(True)
+        thread.start()
+        gobject.timeout_add(CompileScheduler.__POLL_INTERVAL, self.__check_song_changed, job)
+
+    def __run_job(self, job):
+        """ Runs in the background thread. """
+        try:
+            job.run(self.__midi_generator)
+        except:
+            logging.exception("Compilation of the song failed")
+        gobject.idle_add(self.__job_finished, job)
+
+    def __check_song_changed(self, job):
+        if self.__running is None or self.__running[3] is not job:
+            return False
+        if job.get_revision() != self.__song.get_revision():
+            logging.debug('Song changed, cancelling the compilation')
+            job.cancel()
+            self.__midi_generator.cancel()
+            return False
+        return True
+
+    def __job_finished(self, job):
+        callback, generate_midi, bars = self.__running[:3]
+        self.__running = None
+        # the result of a cancelled job is not reliable, MMA may have been terminated
+        # or not run at all if the job was cancelled before it started
+        if callback:
+            if job.get_result() is not None and self.__song.finish_compile_job(job):
+                callback(job)
+            elif self.__waiting is None and job.get_revision() != self.__song.get_revision():
+                # the song changed during the compilation, compile it again
+                self.__waiting = (callback, generate_midi, bars)
+        if self.__waiting is not None:
+            self.__start_next()
+        return False
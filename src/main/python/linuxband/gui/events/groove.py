@@ -29,31 +29,47 @@ from linuxband.mma.bar_info import BarInfo
 class EventGroove(object):
 
     __GROOVE_UNDEFINED = "Select groove"
+    __PULSE_INTERVAL = 100
 
     def __init__(self, glade, grooves):
         self.__toggled_button = None
         self.__curr_event = None
         self.__new_event = None
         self.__grooves = grooves
-        self.__init_gui(glade)
+        # the groove window is built when it is opened for the first time
+        self.__glade = glade
 
     def on_treeview1_cursor_changed_callback(self, treeview):
         """ User clicked on the groove in the first column. """
         path = treeview.get_cursor()[0]
         gr = self.__groovesModel[path[0]]
-        self.__treeview2.set_model(gr[6])
+        if self.__searching:
+            self.__treeview2.set_model(None)
+        else:
+            self.__treeview2.set_model(self.__grooves.get_variations_model(path[0]))
         self.__update_groove_info(gr)
         self.__update_groove_event(gr[0])
 
     def on_treeview2_cursor_changed_callback(self, treeview):
         """ User clicked on the variation of groove. """
         path = self.__treeview1.get_cursor()[0]
-        model = self.__groovesModel[path[0]][6]
+        model = self.__grooves.get_variations_model(path[0])
         path = self.__treeview2.get_cursor()[0]
         gr = model[path[0]]
         self.__update_groove_info(gr)
         self.__update_groove_event(gr[0])
 
+    def on_entry10_changed_callback(self, entry):
+        """ User typed into the groove search box. """
+        text = entry.get_text()
+        self.__searching = bool(text.strip())
+        if self.__searching:
+            self.__groovesModel = self.__grooves.search(text)
+        else:
+            self.__groovesModel = self.__grooves.get_grooves_model()
+        self.__treeview1.set_model(self.__groovesModel)
+        self.__treeview2.set_model(None)
+
     def set_label_from_event(self, button, event):
         """ Sets the label of groove button correctly
             even if the event in the self.__song.get_data().get_bar_info(0) is missing. """
@@ -64,6 +80,9 @@ class EventGroove(object):
         return self.__new_event
 
     def init_window(self, button, event):
+        if self.__glade:
+            self.__init_gui(self.__glade)
+            self.__glade = None
         # hide back, forward, remove buttons
         if button is self.__togglebutton1: self.__alignment12.hide()
         else: self.__alignment12.show()
@@ -73,8 +92,34 @@ class EventGroove(object):
         # if the focus stayed on the button, put it to first column
         if not self.__treeview1.is_focus() and not self.__treeview2.is_focus():
             gobject.idle_add(self.__treeview1.grab_focus)
+        self.__entry10.set_text('')
+        self.__searching = False
+        if self.__grooves.is_ready():
+            self.__show_grooves()
+        elif not self.__waiting:
+            # grooves are still being loaded in the background
+            self.__waiting = True
+            self.__treeview1.set_model(None)
+            self.__treeview2.set_model(None)
+            self.__entry10.set_sensitive(False)
+            self.__progressbar1.show()
+            gobject.timeout_add(EventGroove.__PULSE_INTERVAL, self.__wait_for_grooves)
+
+    def __show_grooves(self):
+        # the grooves may have been reloaded, don't keep the models of the old ones
         self.__groovesModel = self.__grooves.get_grooves_model()
         self.__treeview1.set_model(self.__groovesModel)
+        self.__treeview2.set_model(None)
+
+    def __wait_for_grooves(self):
+        if not self.__grooves.is_ready():
+            self.__progressbar1.pulse()
+            return True
+        self.__waiting = False
+        self.__progressbar1.hide()
+        self.__entry10.set_sensitive(True)
+        self.__show_grooves()
+        return False
 
     def __init_gui(self, glade):
         Common.connect_signals(glade, self)
@@ -94,22 +139,31 @@ class EventGroove(object):
         self.__textbuffer2.create_tag('fg_black', foreground_gdk=color)
         self.__textbuffer2.create_tag("bold", weight=pango.WEIGHT_BOLD)
         self.__togglebutton1 = glade.get_widget("togglebutton1")
+        # groove search
+        self.__entry10 = glade.get_widget("entry10")
+        self.__searching = False
+        # shown while the grooves are being loaded
+        self.__progressbar1 = glade.get_widget("progressbar1")
+        self.__waiting = False
         # groove columns
         self.__treeview1 = glade.get_widget("treeview1")
         self.__treeview2 = glade.get_widget("treeview2")
         # grooves column
-        tvcolumn = gtk.TreeViewColumn('Groove')
-        self.__treeview1.append_column(tvcolumn)
-        cell = gtk.CellRendererText()
-        tvcolumn.pack_start(cell, True)
-        tvcolumn.set_attributes(cell, text=0)
+        self.__append_column(self.__treeview1, 'Groove')
         # groove variation column
         self.__treeview2.set_model(None)
-        tvcolumn = gtk.TreeViewColumn('Variation')
-        self.__treeview2.append_column(tvcolumn)
+        self.__append_column(self.__treeview2, 'Variation')
+
+    def __append_column(self, treeview, title):
+        """ All rows have the same height, the tree view reads only the visible ones. """
+        tvcolumn = gtk.TreeViewColumn(title)
+        tvcolumn.set_sizing(gtk.TREE_VIEW_COLUMN_FIXED)
+        tvcolumn.set_expand(True)
+        treeview.append_column(tvcolumn)
         cell = gtk.CellRendererText()
         tvcolumn.pack_start(cell, True)
         tvcolumn.set_attributes(cell, text=0)
+        treeview.set_fixed_height_mode(True)
 
     def __update_groove_info(self, gr):
         """ Update description, author ... of the currently selected groove. """
@@ -29,7 +29,8 @@ class EventRepeatEnd(object):
     def __init__(self, glade):
         self.__toggled_button = None
         self.__curr_event = None
-        self.__init_gui(glade)
+        # the RepeatEnd window is built when it is opened for the first time
+        self.__glade = glade
 
     def on_comboboxentry1_changed_callback(self, widget):
         """ RepeatEnd value changed. """
@@ -56,6 +57,9 @@ class EventRepeatEnd(object):
         return self.__newEvent
 
     def init_window(self, button, event):
+        if self.__glade:
+            self.__init_gui(self.__glade)
+            self.__glade = None
         self.__toggled_button = button
         self.__curr_event = event
         self.__newEvent = None
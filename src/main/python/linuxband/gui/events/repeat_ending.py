@@ -30,7 +30,8 @@ class EventRepeatEnding(object):
         self.__toggled_button = None
         self.__curr_event = None
         self.__new_event = None
-        self.__init_gui(glade)
+        # the RepeatEnding window is built when it is opened for the first time
+        self.__glade = glade
 
     def on_comboboxentry2_changed_callback(self, widget):
         """ RepeatEnding value changed """
@@ -57,6 +58,9 @@ class EventRepeatEnding(object):
         return self.__new_event
 
     def init_window(self, button, event):
+        if self.__glade:
+            self.__init_gui(self.__glade)
+            self.__glade = None
         self.__toggled_button = button
         self.__curr_event = event
         self.__new_event = None
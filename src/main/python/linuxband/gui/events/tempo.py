@@ -30,7 +30,8 @@ class EventTempo(object):
         self.__toggled_button = None
         self.__curr_event = None
         self.__new_event = None
-        self.__init_gui(glade)
+        # the tempo window is built when it is opened for the first time
+        self.__glade = glade
 
     def on_spinbutton2_value_changed_callback(self, spinbutton):
         """ Tempo changed """
@@ -53,6 +54,9 @@ class EventTempo(object):
         return self.__new_event
 
     def init_window(self, button, event):
+        if self.__glade:
+            self.__init_gui(self.__glade)
+            self.__glade = None
         # hide back, forward, remove buttons
         if button is self.__togglebutton2: self.__alignment15.hide()
         else: self.__alignment15.show()
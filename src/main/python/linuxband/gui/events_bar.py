@@ -34,7 +34,8 @@ class EventsBar(object):
 
     def __init__(self, glade, song, gui, grooves):
         self.__song = song
-        # triple = [ button, window, handler, event ]
+        self.__glade = glade
+        # triple = [ button, window name, handler, event ]
         self.__triples = []
         # triple which window is currently active
         self.__toggled_triple = None
@@ -58,7 +59,7 @@ class EventsBar(object):
             self.__song.get_data().get_bar_info(barNum).move_event_backwards(self.__curr_event)
             # move the button and its window
             box.reorder_child(self.__toggled_triple[0], index - 1)
-            gobject.idle_add(self.__move_window_underneath, self.__toggled_triple[1], self.__toggled_triple[0])
+            gobject.idle_add(self.__move_window_underneath, self.__get_window(self.__toggled_triple), self.__toggled_triple[0])
             # we could have moved the tempo event to the beginning -> became the global tempo
             self.__refresh_globals()
 
@@ -72,7 +73,7 @@ class EventsBar(object):
             self.__song.get_data().get_bar_info(barNum).move_event_forwards(self.__curr_event)
             # move the button and its window
             box.reorder_child(self.__toggled_triple[0], index + 1)
-            gobject.idle_add(self.__move_window_underneath, self.__toggled_triple[1], self.__toggled_triple[0])
+            gobject.idle_add(self.__move_window_underneath, self.__get_window(self.__toggled_triple), self.__toggled_triple[0])
             # the global tempo or the global groove could have been changed
             self.__refresh_globals()
 
@@ -113,9 +114,10 @@ class EventsBar(object):
                 self.__curr_event = self.__song.get_data().get_bar_info(0).get_tempo()
             else:
                 self.__curr_event = event
-            self.__move_window_underneath(triple[1], button)
+            window = self.__get_window(triple)
+            self.__move_window_underneath(window, button)
             triple[2].init_window(button, self.__curr_event)
-            triple[1].show()
+            window.show()
             self.__toggled_triple = triple
         else:
             # button is released
@@ -149,7 +151,7 @@ class EventsBar(object):
     def main_window_configure_event_callback(self, widget, event):
         """ Everytime the main window is moved or resised, move the toggle window with it. """
         if self.__toggled_triple:
-            self.__move_window_underneath(self.__toggled_triple[1], self.__toggled_triple[0])
+            self.__move_window_underneath(self.__get_window(self.__toggled_triple), self.__toggled_triple[0])
         return False
 
     def toggle_window_key_pressed_event_callback(self, widget, event):
@@ -180,11 +182,6 @@ class EventsBar(object):
     def __init_gui(self, glade):
         Common.connect_signals(glade, self)
         self.__main_window = glade.get_widget("mainWindow")
-        groove_window = glade.get_widget("grooveWindow")
-        tempo_window = glade.get_widget("tempoWindow")
-        repeat_window = glade.get_widget("repeatWindow")
-        repeat_end_window = glade.get_widget("repeatEndWindow")
-        repeat_ending_window = glade.get_widget("repeatEndingWindow")
         self.__hbox8 = glade.get_widget("hbox8")
         self.__hbox7 = glade.get_widget("hbox7")
         # add event button
@@ -195,8 +192,8 @@ class EventsBar(object):
         # global buttons
         self.__eventGroove = EventGroove(glade, self.__grooves)
         self.__eventTempo = EventTempo(glade)
-        self.__triples.append([self.__togglebutton1, groove_window, self.__eventGroove, None])
-        self.__triples.append([self.__togglebutton2, tempo_window, self.__eventTempo, None])
+        self.__triples.append([self.__togglebutton1, "grooveWindow", self.__eventGroove, None])
+        self.__triples.append([self.__togglebutton2, "tempoWindow", self.__eventTempo, None])
         # add event menu
         event_items = { Glob.A_GROOVE: "Groove change",
                       Glob.A_TEMPO: "Tempo change",
@@ -210,12 +207,12 @@ class EventsBar(object):
             item.connect_object("activate", self.__add_event, key)
             menu.append(item)
         menu.show_all()
-        # for dynamic event creation
-        self.__event_windows = { Glob.A_GROOVE: groove_window,
-                              Glob.A_TEMPO: tempo_window,
-                              Glob.A_REPEAT: repeat_window,
-                              Glob.A_REPEAT_ENDING: repeat_ending_window,
-                              Glob.A_REPEAT_END: repeat_end_window }
+        # for dynamic event creation, the windows are built when opened for the first time
+        self.__event_windows = { Glob.A_GROOVE: "grooveWindow",
+                              Glob.A_TEMPO: "tempoWindow",
+                              Glob.A_REPEAT: "repeatWindow",
+                              Glob.A_REPEAT_ENDING: "repeatEndingWindow",
+                              Glob.A_REPEAT_END: "repeatEndWindow" }
 
         self.__event_window_handlers = { Glob.A_GROOVE: self.__eventGroove, # reusing already existing object
                                       Glob.A_TEMPO: self.__eventTempo,
@@ -259,6 +256,9 @@ class EventsBar(object):
                 gobject.idle_add(triple[0].clicked)
                 break
 
+    def __get_window(self, triple):
+        return self.__glade.get_widget(triple[1])
+
     def __remove_from_triples(self, button):
         for triple in self.__triples:
             if triple[0] is button: break
@@ -321,7 +321,7 @@ class EventsBar(object):
         if self.__toggle_window_close_recursive: return
         if self.__toggled_triple:
             if restoreLabel: self.__toggled_triple[0].set_label(self.__toggled_button_label)
-            self.__toggled_triple[1].hide()
+            self.__get_window(self.__toggled_triple).hide()
             # this will invoke on_togglebutton_clicked and then this method recursive again!
             self.__toggle_window_close_recursive = True
             self.__toggled_triple[0].set_active(False)
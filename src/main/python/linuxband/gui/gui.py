@@ -20,24 +20,25 @@
 import logging
 
 import gobject
-import gtk.glade
+import gtk
 import pango
 
 from linuxband.config import Config
 from linuxband.glob import Glob
-from linuxband.gui.about_dialog import AboutDialog
 from linuxband.gui.chord_entries import ChordEntries
 from linuxband.gui.chord_sheet import ChordSheet
 from linuxband.gui.common import Common
+from linuxband.gui.compile_scheduler import CompileScheduler
 from linuxband.gui.gui_logger import GuiLogger
 from linuxband.gui.events_bar import EventsBar
+from linuxband.gui.lazy_glade import LazyGlade
 from linuxband.gui.save_button_status import SaveButtonStatus
-from linuxband.gui.source_editor import SourceEditor
-from linuxband.gui.preferences import Preferences
+from linuxband.gui.speculative_compiler import SpeculativeCompiler
 from linuxband.midi.midi_player import MidiPlayer
 from linuxband.midi.mma2smf import MidiGenerator
 from linuxband.mma.song import Song
 from linuxband.mma.grooves import Grooves
+from linuxband.startup_trace import StartupTrace
 
 
 class Gui:
@@ -82,11 +83,11 @@ class Gui:
 
     def move_playhead_to_line(self, lineNum):
         """ Called by MidiPlayer. """
-        self.__source_editor.move_playhead_to(lineNum)
+        if self.__source_editor: self.__source_editor.move_playhead_to(lineNum)
 
     def hide_playhead(self):
         self.__chord_sheet.move_playhead_to(-1)
-        self.__source_editor.move_playhead_to(-1)
+        if self.__source_editor: self.__source_editor.move_playhead_to(-1)
 
     def main_window_keypress_event_callback(self, widget, event):
         key = event.keyval
@@ -116,7 +117,7 @@ class Gui:
     def edit_cut_callback(self, menuitem):
         if self.__chord_sheet.has_focus():
             self.__chord_sheet.cut_selection()
-        elif self.__source_editor.has_focus():
+        elif self.__source_editor and self.__source_editor.has_focus():
             self.__source_editor.cut_selection()
         elif self.__chord_entries.has_focus():
             self.__chord_entries.cut_selection()
@@ -124,7 +125,7 @@ class Gui:
     def edit_copy_callback(self, menuitem):
         if self.__chord_sheet.has_focus():
             self.__chord_sheet.copy_selection()
-        elif self.__source_editor.has_focus():
+        elif self.__source_editor and self.__source_editor.has_focus():
             self.__source_editor.copy_selection()
         elif self.__chord_entries.has_focus():
             self.__chord_entries.copy_selection()
@@ -132,7 +133,7 @@ class Gui:
     def edit_paste_callback(self, menuitem):
         if self.__chord_sheet.has_focus():
             self.__chord_sheet.paste_selection()
-        elif self.__source_editor.has_focus():
+        elif self.__source_editor and self.__source_editor.has_focus():
             self.__source_editor.paste_selection()
         elif self.__chord_entries.has_focus():
             self.__chord_entries.paste_selection()
@@ -140,7 +141,7 @@ class Gui:
     def edit_delete_callback(self, menuitem):
         if self.__chord_sheet.has_focus():
             self.__chord_sheet.delete_selection()
-        elif self.__source_editor.has_focus():
+        elif self.__source_editor and self.__source_editor.has_focus():
             self.__source_editor.delete_selection()
         elif self.__chord_entries.has_focus():
             self.__chord_entries.delete_selection()
@@ -148,15 +149,24 @@ class Gui:
     def edit_select_all_callback(self, menuitem):
         if self.__chord_sheet.has_focus():
             self.__chord_sheet.select_all()
-        elif self.__source_editor.has_focus():
+        elif self.__source_editor and self.__source_editor.has_focus():
             self.__source_editor.select_all()
         elif self.__chord_entries.has_focus():
             self.__chord_entries.select_all()
 
     def view_preferences_callback(self, menuitem):
         """ Preferences. """
+        if not self.__preferences:
+            from linuxband.gui.preferences import Preferences
+            self.__preferences = Preferences(self.__glade, self, self.__config, self.__grooves)
         self.__preferences.run()
 
+    def help_about_callback(self, menuitem):
+        if not self.__about_dialog:
+            from linuxband.gui.about_dialog import AboutDialog
+            self.__about_dialog = AboutDialog(self.__glade)
+        self.__about_dialog.present()
+
     __ignore_toggle2 = False
 
     def switch_view_callback(self, item=None):
@@ -215,13 +225,14 @@ class Gui:
     def open_file_callback(self, menutime):
         """ Open. """
         if self.__handle_unsaved_changes():
-            if (self.__open_file_dialog.get_current_folder() != self.__config.get_work_dir()):
-                self.__open_file_dialog.set_current_folder(self.__config.get_work_dir())
-            result = self.__open_file_dialog.run()
-            self.__open_file_dialog.hide()
+            open_file_dialog = self.__get_file_dialog("openFileDialog")
+            if (open_file_dialog.get_current_folder() != self.__config.get_work_dir()):
+                open_file_dialog.set_current_folder(self.__config.get_work_dir())
+            result = open_file_dialog.run()
+            open_file_dialog.hide()
             if (result == gtk.RESPONSE_OK):
-                self.__config.set_work_dir(self.__open_file_dialog.get_current_folder())
-                full_name = self.__open_file_dialog.get_filename()
+                self.__config.set_work_dir(open_file_dialog.get_current_folder())
+                full_name = open_file_dialog.get_filename()
                 manager = gtk.recent_manager_get_default()
                 manager.add_item('file://' + full_name)
                 self.__input_file = full_name
@@ -249,44 +260,45 @@ class Gui:
     def export_midi_callback(self, menuitem):
         """ Export MIDI. """
         if self.__compile_song(True) == 0:
-            if (self.__export_midi_dialog.get_current_folder() != self.__config.get_work_dir()):
-                self.__export_midi_dialog.set_current_folder(self.__config.get_work_dir())
+            export_midi_dialog = self.__get_file_dialog("exportMidiDialog")
+            if (export_midi_dialog.get_current_folder() != self.__config.get_work_dir()):
+                export_midi_dialog.set_current_folder(self.__config.get_work_dir())
             out_file = self.__output_file if self.__output_file else Glob.OUTPUT_FILE_DEFAULT
             out_file = self.__change_extension(out_file, "mid")
             logging.debug(out_file)
-            self.__export_midi_dialog.set_current_name(out_file)
-            result = self.__export_midi_dialog.run()
-            self.__export_midi_dialog.hide()
+            export_midi_dialog.set_current_name(out_file)
+            result = export_midi_dialog.run()
+            export_midi_dialog.hide()
             if (result == gtk.RESPONSE_OK):
-                self.__config.set_work_dir(self.__export_midi_dialog.get_current_folder())
-                full_name = self.__export_midi_dialog.get_filename()
+                self.__config.set_work_dir(export_midi_dialog.get_current_folder())
+                full_name = export_midi_dialog.get_filename()
                 self.__song.write_to_midi_file(full_name)
         else:
             logging.error("Failed to compile MMA file. Fix the errors and try the export again.")
 
     def playback_start(self, button, event):
         """ Play. """
+        if self.__switching_to_chord_sheet:
+            # the song is being compiled, it is played when the chord sheet is shown
+            return
         if event.state & gtk.gdk.SHIFT_MASK and event.state & gtk.gdk.CONTROL_MASK:
-            self.__compile_song(True)
+            self.__compile_scheduler.compile(self.__song_checked)
         else:
-            player = self.__midi_player
-            res = self.__compile_song(True)
-            if res == 0:
-                res, midi_data = self.__song.get_playback_midi_data()
-                player.playback_stop()
-                if res != 0: # generate SMF failed
-                    if res > 0 or res == -1: self.__show_mma_error(res)
-                    return
-                player.load_smf_data(midi_data, self.__song.get_data().get_mma_line_offset())
-            else:
-                return
-            self.__enable_pause_button()
+            # compile only the selected bars when playing the selection
+            bars = None
+            start_bar = None
             if event.state & gtk.gdk.CONTROL_MASK:
-                player.playback_start_bar(self.__chord_sheet.get_current_bar_number())
+                start_bar = self.__chord_sheet.get_current_bar_number()
             elif event.state & gtk.gdk.SHIFT_MASK:
-                player.playback_start_bars(self.__chord_sheet.get_selection_limits())
+                bars = self.__chord_sheet.get_selection_limits()
+            midi_data = self.__speculative_compiler.get_midi_data()
+            if midi_data is not None:
+                # the whole song was compiled in advance, it can be played from any bar
+                self.__show_compile_result(0)
+                self.__start_playback(midi_data, self.__song.get_data().get_mma_line_offset(), bars, start_bar)
             else:
-                player.playback_start()
+                callback = lambda job: self.__playback_compiled(job, bars, start_bar)
+                self.__compile_scheduler.compile(callback, True, bars)
 
     def playback_stop_callback(self, button=None):
         """ Stop. """
@@ -310,8 +322,10 @@ class Gui:
         """ Called when clicked on notebook tab. """
         logging.debug("")
         if pageNum == 1:  # switching to source editor
-            self.__source_editor.refresh_source(self.__song.write_to_string())
-            self.__source_editor.grab_focus()
+            self.__set_switching_to_chord_sheet(False)
+            source_editor = self.__get_source_editor()
+            source_editor.refresh_source(self.__song.write_to_string())
+            source_editor.grab_focus()
             self.__notebook2.set_current_page(pageNum)
             # view menu item
             if not self.__menuitem7.get_active():
@@ -319,19 +333,8 @@ class Gui:
                 self.__menuitem7.set_active(True)
             self.__global_buttons.hide()
         else:  # switching to chord sheet
-            res = self.__compile_song(True)
-            if res > 0 or res == -1:
-                logging.error("Cannot switch to chord sheet view. Fix the errors and try again.")
-            else:
-                self.refresh_chord_sheet()
-                self.__refresh_song_title()
-                self.__events_bar.refresh_all()
-                self.__notebook2.set_current_page(pageNum)
-                # view menu item
-                if not self.__menuitem5.get_active():
-                    Gui.__ignore_toggle2 = True
-                    self.__menuitem5.set_active(True)
-                self.__global_buttons.show()
+            self.__set_switching_to_chord_sheet(True)
+            self.__compile_scheduler.compile(self.__chord_sheet_compiled)
 
     def loop_toggle_callback(self, button):
         """ Loop check button. """
@@ -353,6 +356,8 @@ class Gui:
             # stop the jack thread when exiting
             if self.__midi_player:
                 self.__midi_player.shutdown()
+            self.__compile_scheduler.cancel()
+            self.__midi_generator.shutdown()
             self.__config.save_config()
             gtk.main_quit()
 
@@ -370,23 +375,26 @@ class Gui:
 
     def __do_open_file(self):
         self.playback_stop_callback()
+        self.__compile_scheduler.cancel()
+        self.__set_switching_to_chord_sheet(False)
         self.__song.load_from_file(self.__input_file)
         res = self.__song.compile_song()
         self.__chord_sheet.new_song_loaded()
-        self.__source_editor.new_song_loaded(self.__song.write_to_string())
+        if self.__source_editor: self.__source_editor.new_song_loaded(self.__song.write_to_string())
         self.refresh_chord_sheet()
         self.__refresh_song_title()
         if res > 0 or res == -1: self.__show_mma_error(res)
 
     def __do_save_as(self):
-        if (self.__save_as_dialog.get_current_folder() != self.__config.get_work_dir()):
-            self.__save_as_dialog.set_current_folder(self.__config.get_work_dir())
-        self.__save_as_dialog.set_current_name(Glob.OUTPUT_FILE_DEFAULT)
-        result = self.__save_as_dialog.run()
-        self.__save_as_dialog.hide()
+        save_as_dialog = self.__get_file_dialog("saveAsDialog")
+        if (save_as_dialog.get_current_folder() != self.__config.get_work_dir()):
+            save_as_dialog.set_current_folder(self.__config.get_work_dir())
+        save_as_dialog.set_current_name(Glob.OUTPUT_FILE_DEFAULT)
+        result = save_as_dialog.run()
+        save_as_dialog.hide()
         if (result == gtk.RESPONSE_OK):
-            self.__config.set_work_dir(self.__save_as_dialog.get_current_folder())
-            full_name = self.__save_as_dialog.get_filename()
+            self.__config.set_work_dir(save_as_dialog.get_current_folder())
+            full_name = save_as_dialog.get_filename()
             self.__compile_song(False)
             self.__song.write_to_mma_file(full_name)
             self.__output_file = full_name
@@ -404,10 +412,11 @@ class Gui:
 
     def __handle_unsaved_changes(self):
         if self.__song.get_data().is_save_needed():
-            self.__save_changes_dialog.set_property("text", "Save changes to " + self.__song.get_data().get_title() + "?")
-            self.__save_changes_dialog.set_property("secondary_text", "Your changes will be lost if you don't save them.")
-            result = self.__save_changes_dialog.run()
-            self.__save_changes_dialog.hide()
+            save_changes_dialog = self.__glade.get_widget("saveChangesDialog")
+            save_changes_dialog.set_property("text", "Save changes to " + self.__song.get_data().get_title() + "?")
+            save_changes_dialog.set_property("secondary_text", "Your changes will be lost if you don't save them.")
+            result = save_changes_dialog.run()
+            save_changes_dialog.hide()
             if (result == gtk.RESPONSE_YES):
                 return self.__do_save_file()
         return True
@@ -423,17 +432,75 @@ class Gui:
         logging.debug("COMPILE_SONG")
         res = self.__song.compile_song()
         if show_error:
-            if res == 0:
-                self.__source_editor.put_error_mark_to(-1)
-            elif res > 0 or res == -1:
-                self.__show_mma_error(res)
+            self.__show_compile_result(res)
         return res
 
+    def __song_checked(self, job):
+        self.__show_compile_result(job.get_result())
+
+    def __playback_compiled(self, job, bars, start_bar):
+        res = job.get_result()
+        self.__show_compile_result(res)
+        if res == 0:
+            self.__start_playback(job.get_midi_data(), self.__song.get_data().get_mma_line_offset(bars), bars, start_bar)
+
+    def __start_playback(self, midi_data, mma_line_offset, bars, start_bar):
+        player = self.__midi_player
+        player.playback_stop()
+        player.load_smf_data(midi_data, mma_line_offset)
+        self.__enable_pause_button()
+        if start_bar is not None:
+            player.playback_start_bar(start_bar)
+        elif bars is not None:
+            player.playback_start_bars(bars)
+        else:
+            player.playback_start()
+
+    def __set_switching_to_chord_sheet(self, switching):
+        """
+        The chord sheet can't be edited until the source is compiled and the chord sheet shown,
+        otherwise the compiled source would overwrite the changes.
+        """
+        self.__switching_to_chord_sheet = switching
+        self.__chord_sheet_page.set_sensitive(not switching)
+        self.__global_buttons.set_sensitive(not switching)
+
+    def __chord_sheet_compiled(self, job):
+        self.__set_switching_to_chord_sheet(False)
+        res = job.get_result()
+        self.__show_compile_result(res)
+        if res > 0 or res == -1:
+            logging.error("Cannot switch to chord sheet view. Fix the errors and try again.")
+        elif self.__notebook3.get_current_page() == 0:
+            self.refresh_chord_sheet()
+            self.__refresh_song_title()
+            self.__events_bar.refresh_all()
+            self.__notebook2.set_current_page(0)
+            # view menu item
+            if not self.__menuitem5.get_active():
+                Gui.__ignore_toggle2 = True
+                self.__menuitem5.set_active(True)
+            self.__global_buttons.show()
+
+    def __show_compile_result(self, res):
+        if res == 0:
+            if self.__source_editor: self.__source_editor.put_error_mark_to(-1)
+        elif res > 0 or res == -1:
+            self.__show_mma_error(res)
+
     def __show_mma_error(self, lineNum):
-        self.__source_editor.put_error_mark_to(lineNum - 1)
+        source_editor = self.__get_source_editor()
+        source_editor.put_error_mark_to(lineNum - 1)
         self.__notebook2.set_current_page(1)
         gobject.idle_add(self.__notebook3.set_current_page, 1)
-        self.__source_editor.grab_focus()
+        source_editor.grab_focus()
+
+    def __get_source_editor(self):
+        """ The source editor is created when it is shown for the first time. """
+        if not self.__source_editor:
+            from linuxband.gui.source_editor import SourceEditor
+            self.__source_editor = SourceEditor(self.__glade, self.__song)
+        return self.__source_editor
 
     def __init_recent_menu(self, glade):
         # code here comes from http://lescannoniers.blogspot.com/2008/11/pygtk-recent-file-chooser.html
@@ -460,29 +527,28 @@ class Gui:
         toolbutton8 = glade.get_widget("toolbutton8")
         toolbutton8.set_menu(recent_menu_chooser)
 
-    def __init_filechooser_dialogs(self, glade):
-        self.__open_file_dialog = glade.get_widget("openFileDialog")
-        self.__save_as_dialog = glade.get_widget("saveAsDialog")
-        self.__export_midi_dialog = glade.get_widget("exportMidiDialog")
-        # set file filters for Open and Save as dialogs
-        filter1 = gtk.FileFilter()
-        filter1.set_name("MMA files")
-        filter1.add_pattern("*.mma")
-        filter2 = gtk.FileFilter()
-        filter2.set_name("All files")
-        filter2.add_pattern("*")
-        filter3 = gtk.FileFilter()
-        filter3.set_name("MIDI files")
-        filter3.add_pattern("*.mid")
-        self.__open_file_dialog.add_filter(filter1)
-        self.__open_file_dialog.add_filter(filter2)
-        self.__save_as_dialog.add_filter(filter1)
-        self.__save_as_dialog.add_filter(filter2)
-        self.__export_midi_dialog.add_filter(filter2)
-        self.__export_midi_dialog.add_filter(filter3)
+    def __get_file_dialog(self, name):
+        """ The file chooser dialogs are built when they are opened for the first time. """
+        dialog = self.__file_dialogs.get(name)
+        if dialog is None:
+            dialog = self.__file_dialogs[name] = self.__glade.get_widget(name)
+            # set file filters, MMA files for Open and Save as dialogs, MIDI files for Export MIDI
+            if name == "exportMidiDialog":
+                filters = [("All files", "*"), ("MIDI files", "*.mid")]
+            else:
+                filters = [("MMA files", "*.mma"), ("All files", "*")]
+            for filter_name, pattern in filters:
+                file_filter = gtk.FileFilter()
+                file_filter.set_name(filter_name)
+                file_filter.add_pattern(pattern)
+                dialog.add_filter(file_filter)
+        return dialog
 
     def __init__(self):
-        glade = gtk.glade.XML(Glob.GLADE)
+        StartupTrace.phase('import gui')
+        # the toplevels are built when their widgets are needed for the first time
+        self.__glade = glade = LazyGlade(Glob.GLADE)
+        StartupTrace.phase('load glade')
         GuiLogger.initLogging(glade)
         Common.connect_signals(glade, self)
 
@@ -490,6 +556,8 @@ class Gui:
         self.__spinbutton1 = glade.get_widget("spinbutton1")  # bar count
         self.__notebook2 = glade.get_widget("notebook2")
         self.__notebook3 = glade.get_widget("notebook3")
+        self.__chord_sheet_page = glade.get_widget("vbox4")
+        self.__switching_to_chord_sheet = False
 
         # song name
         self.__entry9 = glade.get_widget("entry9")
@@ -509,33 +577,40 @@ class Gui:
         toolbutton1 = glade.get_widget("toolbutton1")
         toolbutton1.get_children()[0].connect('button-press-event', self.playback_start)
 
-        # save changes dialog
-        self.__save_changes_dialog = glade.get_widget("saveChangesDialog")
-
         self.__config = Config()
         self.__config.load_config()
-        grooves = Grooves(self.__config)
-        grooves.load_grooves(True)
-
-        self.__song = song = Song(MidiGenerator(self.__config))
+        StartupTrace.phase('main window, config')
+        # grooves are loaded in the background, the groove window waits for them
+        gobject.threads_init()
+        self.__grooves = grooves = Grooves(self.__config)
+        grooves.load_grooves_in_background(True)
+        StartupTrace.phase('start loading grooves')
+
+        self.__midi_generator = MidiGenerator(self.__config)
+        self.__song = song = Song(self.__midi_generator)
+        self.__compile_scheduler = CompileScheduler(song, self.__midi_generator)
+        self.__speculative_compiler = SpeculativeCompiler(glade, song, self.__compile_scheduler)
         self.__chord_sheet = ChordSheet(glade, song, self, self.__config)
         self.__events_bar = EventsBar(glade, song, self, grooves)
         self.__chord_entries = ChordEntries(glade, song, self.__chord_sheet)
-        self.__source_editor = SourceEditor(glade, song)
-        self.__preferences = Preferences(glade, self, self.__config, grooves)
-
-        AboutDialog(glade)
+        StartupTrace.phase('chord sheet, events bar')
+        # the source editor, preferences, about and file dialogs are created on first use
+        self.__source_editor = None
+        self.__preferences = None
+        self.__about_dialog = None
+        self.__file_dialogs = {}
         SaveButtonStatus(glade, song)
 
         self.__init_recent_menu(glade)
-        self.__init_filechooser_dialogs(glade)
+        StartupTrace.phase('menus')
 
         self.__main_window .show()
+        StartupTrace.phase('show main window')
 
-        gobject.threads_init()
         self.__midi_player = MidiPlayer(self)
         if (self.__config.get_jack_connect_startup()):
             self.__midi_player.startup()
+        StartupTrace.phase('start player')
 
         # loop check button, must be after the __midiPlayer.startup() call
         checkbutton1 = glade.get_widget("checkbutton1")
@@ -550,4 +625,13 @@ class Gui:
         spinbutton3.set_value(self.__config.get_intro_length())
 
         self.__do_new_file()
+        StartupTrace.phase('open new song')
+        if StartupTrace.is_enabled():
+            gobject.idle_add(self.__startup_finished)
         gtk.main()
+
+    def __startup_finished(self):
+        """ Called when the main loop got idle for the first time, the window is painted. """
+        StartupTrace.phase('first paint')
+        StartupTrace.finish()
+        return False
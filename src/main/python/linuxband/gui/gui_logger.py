@@ -20,10 +20,18 @@
 import logging
 import traceback
 
+import gobject
+
 
 class GuiLogger(object):
 
     class __TextBufferHandler(logging.Handler):
+        """
+        Shows the log records in the text view.
+
+        The records may come from background threads, they are added to the text buffer
+        from the gobject main loop as GTK may be used only from the main thread.
+        """
 
         def __init__(self, textView, textBuffer):
             logging.Handler.__init__(self)
@@ -37,14 +45,18 @@ class GuiLogger(object):
             elif record.levelname == 'WARNING': tag = 'fg_brown'
             elif record.levelname == 'ERROR': tag = 'fg_red'
 
+            gobject.idle_add(self.__append, self.format(record), tag)
+
+        def __append(self, message, tag):
             start, end = self.__textBuffer.get_bounds()
             text = self.__textBuffer.get_text(start, end)
             eol = '' if text == '' else '\n'
 
             mark = self.__textBuffer.create_mark(None, end, False)
-            self.__textBuffer.insert_with_tags_by_name(end, eol + self.format(record), tag)
+            self.__textBuffer.insert_with_tags_by_name(end, eol + message, tag)
             self.__textView.scroll_to_mark(mark, 0, True, 0.0, 1.0)
             self.__textBuffer.delete_mark(mark)
+            return False
 
     class __MyFormatter(logging.Formatter):
 
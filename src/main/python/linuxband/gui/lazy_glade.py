@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+import gtk.glade
+
+
+class LazyGlade(object):
+    """
+    Builds the toplevel widgets of the glade file only when one of their widgets is needed.
+
+    Can be used instead of gtk.glade.XML. The signal handlers are connected to the toplevels
+    which are already built and to the toplevels built later. Each toplevel is built from its
+    own part of the glade file, so the file is parsed about once in total.
+    """
+
+    __WIDGET = re.compile(r'<widget class="[^"]*" id="([^"]*)"|</widget>|'
+                          r'\s*<property name="transient_for">([^<]*)</property>')
+
+    def __init__(self, file_name):
+        # widget name -> name of its toplevel
+        self.__roots = {}
+        # toplevel name -> name of the window it is transient for
+        self.__transient_for = {}
+        # toplevel name -> glade data of the toplevel
+        self.__buffers = {}
+        # toplevel name -> gtk.glade.XML
+        self.__trees = {}
+        self.__handlers = []
+        infile = file(file_name, 'r')
+        try:
+            data = infile.read()
+        finally:
+            infile.close()
+        self.__scan(data)
+
+    def get_widget(self, name):
+        root = self.__roots.get(name)
+        if root is None: return None
+        return self.__get_tree(root).get_widget(name)
+
+    def signal_autoconnect(self, handlers):
+        self.__handlers.append(handlers)
+        for tree in self.__trees.values():
+            tree.signal_autoconnect(handlers)
+
+    def __get_tree(self, root):
+        tree = self.__trees.get(root)
+        if tree is None:
+            buf = self.__buffers.pop(root)
+            tree = self.__trees[root] = gtk.glade.xml_new_from_buffer(buf, len(buf), root)
+            for handlers in self.__handlers:
+                tree.signal_autoconnect(handlers)
+            parent = self.__transient_for.get(root)
+            if parent:
+                tree.get_widget(root).set_transient_for(self.get_widget(parent))
+        return tree
+
+    def __scan(self, data):
+        """
+        Splits the glade data into the toplevels and finds the toplevel of each widget. The header
+        of the file is copied to each toplevel. The transient_for properties are left out, the
+        toplevels are built separately and the parent window might not exist yet.
+        """
+        stack = []
+        header = None
+        for match in LazyGlade.__WIDGET.finditer(data):
+            name, parent = match.groups()
+            if name is not None:
+                if not stack:
+                    if header is None: header = data[:match.start()]
+                    chunks = []
+                    pos = match.start()
+                stack.append(name)
+                self.__roots[name] = stack[0]
+            elif parent is not None:
+                self.__transient_for[stack[0]] = parent
+                chunks.append(data[pos:match.start()])
+                pos = match.end()
+            else:
+                root = stack.pop()
+                if not stack:
+                    chunks.append(data[pos:match.end()])
+                    self.__buffers[root] = header + ''.join(chunks) + '\n</glade-interface>\n'
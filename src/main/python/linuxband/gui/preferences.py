@@ -45,12 +45,14 @@ class Preferences(object):
         self.__filechooserbutton2 = glade.get_widget("filechooserbutton2")
         self.__fontbutton1 = glade.get_widget("fontbutton1")
         self.__checkbutton2 = glade.get_widget("checkbutton2")
+        self.__checkbutton4 = glade.get_widget("checkbutton4")
 
     def __initWidgets(self):
         self.__filechooserbutton1.set_filename(self.__config.get_mma_path())
         self.__filechooserbutton2.set_filename(self.__config.get_mma_grooves_path())
         self.__fontbutton1.set_font_name(self.__config.get_chord_sheet_font())
         self.__checkbutton2.set_active(self.__config.get_jack_connect_startup())
+        self.__checkbutton4.set_active(self.__config.get_mma_worker())
 
     def __apply_changes(self):
         # path to mma
@@ -59,7 +61,7 @@ class Preferences(object):
         new_mma_grooves_path = self.__filechooserbutton2.get_filename()
         if (self.__config.get_mma_grooves_path() != new_mma_grooves_path):
             self.__config.set_mma_grooves_path(new_mma_grooves_path)
-            self.__grooves.load_grooves(False)
+            self.__grooves.load_grooves_in_background(False)
         # chord sheet font
         new_chord_sheet_font = self.__fontbutton1.get_font_name()
         if (self.__config.get_chord_sheet_font() != new_chord_sheet_font):
@@ -67,3 +69,5 @@ class Preferences(object):
             self.__gui.refresh_chord_sheet()
         # connect to JACK on startup
         self.__config.set_jack_connect_startup(self.__checkbutton2.get_active())
+        # keep MMA running in the background
+        self.__config.set_mma_worker(self.__checkbutton4.get_active())
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import gobject
+
+
+class SpeculativeCompiler(object):
+    """
+    Generates the playback midi data in the background while the song is edited in the chord sheet.
+
+    The compilation starts when the song has not changed for a while and no other
+    compilation is running. Pressing Play then uses the prepared midi data.
+    """
+
+    # how long the song must stay unchanged before it is compiled (ms)
+    __DEBOUNCE_INTERVAL = 600
+    # how often try again while another compilation is running (ms)
+    __RETRY_INTERVAL = 200
+
+    def __init__(self, glade, song, compile_scheduler):
+        self.__song = song
+        self.__compile_scheduler = compile_scheduler
+        self.__notebook3 = glade.get_widget("notebook3")
+        self.__compiled_revision = None
+        self.__midi_data = None
+        self.__sourceId = None
+        song.add_change_listener(self.__song_changed)
+
+    def get_midi_data(self):
+        """ The midi data of the whole song if they are up to date, otherwise None. """
+        if self.__compiled_revision == self.__song.get_revision():
+            return self.__midi_data
+        return None
+
+    def __song_changed(self):
+        """ Restart the countdown, no timer runs while the song is not changed. """
+        self.__set_timer(SpeculativeCompiler.__DEBOUNCE_INTERVAL)
+
+    def __set_timer(self, interval):
+        if self.__sourceId is not None:
+            gobject.source_remove(self.__sourceId)
+        self.__sourceId = gobject.timeout_add(interval, self.__compile)
+
+    def __compile(self):
+        self.__sourceId = None
+        revision = self.__song.get_revision()
+        # don't compile while the source is being edited
+        if revision == self.__compiled_revision or self.__notebook3.get_current_page() != 0:
+            return False
+        if self.__compile_scheduler.is_busy():
+            # don't delay other compilations
+            self.__set_timer(SpeculativeCompiler.__RETRY_INTERVAL)
+            return False
+        self.__compiled_revision = revision
+        self.__midi_data = None
+        self.__compile_scheduler.compile(self.__song_compiled, True)
+        return False
+
+    def __song_compiled(self, job):
+        if job.get_result() == 0 and job.get_revision() == self.__song.get_revision():
+            self.__compiled_revision = job.get_revision()
+            self.__midi_data = job.get_midi_data()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+class LruCache(object):
+    """
+    Dictionary keeping at most size items, the least recently used items are dropped.
+
+    When the cache is full, the older half of the items is dropped at once, which keeps
+    the bookkeeping of a lookup down to storing a counter.
+    """
+
+    def __init__(self, size):
+        self.__size = size
+        # key -> [value, time of last use]
+        self.__items = {}
+        self.__clock = 0
+
+    def get(self, key, default=None):
+        item = self.__items.get(key)
+        if item is None:
+            return default
+        self.__clock += 1
+        item[1] = self.__clock
+        return item[0]
+
+    def put(self, key, value):
+        if key not in self.__items and len(self.__items) >= self.__size:
+            self.__evict()
+        self.__clock += 1
+        self.__items[key] = [value, self.__clock]
+
+    def clear(self):
+        self.__items = {}
+
+    def __contains__(self, key):
+        return key in self.__items
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __evict(self):
+        times = sorted([item[1] for item in self.__items.itervalues()])
+        oldest = times[len(times) / 2]
+        for key, item in self.__items.items():
+            if item[1] <= oldest:
+                del self.__items[key]
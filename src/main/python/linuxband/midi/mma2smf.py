@@ -20,25 +20,77 @@
 import logging
 import os
 import select
+import signal
 import string
 import subprocess
+import threading
 
 from linuxband.glob import Glob
+from linuxband.midi.mma_worker import MmaWorker
+from linuxband.midi.smf_cache import SmfCache
 
 
 class MidiGenerator(object):
+    """
+    Runs MMA, one run at a time.
+
+    The song may be compiled in a background thread and in the GUI thread at the same time,
+    the later run waits until the former one finishes.
+    """
 
     def __init__(self, config):
         self.__config = config
+        self.__smf_cache = SmfCache(config)
+        self.__worker = None
+        self.__process = None
+        self.__lock = threading.Lock()
+
+    def cancel(self):
+        """
+        Terminate the running MMA process, may be called from another thread.
+        """
+        worker = self.__worker
+        if worker:
+            worker.cancel()
+        process = self.__process
+        if process:
+            logging.debug('Terminating MMA process %d', process.pid)
+            try:
+                os.kill(process.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self.__worker:
+            self.__worker.shutdown()
+            self.__worker = None
 
     def check_mma_syntax(self, mma_data):
         """
         < -1 other error, = -1 MMA error unknown line, 0 is OK, > 0 MMA error line
         """
+        self.__lock.acquire()
+        try:
+            return self.__check_mma_syntax(mma_data)
+        finally:
+            self.__lock.release()
+
+    def __check_mma_syntax(self, mma_data):
+        worker = self.__get_worker()
+        reply = worker.run(mma_data, True) if worker else None
+        if reply is not None:
+            exit_status, output, midi_data = reply #@UnusedVariable
+            if (exit_status != 0):
+                logging.error("Failed generating midi data. MMA returned status code " + str(exit_status))
+                num = self.__get_error_result(exit_status, output)
+                logging.error(output)
+                return num
+            return 0
         mmainput = '/proc/self/fd/0'
         command = [self.__config.get_mma_path(), mmainput, '-n']  # -n No generation of midi output
         try:
             mma = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self.__process = mma
         except:
             logging.exception("Failed to run command '" + ' '.join(command) + "'")
             return -2
@@ -49,33 +101,82 @@ class MidiGenerator(object):
         except:
             logging.exception("Failed to send data to MMA")
             return -2
-        exit_status = mma.wait()
+        exit_status = self.__wait(mma)
         if (exit_status != 0):
             logging.error("Failed generating midi data. MMA returned status code " + str(exit_status))
-            outstr = mma.stdout.readlines()
-            num = self.__parse_error_line_number(outstr)
-            logging.error(''.join(outstr))
+            output = mma.stdout.read()
+            num = self.__get_error_result(exit_status, output)
+            logging.error(output)
             return num
         return 0
 
     def generate_smf(self, mma_data):
         """
         Convert mma_data string into midi_data string using MMA program.
+
+        The midi data of already compiled songs are taken from the cache. Returns the result
+        as check_mma_syntax does and the midi data, the error line is located by the same MMA run.
         """
-        piper, pipew = os.pipe()
+        self.__lock.acquire()
         try:
-            res_and_midi = self.__do_generate_smf(piper, pipew, mma_data)
+            return self.__generate_smf(mma_data)
         finally:
+            self.__lock.release()
+
+    def __generate_smf(self, mma_data):
+        midi_data = self.__smf_cache.get(mma_data)
+        if midi_data is not None:
+            return (0, midi_data)
+        res_and_midi = self.__worker_generate_smf(mma_data)
+        if res_and_midi is None:
+            piper, pipew = os.pipe()
             try:
-                os.close(piper)
-            except:
-                pass
-            try:
-                os.close(pipew)
-            except:
-                pass
+                res_and_midi = self.__do_generate_smf(piper, pipew, mma_data)
+            finally:
+                try:
+                    os.close(piper)
+                except:
+                    pass
+                try:
+                    os.close(pipew)
+                except:
+                    pass
+        if res_and_midi[0] == 0 and res_and_midi[1]:
+            self.__smf_cache.put(mma_data, res_and_midi[1])
         return res_and_midi
 
+    def __worker_generate_smf(self, mma_data):
+        """
+        Generate midi data by the MMA worker. Returns None if the worker is not available.
+        """
+        worker = self.__get_worker()
+        reply = worker.run(mma_data, False) if worker else None
+        if reply is None:
+            return None
+        exit_status, output, midi_data = reply
+        if (exit_status != 0):
+            logging.error("Failed generating midi data. MMA returned status code " + str(exit_status))
+            logging.error(output)
+            return (self.__get_error_result(exit_status, output), '')
+        if not midi_data:
+            logging.error("MMA worker generated no output.")
+            return None
+        return (0, midi_data)
+
+    def __get_worker(self):
+        """
+        Return the MMA worker if enabled in preferences, start a new one if the mma path changed.
+        """
+        if not self.__config.get_mma_worker():
+            self.shutdown()
+            return None
+        mma_path = self.__config.get_mma_path()
+        if self.__worker and self.__worker.get_mma_path() != mma_path:
+            self.shutdown()
+        if not self.__worker:
+            self.__worker = MmaWorker(mma_path)
+        return self.__worker
+
     def __do_generate_smf(self, piper, pipew, mma_data):
         """
         < -1 other error, = -1 MMA error unknown line, 0 is OK, > 0 MMA error line
@@ -86,6 +187,7 @@ class MidiGenerator(object):
 
         try:
             mma = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self.__process = mma
         except:
             logging.exception("Failed to run command '" + ' '.join(command) + "'")
             return (-2, '')
@@ -96,28 +198,58 @@ class MidiGenerator(object):
         except:
             logging.exception("Failed to send data to MMA")
             return (-2, '')
+        midi_data = ''
+        output = []
         try:
             fin = os.fdopen(piper, 'r')
             timeout = 2
-            if not select.select([fin], [], [], timeout)[0]:
-                logging.error("MMA generated no output. Timeout after " + str(timeout) + " seconds.")
-                outstr = mma.stdout.readlines()
-                logging.error(' '.join(outstr))
-                return (-1, '')
-            os.close(pipew) # close our write pipe end, now only MMA has it opened
-            midi_data = fin.read()
+            # MMA opens the midi pipe at the end, if it fails it exits without opening it
+            while True:
+                ready = select.select([fin, mma.stdout], [], [], timeout)[0]
+                if not ready:
+                    logging.error("MMA generated no output. Timeout after " + str(timeout) + " seconds.")
+                    os.kill(mma.pid, signal.SIGTERM)
+                    self.__wait(mma)
+                    logging.error(''.join(output))
+                    return (-2, '')
+                if fin in ready:
+                    os.close(pipew) # close our write pipe end, now only MMA has it opened
+                    midi_data = fin.read()
+                    output.append(mma.stdout.read())
+                    break
+                data = os.read(mma.stdout.fileno(), 4096)
+                if not data:
+                    break
+                output.append(data)
         except:
             logging.exception("Failed to read midi data from MMA")
-        exit_status = mma.wait()
+        exit_status = self.__wait(mma)
         if (exit_status != 0):
             logging.error("Failed generating midi data. MMA returned status code " + str(exit_status))
+            output = ''.join(output)
+            logging.error(output)
+            return (self.__get_error_result(exit_status, output), '')
+        if not midi_data:
+            logging.error("MMA generated no output.")
             return (-2, '')
         return (0, midi_data)
 
+    def __wait(self, mma):
+        exit_status = mma.wait()
+        self.__process = None
+        return exit_status
+
+    def __get_error_result(self, exit_status, output):
+        """ MMA terminated by a signal didn't check the song. """
+        if exit_status < 0:
+            return -2
+        return self.__parse_error_line_number(output.splitlines(True))
+
     def __parse_error_line_number(self, lines):
         """
         Parse out the error line number. Error line example: ERROR:<Line 23><File:/proc/self/fd/0>
         """
+        res = -1
         for i, line in enumerate(lines): #@UnusedVariable
             res = string.find(line, "ERROR")
             if res != -1: break
@@ -130,5 +262,5 @@ class MidiGenerator(object):
         if len(midds) != 2: return -1
         try:
             return int(midds[1])
-        except TypeError:
+        except ValueError:
             return -1
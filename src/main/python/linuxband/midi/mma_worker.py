@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+import select
+import signal
+import subprocess
+import threading
+import time
+
+
+class MmaWorker(object):
+    """
+    Client of the long-lived MMA worker process (see mma_worker_server.py).
+
+    The worker is started on the first request and restarted when it crashes.
+    If it cannot be started, run() returns None and the caller is expected to
+    fall back to running the mma program. The worker is tried again after a while.
+    """
+
+    __server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mma_worker_server.py')
+    # how long to wait for a reply (s), one second more for every __TIMEOUT_BYTES of the song
+    __TIMEOUT = 10
+    __TIMEOUT_BYTES = 1000
+    # how long to wait before the failed worker is started again (s)
+    __RETRY_INTERVAL = 60
+    # how long to wait for the stopped worker to exit (s)
+    __STOP_TIMEOUT = 1
+
+    def __init__(self, mma_path):
+        self.__mma_path = mma_path
+        self.__process = None
+        # time of the last failure or None
+        self.__failed = None
+        self.__busy = False
+        self.__cancelled = False
+        self.__lock = threading.Lock()
+
+    def get_mma_path(self):
+        return self.__mma_path
+
+    def run(self, mma_data, check_only):
+        """
+        Compile mma_data. Returns (exit_status, mma_output, midi_data) or None if the worker is not available.
+        """
+        self.__lock.acquire()
+        try:
+            self.__cancelled = False
+            timeout = MmaWorker.__TIMEOUT + len(mma_data) / MmaWorker.__TIMEOUT_BYTES
+            for attempt in range(0, 2): #@UnusedVariable
+                if self.__is_failed(): return None
+                if not self.__process and not self.__start(): return None
+                self.__busy = True
+                try:
+                    return self.__request(mma_data, check_only, timeout)
+                except (IOError, OSError, ValueError, EOFError):
+                    self.__stop()
+                    if self.__cancelled:
+                        # report the same as when the mma program is terminated
+                        return (-signal.SIGTERM, "MMA worker terminated\n", '')
+                    logging.exception("MMA worker failed, restarting it")
+                finally:
+                    self.__busy = False
+            self.__failed = time.time()
+            return None
+        finally:
+            self.__lock.release()
+
+    def cancel(self):
+        """ Terminate the running compilation, may be called from another thread. """
+        process = self.__process
+        if process and self.__busy:
+            self.__cancelled = True
+            logging.debug('Terminating MMA worker %d', process.pid)
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        self.__lock.acquire()
+        try:
+            self.__stop()
+        finally:
+            self.__lock.release()
+
+    def __is_failed(self):
+        if self.__failed is None:
+            return False
+        if time.time() - self.__failed < MmaWorker.__RETRY_INTERVAL:
+            return True
+        self.__failed = None
+        return False
+
+    def __start(self):
+        interpreter = self.__get_interpreter()
+        if not interpreter:
+            logging.error("Cannot find out the interpreter of '%s', MMA worker disabled", self.__mma_path)
+            self.__failed = time.time()
+            return False
+        command = interpreter + [MmaWorker.__server_script, self.__mma_path]
+        try:
+            # the worker and its MMA child run in their own process group
+            self.__process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True,
+                                              preexec_fn=os.setsid)
+            status = self.__read_line(MmaWorker.__TIMEOUT)
+        except (IOError, OSError, EOFError):
+            logging.exception("Failed to run command '" + ' '.join(command) + "'")
+            status = 'FAILED'
+        if status != 'READY':
+            logging.error("MMA worker not available (%s), falling back to running MMA for every compilation", status)
+            self.__stop()
+            self.__failed = time.time()
+            return False
+        logging.info("MMA worker started")
+        return True
+
+    def __stop(self):
+        process = self.__process
+        self.__process = None
+        if not process: return
+        try:
+            process.stdin.close()
+        except:
+            pass
+        try:
+            process.stdout.close()
+        except:
+            pass
+        # let the worker remove its temporary files, kill it if it doesn't exit
+        try:
+            process.terminate()
+        except OSError:
+            pass
+        deadline = time.time() + MmaWorker.__STOP_TIMEOUT
+        while process.poll() is None and time.time() < deadline:
+            time.sleep(0.01)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        process.wait()
+
+    def __request(self, mma_data, check_only, timeout):
+        mode = 'CHECK' if check_only else 'GENERATE'
+        process = self.__process
+        process.stdin.write('COMPILE %s %i\n' % (mode, len(mma_data)))
+        process.stdin.write(mma_data)
+        process.stdin.flush()
+        exit_status, output_length, midi_length = [int(x) for x in self.__read_line(timeout).split()]
+        output = self.__read_exactly(output_length)
+        midi_data = self.__read_exactly(midi_length)
+        return (exit_status, output, midi_data)
+
+    def __read_line(self, timeout):
+        if not select.select([self.__process.stdout], [], [], timeout)[0]:
+            raise IOError("No reply from MMA worker in %i seconds" % timeout)
+        line = self.__process.stdout.readline()
+        if not line:
+            raise EOFError("MMA worker exited")
+        return line.strip()
+
+    def __read_exactly(self, length):
+        data = self.__process.stdout.read(length)
+        if len(data) != length:
+            raise EOFError("MMA worker exited")
+        return data
+
+    def __get_interpreter(self):
+        """ The worker runs under the interpreter of the mma program, taken from its #! line. """
+        try:
+            infile = file(self.__mma_path, 'r')
+            try:
+                line = infile.readline()
+            finally:
+                infile.close()
+        except IOError:
+            return None
+        if not line.startswith('#!'): return None
+        return line[2:].split()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Long-lived MMA worker process.
+
+The worker is started by MmaWorker using the same Python interpreter as the MMA
+program. It imports the MMA modules once and then compiles the songs sent over
+its standard input. Every song is compiled in a forked child so that MMA starts
+each compilation with a clean global state without paying the interpreter and
+module startup costs again. Only the modules stay loaded, the child reads the
+grooves used by the song again.
+
+When terminated by SIGTERM the worker kills the running child and removes its
+temporary files.
+
+This file must not import any linuxband modules, it runs outside LinuxBand and
+possibly under a different Python version.
+
+Protocol (all lines end with a newline):
+    worker:  READY | FAILED <reason>
+    request: COMPILE CHECK|GENERATE <length> followed by <length> bytes of MMA data
+    reply:   <exit status> <output length> <midi length> followed by the MMA output
+             and the midi data
+"""
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import traceback
+
+# MMA modules loaded before the first request
+PRELOAD_MODULES = ['MMA.gbl', 'MMA.common', 'MMA.options', 'MMA.parse', 'MMA.chords', 'MMA.midi']
+
+# song compiled during the startup to find out the worker is usable
+TEST_SONG = 'Tempo 120\n'
+
+
+def find_mma_dir(mma_path):
+    """ Locate the directory with the MMA modules in the same way the mma program does. """
+    candidates = [os.path.dirname(os.path.realpath(mma_path)), '/usr/local/share/mma', '/usr/share/mma']
+    for candidate in candidates:
+        if os.path.isfile(os.path.join(candidate, 'MMA', 'main.py')):
+            return candidate
+    return None
+
+
+def compile_song(mma_path, mma_data, command):
+    """ Compile the song in a forked child. Returns exit status, MMA output and midi data. """
+    tmp_dir = tempfile.mkdtemp(prefix='linuxband-mma-')
+    try:
+        input_name = os.path.join(tmp_dir, 'song.mma')
+        output_name = os.path.join(tmp_dir, 'output.txt')
+        midi_name = os.path.join(tmp_dir, 'song.mid')
+        write_file(input_name, mma_data)
+        if command == 'CHECK':
+            argv = [mma_path, input_name, '-n']
+        else:
+            argv = [mma_path, input_name, '-f', midi_name]
+        pid = os.fork()
+        if pid == 0:
+            run_mma(argv, output_name)
+        try:
+            status = os.waitpid(pid, 0)[1]
+        except:
+            # terminated, don't leave MMA running, it may have been reaped already
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+            raise
+        if os.WIFEXITED(status):
+            exit_status = os.WEXITSTATUS(status)
+        else:
+            exit_status = 128 + os.WTERMSIG(status)
+        output = read_file(output_name)
+        midi_data = b''
+        if exit_status == 0 and command != 'CHECK':
+            midi_data = read_file(midi_name)
+        return exit_status, output, midi_data
+    finally:
+        shutil.rmtree(tmp_dir, True)
+
+
+def run_mma(argv, output_name):
+    """ Runs in the forked child, never returns. """
+    exit_status = 0
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        fd = os.open(output_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 438)
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        null = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null, 0)
+        sys.argv = argv
+        # importing MMA.main runs the program
+        sys.modules.pop('MMA.main', None)
+        import MMA.main #@UnusedImport
+    except SystemExit:
+        code = sys.exc_info()[1].code
+        if code is None:
+            exit_status = 0
+        elif isinstance(code, int):
+            exit_status = code
+        else:
+            sys.stdout.write(str(code) + '\n')
+            exit_status = 1
+    except:
+        traceback.print_exc()
+        exit_status = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(exit_status)
+
+
+def read_file(file_name):
+    try:
+        infile = open(file_name, 'rb')
+    except IOError:
+        return b''
+    try:
+        return infile.read()
+    finally:
+        infile.close()
+
+
+def write_file(file_name, data):
+    outfile = open(file_name, 'wb')
+    try:
+        outfile.write(data)
+    finally:
+        outfile.close()
+
+
+def read_exactly(infile, length):
+    chunks = []
+    while length > 0:
+        chunk = infile.read(length)
+        if not chunk:
+            raise EOFError('Unexpected end of request')
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b''.join(chunks)
+
+
+def send(outfile, header, *data):
+    outfile.write(header.encode('ascii'))
+    for chunk in data:
+        outfile.write(chunk)
+    outfile.flush()
+
+
+def terminate(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def main():
+    signal.signal(signal.SIGTERM, terminate)
+    infile = getattr(sys.stdin, 'buffer', sys.stdin)
+    outfile = getattr(sys.stdout, 'buffer', sys.stdout)
+    mma_path = sys.argv[1]
+    mma_dir = find_mma_dir(mma_path)
+    if mma_dir is None:
+        send(outfile, 'FAILED MMA modules not found\n')
+        return 1
+    sys.path.insert(0, mma_dir)
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+    exit_status, output, midi_data = compile_song(mma_path, TEST_SONG.encode('ascii'), 'CHECK') #@UnusedVariable
+    if exit_status != 0:
+        send(outfile, 'FAILED test compilation returned status %i\n' % exit_status)
+        return 1
+    send(outfile, 'READY\n')
+    while True:
+        header = infile.readline()
+        if not header:
+            return 0
+        command, mode, length = header.decode('ascii').split()
+        if command != 'COMPILE':
+            return 1
+        mma_data = read_exactly(infile, int(length))
+        exit_status, output, midi_data = compile_song(mma_path, mma_data, mode)
+        send(outfile, '%i %i %i\n' % (exit_status, len(output), len(midi_data)), output, midi_data)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
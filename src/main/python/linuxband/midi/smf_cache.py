@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import fnmatch
+import hashlib
+import logging
+import os
+import re
+
+from linuxband.glob import Glob
+
+
+class SmfCache(object):
+    """
+    On-disk cache of midi files generated by MMA.
+
+    The midi data are stored under a key computed from the MMA input, the MMA
+    program, the groove library the program reads and the files included by
+    the input. When the cache grows over its size limit the least recently used
+    files are removed.
+
+    The MMA program and the groove library are scanned once and scanned again
+    only when their paths change, i.e. when the grooves are reloaded.
+    """
+
+    __CACHE_DIR = Glob.CONFIG_DIR + '/smf-cache'
+    __MAX_SIZE = 32 * 1024 * 1024
+    __SUFFIX = '.mid'
+
+    __include_re = re.compile(r'^[ \t]*include[ \t]+(\S+)', re.IGNORECASE | re.MULTILINE)
+
+    def __init__(self, config, cache_dir=__CACHE_DIR, max_size=__MAX_SIZE):
+        self.__config = config
+        self.__cache_dir = cache_dir
+        self.__max_size = max_size
+        # (mma_path, grooves_path, fingerprint)
+        self.__mma_fingerprint = None
+
+    def get(self, mma_data):
+        """
+        Return the cached midi data or None if there are none.
+        """
+        fname = self.__get_file_name(mma_data)
+        try:
+            infile = file(fname, 'rb')
+            try:
+                midi_data = infile.read()
+            finally:
+                infile.close()
+        except IOError:
+            return None
+        try:
+            os.utime(fname, None)  # mark as recently used
+        except OSError:
+            pass
+        logging.debug("Loaded midi data from cache '%s'", fname)
+        return midi_data
+
+    def put(self, mma_data, midi_data):
+        fname = self.__get_file_name(mma_data)
+        tmp_name = fname + '.tmp'
+        try:
+            if not os.path.isdir(self.__cache_dir):
+                os.makedirs(self.__cache_dir)
+            outfile = file(tmp_name, 'wb')
+            try:
+                outfile.write(midi_data)
+            finally:
+                outfile.close()
+            os.rename(tmp_name, fname)
+        except (IOError, OSError):
+            logging.exception("Unable to store midi data into cache '" + fname + "'")
+            return
+        self.__evict()
+
+    def __get_file_name(self, mma_data):
+        key = hashlib.sha1()
+        key.update(mma_data)
+        key.update('\0')
+        key.update(self.__get_mma_fingerprint())
+        key.update('\0')
+        key.update(self.__get_include_fingerprint(mma_data))
+        return os.path.join(self.__cache_dir, key.hexdigest() + SmfCache.__SUFFIX)
+
+    def __get_mma_fingerprint(self):
+        """
+        Identify the MMA program and the state of the groove library.
+
+        The modification time and size of the program stand in for its version.
+        """
+        mma_path = self.__config.get_mma_path()
+        grooves_path = self.__config.get_mma_grooves_path()
+        cached = self.__mma_fingerprint
+        if cached and cached[0] == mma_path and cached[1] == grooves_path:
+            return cached[2]
+        fingerprint = []
+        fingerprint.append(mma_path)
+        fingerprint.append(self.__stat_file(os.path.realpath(mma_path)))
+        for dirname, dirnames, filenames in os.walk(grooves_path): #@UnusedVariable
+            dirnames.sort()
+            for name in sorted(filenames):
+                if fnmatch.fnmatch(name, '*.mma'):
+                    full_name = os.path.join(dirname, name)
+                    fingerprint.append(full_name)
+                    fingerprint.append(self.__stat_file(full_name))
+        fingerprint = '\0'.join(fingerprint)
+        self.__mma_fingerprint = (mma_path, grooves_path, fingerprint)
+        return fingerprint
+
+    def __get_include_fingerprint(self, mma_data):
+        """
+        Identify the state of the files included by mma_data.
+
+        There are only few of them, so they are checked on every request. MMA looks
+        for them in the current directory and in the includes directory next to the
+        groove library, with or without the .mma extension.
+        """
+        fingerprint = []
+        lib_path = os.path.dirname(os.path.normpath(self.__config.get_mma_grooves_path()))
+        include_path = os.path.join(os.path.dirname(lib_path), 'includes')
+        for name in SmfCache.__include_re.findall(mma_data):
+            for dirname in (include_path, os.getcwd()):
+                for full_name in (os.path.join(dirname, name), os.path.join(dirname, name + '.mma')):
+                    fingerprint.append(full_name)
+                    fingerprint.append(self.__stat_file(full_name))
+        return '\0'.join(fingerprint)
+
+    def __stat_file(self, file_name):
+        try:
+            st = os.stat(file_name)
+        except OSError:
+            return ''
+        return '%d %d' % (st.st_mtime, st.st_size)
+
+    def __evict(self):
+        """
+        Remove the least recently used files until the cache fits into its size limit.
+        """
+        entries = []
+        total = 0
+        try:
+            for name in os.listdir(self.__cache_dir):
+                if not name.endswith(SmfCache.__SUFFIX): continue
+                full_name = os.path.join(self.__cache_dir, name)
+                st = os.stat(full_name)
+                entries.append((st.st_mtime, st.st_size, full_name))
+                total += st.st_size
+        except OSError:
+            logging.exception("Unable to list cache directory '" + self.__cache_dir + "'")
+            return
+        entries.sort()
+        for mtime, size, full_name in entries: #@UnusedVariable
+            if total <= self.__max_size: break
+            try:
+                os.remove(full_name)
+                total -= size
+            except OSError:
+                logging.exception("Unable to remove cache file '" + full_name + "'")
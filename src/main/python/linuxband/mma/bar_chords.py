@@ -17,25 +17,40 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import copy
 import logging
 
 
-class BarChords:
+def _intern(s):
+    """ Bars share equal chord symbols and separators, the interned strings are freed when unused. """
+    if type(s) is str:
+        return intern(s)
+    return s
+
+
+class BarChords(object):
+    """
+    Chords of one bar. The chord symbols and the separators following them are kept in two
+    tuples of interned strings, they are replaced as a whole when a chord changes. Therefore
+    a copy of the bar can share them.
+    """
+
+    __slots__ = ('__song_data', '__before_number', '__number', '__after_number',
+                 '__symbols', '__separators', '__eol')
 
     def __init__(self):
         self.__song_data = None
         self.__before_number = ''
         self.__number = None
         self.__after_number = ' '
-        self.__chords = [['/', '']]  # one chord is always there
+        self.__symbols = ('/',)  # one chord is always there
+        self.__separators = ('',)
         self.__eol = '\n'
 
     def set_song_data(self, song_data):
         self.__song_data = song_data
 
     def set_before_number(self, before_number):
-        self.__before_number = before_number
+        self.__before_number = _intern(before_number)
 
     def get_before_number(self):
         return self.__before_number
@@ -47,19 +62,22 @@ class BarChords:
         self.__number = number
 
     def set_after_number(self, after_number):
-        self.__after_number = after_number
+        self.__after_number = _intern(after_number)
 
     def get_after_number(self):
         return self.__after_number
 
     def set_chords(self, chords):
-        self.__chords = chords
+        """ Chords is a list of [ chord, trailing string ]. """
+        self.__symbols = tuple([_intern(full_chord[0]) for full_chord in chords])
+        self.__separators = tuple([_intern(''.join(full_chord[1:])) for full_chord in chords])
 
     def get_chords(self):
-        return self.__chords
+        """ Returns a new list of [ chord, trailing string ]. """
+        return [[symbol, separator] for symbol, separator in zip(self.__symbols, self.__separators)]
 
     def set_eol(self, eol):
-        self.__eol = eol
+        self.__eol = _intern(eol)
 
     def get_eol(self):
         return self.__eol
@@ -71,41 +89,40 @@ class BarChords:
         If chord == '' then actually delete the chord.
         """
         # [['Dm', ' '], ['/', ' '], ['AmzC@3.2', ' '], ['z!', '\n']]
-        chords = self.__chords
-        song_data = self.__song_data
-        if chord == '' and beat_num >= len(self.__chords):
+        symbols = list(self.__symbols)
+        separators = list(self.__separators)
+        if chord == '' and beat_num >= len(symbols):
             return
-        if beat_num + 1 < len(chords):  # there's a chord after this beat
-            full_chord = chords[beat_num]
+        if beat_num + 1 < len(symbols):  # there's a chord after this beat
             if not chord: chord = '/'
-            if full_chord[0] != chord:
-                full_chord[0] = chord
-                song_data.changed()
+            if symbols[beat_num] == chord: return
+            symbols[beat_num] = chord
         else:
             if not chord:  # delete a chord
-                full_chord = chords[beat_num]
                 if beat_num > 0:  # there is some chord before us
                     # possibly move trailing string from our chord to eol
-                    self.__eol = ''.join(full_chord[1:]) + self.__eol
-                    chords.pop(beat_num)
-                    song_data.changed()
+                    self.__eol = _intern(separators[beat_num] + self.__eol)
+                    symbols.pop(beat_num)
+                    separators.pop(beat_num)
                 else:  # the only chord on the line
-                    if full_chord[0] != '/':
-                        full_chord[0] = '/'
-                        song_data.changed()
+                    if symbols[beat_num] == '/': return
+                    symbols[beat_num] = '/'
             else:  # add or replace chord
-                if beat_num < len(chords):  # replace an existing chord
-                    full_chord = chords[beat_num]
-                    if full_chord[0] != chord:
-                        full_chord[0] = chord
-                        song_data.changed()
+                if beat_num < len(symbols):  # replace an existing chord
+                    if symbols[beat_num] == chord: return
+                    symbols[beat_num] = chord
                 else:  # append a chord
-                    last_full_chord = chords[len(chords) - 1]
-                    if len(last_full_chord[1]) == len(last_full_chord[1].rstrip()):
-                        last_full_chord[1] = last_full_chord[1] + ' '
-                    while len(chords) < beat_num: chords.append(['/', ' '])
-                    chords.append([chord, ''])
-                    song_data.changed()
+                    last = len(separators) - 1
+                    if len(separators[last]) == len(separators[last].rstrip()):
+                        separators[last] = separators[last] + ' '
+                    while len(symbols) < beat_num:
+                        symbols.append('/')
+                        separators.append(' ')
+                    symbols.append(chord)
+                    separators.append('')
+        self.__symbols = tuple([_intern(symbol) for symbol in symbols])
+        self.__separators = tuple([_intern(separator) for separator in separators])
+        self.__song_data.changed()
 
     def get_as_string_list(self):
         res = []
@@ -113,22 +130,26 @@ class BarChords:
         if self.get_number() is not None:
             res.append(str(self.get_number()))
         res.append(self.__after_number)
-        for full_chord in self.__chords:
-            res.extend(full_chord)
+        for symbol, separator in zip(self.__symbols, self.__separators):
+            res.append(symbol)
+            res.append(separator)
         res.append(self.__eol)
         return res
 
     def show_debug(self):
         logging.debug("Num: '%s'" % self.__number)
         logging.debug("AfterNum: '%s'" % self.__after_number)
-        logging.debug("Chords: '%s'" % self.__chords)
+        logging.debug("Chords: '%s'" % self.get_chords())
         logging.debug("Eol: '%s'" % self.__eol)
 
-    def __deepcopy__(self, memo):
+    def copy(self):
+        """ Returns a copy sharing the immutable chords with this bar. """
         newone = BarChords()
         newone.__song_data = self.__song_data
+        newone.__before_number = self.__before_number
         newone.__number = self.__number
-        newone.__after_number = copy.deepcopy(self.__after_number, memo)
-        newone.__chords = copy.deepcopy(self.__chords, memo)
-        newone.__eol = copy.deepcopy(self.__eol, memo)
+        newone.__after_number = self.__after_number
+        newone.__symbols = self.__symbols
+        newone.__separators = self.__separators
+        newone.__eol = self.__eol
         return newone
@@ -24,22 +24,34 @@ from linuxband.glob import Glob
 
 
 class BarInfo:
+    """
+    Lines and events preceding the chords of one bar.
+
+    The line lists are never changed in place, the events are replaced with new ones. Therefore
+    a copy of the bar can share the lists with the original until one of them is changed.
+    """
+
+    __REPEATS = [Glob.A_REPEAT, Glob.A_REPEAT_END, Glob.A_REPEAT_ENDING]
 
     def __init__(self):
         self.__song_data = None
         self.__lines = []
         self.__events = []
+        # the lists are shared with a copy of this bar
+        self.__shared = False
 
     def set_song_data(self, song_data):
         self.__song_data = song_data
 
     def add_line(self, line):
+        self.__unshare()
         self.__lines.append(line)
         if line[0] in Glob.EVENTS:
             self.__events.append(line)
 
     def insert_line(self, line):
         """ The same as add_line but inserting at the beginning """
+        self.__unshare()
         self.__lines.insert(0, line)
         if line[0] in Glob.EVENTS:
             self.__events.insert(0, line)
@@ -78,20 +90,28 @@ class BarInfo:
         self.__song_data.changed()
 
     def remove_event(self, line):
+        self.__unshare()
         self.__lines.remove(line)
         self.__events.remove(line)
         self.__song_data.changed()
 
-    def replace_event(self, old, new):
+    def replace_line(self, old, new):
+        """ The same as replace_event but without notifying the song """
+        self.__unshare()
         index = self.__find_element(self.__lines, old)
         self.__lines[index] = new
         index = self.__find_element(self.__events, old)
-        self.__events[index] = new
+        if index is not None:
+            self.__events[index] = new
+
+    def replace_event(self, old, new):
+        self.replace_line(old, new)
         self.__song_data.changed()
 
     def move_event_backwards(self, line):
         index = self.__events.index(line)
         if index > 0:
+            self.__unshare()
             previous = self.__events[index - 1]
             self.__swap_events(line, previous, self.__lines)
             self.__swap_events(line, previous, self.__events)
@@ -100,15 +120,19 @@ class BarInfo:
     def move_event_forwards(self, line):
         index = self.__events.index(line)
         if index < len(self.__events) - 1:
+            self.__unshare()
             next_event = self.__events[index + 1]
             self.__swap_events(line, next_event, self.__lines)
             self.__swap_events(line, next_event, self.__events)
             self.__song_data.changed()
 
-    def get_as_string_list(self):
+    def get_as_string_list(self, without_repeats=False):
+        """ If without_repeats is True the repetition events are replaced by empty lines. """
         res = []
         for line in self.__lines:
-            if line[0] == Glob.A_BEGIN_BLOCK:
+            if without_repeats and line[0] in BarInfo.__REPEATS:
+                res.append('\n' * ''.join(line[1:]).count('\n'))
+            elif line[0] == Glob.A_BEGIN_BLOCK:
                 res.extend(line[2:])
             else:
                 res.extend(line[1:])
@@ -131,13 +155,22 @@ class BarInfo:
         lst[index1] = event2
         lst[index2] = event1
 
-    def __deepcopy__(self, memo):
+    def copy(self):
+        """ Returns a copy sharing the lines with this bar until one of them is changed. """
         newone = BarInfo()
         newone.__song_data = self.__song_data
-        newone.__lines = copy.deepcopy(self.__lines, memo)
-        newone.__events = copy.deepcopy(self.__events, memo)
+        newone.__lines = self.__lines
+        newone.__events = self.__events
+        self.__shared = newone.__shared = True
         return newone
 
+    def __unshare(self):
+        """ Must be called before changing the lists. """
+        if self.__shared:
+            self.__lines = list(self.__lines)
+            self.__events = list(self.__events)
+            self.__shared = False
+
     @staticmethod
     def create_event(eventTitle):
         eventsInit = { Glob.A_GROOVE:       [ Glob.A_GROOVE, "Groove", " ", "50sRock", "\n" ],
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+
+from linuxband.mma.chord_table import chordlist
+
+
+class ChordNames(object):
+    """
+    Sorted list of all chord names, it is used for the chord entry completion.
+
+    The list is generated when it is needed for the first time and then shared.
+    """
+
+    __ROOTS = ['C', 'D', 'E', 'F', 'G', 'A', 'B']
+
+    __names = None
+
+    @staticmethod
+    def get_names():
+        """ Returns a sorted tuple with all possible chords. """
+        if ChordNames.__names is None:
+            chord_names = []
+            for root in ChordNames.__ROOTS:
+                for accidental in ['', '#', 'b']:
+                    for k in chordlist.iterkeys():
+                        chord_names.append(root + accidental + k)
+            chord_names.sort()
+            ChordNames.__names = tuple(chord_names)
+        return ChordNames.__names
+
+    @staticmethod
+    def find_prefix(prefix):
+        """ Returns the range (start, end) of chord names beginning with the prefix. """
+        names = ChordNames.get_names()
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix + '\xff', start)
+        return (start, end)
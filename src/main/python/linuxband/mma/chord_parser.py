@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from linuxband.lru_cache import LruCache
+from linuxband.mma.chord_table import aliases, chordlist
+
+
+class ChordParser(object):
+    """
+    Parses the chord symbols of the chord lines the way MMA does.
+
+    Examples: 'Cm7', 'F#7b9', 'Bb/D', 'G7>1', 'Am@2.5', 'CzC', 'z!', '/', 'IV7', 'bVII', 'ii7'.
+    The parsed chord is (root, chord_type, bass, inversion, beat, mute). The root is a note or
+    a Roman numeral, the lowercase numerals are minor chords. The chord type is resolved through
+    the aliases, root and chord_type are None for '/' and for a plain 'z'. The results of the
+    recently parsed chords are kept, the same chords are parsed again on every key press.
+    """
+
+    __MEMO_SIZE = 1024
+    __ROOTS = 'ABCDEFG'
+    __ACCIDENTALS = '#b&'
+    # the longer numerals first
+    __NUMERALS = ['VII', 'VI', 'V', 'IV', 'III', 'II', 'I']
+    # tracks which can be muted by 'z': arpeggio, bass, chord, drum, plectrum, aria, scale, walk
+    __TRACKS = 'ABCDPRSW'
+    __ALIASES = dict([(a, b) for a, b, d in aliases])  #@UnusedVariable
+
+    # chord -> parsed chord or error message
+    __memo = LruCache(__MEMO_SIZE)
+
+    @staticmethod
+    def parse(chord):
+        """ Returns the parsed chord, raises ValueError if the chord is invalid. """
+        value = ChordParser.__memo.get(chord)
+        if value is None:
+            try:
+                value = ChordParser.__parse(chord)
+            except ValueError, e:
+                value = str(e)
+            ChordParser.__memo.put(chord, value)
+        if isinstance(value, str):
+            raise ValueError(value)
+        return value
+
+    @staticmethod
+    def get_error(chord):
+        """ Returns None if the chord is valid, the error message otherwise. """
+        try:
+            ChordParser.parse(chord)
+        except ValueError, e:
+            return str(e)
+        return None
+
+    @staticmethod
+    def __parse(chord):
+        beat = None
+        mute = None
+        if '@' in chord:
+            chord, beat_str = chord.split('@', 1)
+            try:
+                beat = float(beat_str)
+            except ValueError:
+                raise ValueError("Invalid beat '%s'" % beat_str)
+            if beat < 1:
+                raise ValueError("Beat must be 1 or more, found '%s'" % beat_str)
+        if 'z' in chord:
+            chord, tracks = chord.split('z', 1)
+            if tracks == '!':
+                if chord:
+                    raise ValueError("'z!' can't follow a chord")
+            else:
+                for track in tracks:
+                    if track not in ChordParser.__TRACKS:
+                        raise ValueError("Unknown track '%s' after 'z'" % track)
+            mute = 'z' + tracks
+            if not chord:
+                return (None, None, None, 0, beat, mute)
+        if chord == '/':
+            if beat is not None or mute is not None:
+                raise ValueError("'/' can't have options")
+            return (None, None, None, 0, beat, mute)
+        inversion = 0
+        if '>' in chord:
+            chord, inversion_str = chord.rsplit('>', 1)
+            try:
+                inversion = int(inversion_str)
+            except ValueError:
+                raise ValueError("Invalid inversion '%s'" % inversion_str)
+        bass = None
+        if '/' in chord:
+            chord, bass = chord.rsplit('/', 1)
+            if ChordParser.__split_root(bass)[1]:
+                raise ValueError("Invalid bass note '%s'" % bass)
+        root, chord_type = ChordParser.__split_root(chord)
+        if root.lstrip(ChordParser.__ACCIDENTALS).islower():
+            chord_type = ChordParser.__get_minor_type(chord_type)
+        if chord_type == '':
+            chord_type = 'M'
+        elif chord_type not in chordlist:
+            raise ValueError("Unknown chord type '%s'" % chord_type)
+        chord_type = ChordParser.__ALIASES.get(chord_type, chord_type)
+        return (root, chord_type, bass, inversion, beat, mute)
+
+    @staticmethod
+    def __split_root(chord):
+        """ Splits the chord into the root note or Roman numeral and the rest. """
+        if chord and chord[0] in ChordParser.__ROOTS:
+            if len(chord) > 1 and chord[1] in ChordParser.__ACCIDENTALS:
+                return (chord[:2], chord[2:])
+            return (chord[:1], chord[1:])
+        start = 1 if chord[:1] and chord[0] in ChordParser.__ACCIDENTALS else 0
+        for numeral in ChordParser.__NUMERALS:
+            for case in (numeral, numeral.lower()):
+                if chord.startswith(case, start):
+                    return (chord[:start + len(case)], chord[start + len(case):])
+        raise ValueError("Chord must begin with one of %s or a Roman numeral, found '%s'"
+                         % (', '.join(ChordParser.__ROOTS), chord))
+
+    @staticmethod
+    def __get_minor_type(chord_type):
+        """ The chord type of a lowercase Roman numeral, 'o' stands for diminished. """
+        if chord_type.startswith('o'):
+            return 'dim' + chord_type[1:]
+        if 'm' + chord_type in chordlist:
+            return 'm' + chord_type
+        return chord_type
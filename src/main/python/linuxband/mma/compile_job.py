@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+class CompileJob(object):
+    """
+    One MMA compilation of the song.
+
+    The job is created and finished by the Song in the GUI thread. It holds copies of
+    all the data it needs so run() can be called from a background thread.
+    """
+
+    def __init__(self, revision, mma_data, mma_data_marks=None, song_data=None, parse_failed=False, result=None,
+                 line_offset=0):
+        """
+        mma_data - the song text checked by MMA
+        mma_data_marks - the song text with midi marks, the midi data are generated from it if given
+        line_offset - the number of lines the song is moved by in mma_data_marks
+        song_data - the song parsed from mma_data which replaces the current one if the compilation succeeds
+        result - the compilation result if MMA doesn't need to be run
+        """
+        self.__revision = revision
+        self.__mma_data = mma_data
+        self.__mma_data_marks = mma_data_marks
+        self.__song_data = song_data
+        self.__parse_failed = parse_failed
+        self.__result = result
+        self.__line_offset = line_offset
+        self.__syntax_ok = False
+        self.__cancelled = False
+        self.__midi_data = ''
+
+    def run(self, midi_generator):
+        """
+        Run MMA. See MidiGenerator.check_mma_syntax for the meaning of the result.
+
+        The result stays None if the job was cancelled before it started.
+        """
+        if self.__result is not None or self.__cancelled:
+            return
+        if self.__parse_failed:
+            res = midi_generator.check_mma_syntax(self.__mma_data)
+            if res == 0: res = -1
+        elif self.__mma_data_marks is not None:
+            res, self.__midi_data = midi_generator.generate_smf(self.__mma_data_marks)
+            if res > 0:
+                # the error line in mma_data, unknown if the error is in the macros preceding the song
+                res -= self.__line_offset
+                if res <= 0: res = -1
+            self.__syntax_ok = res == 0
+        else:
+            res = midi_generator.check_mma_syntax(self.__mma_data)
+            self.__syntax_ok = res == 0
+        self.__result = res
+
+    def cancel(self):
+        """
+        Don't run MMA, may be called from another thread.
+
+        The running MMA process is terminated by MidiGenerator.cancel.
+        """
+        self.__cancelled = True
+
+    def get_revision(self):
+        return self.__revision
+
+    def get_mma_data(self):
+        return self.__mma_data
+
+    def get_song_data(self):
+        return self.__song_data
+
+    def is_parse_failed(self):
+        return self.__parse_failed
+
+    def get_result(self):
+        return self.__result
+
+    def is_syntax_ok(self):
+        """ True if MMA accepted the song, even if it failed to generate the midi data. """
+        return self.__syntax_ok
+
+    def get_midi_data(self):
+        return self.__midi_data
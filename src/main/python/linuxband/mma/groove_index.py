@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import mmap
+import os
+import re
+import struct
+
+
+class GrooveIndex(object):
+    """
+    Read-only access to the groove index file written by GrooveIndex.write.
+
+    The file is memory mapped and the rows are decoded only when asked for.
+    All numbers are little endian, the file consists of:
+
+    header      magic, version, number of files, rows, families, variations and terms,
+                offsets of the tables and of the string pool
+    files       path, mtime and size of every scanned groove file
+    rows        [gname, doc, gdesc, author, time, full_name] of every groove, sorted by name
+    families    the first row of the family and its variations in the variation table
+    variations  row numbers
+    terms       sorted search terms and their postings in the posting table
+    postings    row number and weight of the groove containing the term
+    strings     pool of the strings referenced by (offset, length)
+    """
+
+    VERSION = 2
+
+    __MAGIC = 'LBGI'
+    __HEADER_FORMAT = '<4s13I'
+    __FILE_FORMAT = '<IIdq'
+    __ROW_FORMAT = '<12I'
+    __STRING_FORMAT = '<II'
+    __FAMILY_FORMAT = '<III'
+    __VARIATION_FORMAT = '<I'
+    __TERM_FORMAT = '<IIII'
+    __POSTING_FORMAT = '<II'
+
+    # weights of the terms found in gname, doc, gdesc, author and time
+    __FIELD_WEIGHTS = 8, 2, 4, 2, 1
+
+    def __init__(self, file_name):
+        """ Raises EnvironmentError if the file cannot be read, ValueError if it is not a valid index. """
+        f = file(file_name, 'rb')
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if size < struct.calcsize(GrooveIndex.__HEADER_FORMAT):
+                raise ValueError("Groove index '%s' is truncated" % file_name)
+            self.__data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        header = struct.unpack_from(GrooveIndex.__HEADER_FORMAT, self.__data, 0)
+        if header[0] != GrooveIndex.__MAGIC or header[1] != GrooveIndex.VERSION:
+            self.close()
+            raise ValueError("Groove index '%s' has unsupported format" % file_name)
+        self.__file_count, self.__row_count, self.__family_count, self.__variation_count, \
+            self.__term_count, self.__files_offset, self.__rows_offset, self.__families_offset, \
+            self.__variations_offset, self.__terms_offset, self.__postings_offset, \
+            self.__strings_offset = header[2:]
+        if self.__strings_offset > size:
+            self.close()
+            raise ValueError("Groove index '%s' is truncated" % file_name)
+
+    def close(self):
+        self.__data.close()
+
+    def get_file_count(self):
+        return self.__file_count
+
+    def get_file(self, file_num):
+        """ Returns the path of the groove file and its (mtime, size) stamp. """
+        offset = self.__files_offset + file_num * struct.calcsize(GrooveIndex.__FILE_FORMAT)
+        path_offset, path_len, mtime, size = struct.unpack_from(GrooveIndex.__FILE_FORMAT, self.__data, offset)
+        return self.__get_string(path_offset, path_len), (mtime, size)
+
+    def get_file_stamps(self):
+        """ Returns dictionary path -> (mtime, size) of all the groove files. """
+        stamps = {}
+        for i in range(0, self.__file_count):
+            path, stamp = self.get_file(i)
+            stamps[path] = stamp
+        return stamps
+
+    def get_row_count(self):
+        return self.__row_count
+
+    def get_row(self, row_num):
+        """ Returns [gname, doc, gdesc, author, time, full_name] of the groove. """
+        offset = self.__rows_offset + row_num * struct.calcsize(GrooveIndex.__ROW_FORMAT)
+        refs = struct.unpack_from(GrooveIndex.__ROW_FORMAT, self.__data, offset)
+        return [self.__get_string(refs[i], refs[i + 1]) for i in range(0, len(refs), 2)]
+
+    def get_row_value(self, row_num, column):
+        """ Returns one column of get_row without decoding the others. """
+        offset = self.__rows_offset + row_num * struct.calcsize(GrooveIndex.__ROW_FORMAT) \
+            + column * struct.calcsize(GrooveIndex.__STRING_FORMAT)
+        return self.__get_string(*struct.unpack_from(GrooveIndex.__STRING_FORMAT, self.__data, offset))
+
+    def get_family_count(self):
+        return self.__family_count
+
+    def get_family(self, family_num):
+        """ Returns the row number of the first groove of the family. """
+        return self.__get_family(family_num)[0]
+
+    def get_variation_count(self, family_num):
+        return self.__get_family(family_num)[2]
+
+    def get_variation(self, family_num, variation_num):
+        """ Returns the row number of the groove variation. """
+        first = self.__get_family(family_num)[1]
+        offset = self.__variations_offset + (first + variation_num) * struct.calcsize(GrooveIndex.__VARIATION_FORMAT)
+        return struct.unpack_from(GrooveIndex.__VARIATION_FORMAT, self.__data, offset)[0]
+
+    def get_grooves_by_file(self):
+        """ Returns dictionary path -> ((mtime, size), grooves), the format used by GrooveIndex.write. """
+        groove_files = {}
+        for i in range(0, self.__file_count):
+            path, stamp = self.get_file(i)
+            groove_files[path] = (stamp, [])
+        for i in range(0, self.__row_count):
+            row = self.get_row(i)
+            if row[5] in groove_files:
+                groove_files[row[5]][1].append(row)
+        return groove_files
+
+    def search(self, text):
+        """
+        Find grooves matching all the words of text, a word matches the terms it is prefix of.
+
+        Returns the row numbers, the best matches first.
+        """
+        scores = None
+        for word in set(re.findall('[a-z0-9]+', text.lower())):
+            word_scores = {}
+            term_num = self.__find_term(word)
+            while term_num < self.__term_count:
+                term, first, count = self.__get_term(term_num)
+                if not term.startswith(word):
+                    break
+                exact = term == word
+                for posting_num in range(first, first + count):
+                    offset = self.__postings_offset + posting_num * struct.calcsize(GrooveIndex.__POSTING_FORMAT)
+                    row_num, weight = struct.unpack_from(GrooveIndex.__POSTING_FORMAT, self.__data, offset)
+                    if exact: weight *= 2
+                    if weight > word_scores.get(row_num, 0):
+                        word_scores[row_num] = weight
+                term_num += 1
+            if scores is None:
+                scores = word_scores
+            else:
+                for row_num in scores.keys():
+                    if row_num in word_scores:
+                        scores[row_num] += word_scores[row_num]
+                    else:
+                        del scores[row_num]
+        if not scores:
+            return []
+        return sorted(scores.keys(), key=lambda row_num: (-scores[row_num], row_num))
+
+    def __find_term(self, word):
+        """ Number of the first term not less than word. """
+        low = 0
+        high = self.__term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__get_term(middle)[0] < word:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __get_term(self, term_num):
+        """ Returns the term, its first posting and the number of postings. """
+        offset = self.__terms_offset + term_num * struct.calcsize(GrooveIndex.__TERM_FORMAT)
+        term_offset, term_len, first, count = struct.unpack_from(GrooveIndex.__TERM_FORMAT, self.__data, offset)
+        return self.__get_string(term_offset, term_len), first, count
+
+    def __get_family(self, family_num):
+        offset = self.__families_offset + family_num * struct.calcsize(GrooveIndex.__FAMILY_FORMAT)
+        return struct.unpack_from(GrooveIndex.__FAMILY_FORMAT, self.__data, offset)
+
+    def __get_string(self, offset, length):
+        start = self.__strings_offset + offset
+        return self.__data[start:start + length]
+
+    @staticmethod
+    def write(file_name, groove_files):
+        """
+        Write the index of groove_files, a dictionary path -> ((mtime, size), grooves).
+
+        The file is written under a temporary name and renamed so that readers
+        never see a partially written index.
+        """
+        rows = []
+        for path in sorted(groove_files.keys()):
+            rows.extend(groove_files[path][1])
+        rows.sort(key=lambda row: row[0].upper())
+        families = group_families(rows)
+
+        pool = _StringPool()
+        files_data = []
+        for path in sorted(groove_files.keys()):
+            mtime, size = groove_files[path][0]
+            files_data.append(struct.pack(GrooveIndex.__FILE_FORMAT, *(pool.add(path) + (mtime, size))))
+        rows_data = []
+        for row in rows:
+            refs = ()
+            for value in row:
+                refs += pool.add(value)
+            rows_data.append(struct.pack(GrooveIndex.__ROW_FORMAT, *refs))
+        families_data = []
+        variations_data = []
+        variation_count = 0
+        for first, variations in families:
+            families_data.append(struct.pack(GrooveIndex.__FAMILY_FORMAT, first, variation_count, len(variations)))
+            for row_num in variations:
+                variations_data.append(struct.pack(GrooveIndex.__VARIATION_FORMAT, row_num))
+            variation_count += len(variations)
+        terms_data = []
+        postings_data = []
+        postings = GrooveIndex.__get_postings(rows)
+        for term in sorted(postings.keys()):
+            term_postings = postings[term]
+            terms_data.append(struct.pack(GrooveIndex.__TERM_FORMAT, *(pool.add(term) + (len(postings_data), len(term_postings)))))
+            for row_num in sorted(term_postings.keys()):
+                postings_data.append(struct.pack(GrooveIndex.__POSTING_FORMAT, row_num, term_postings[row_num]))
+
+        files_offset = struct.calcsize(GrooveIndex.__HEADER_FORMAT)
+        rows_offset = files_offset + len(files_data) * struct.calcsize(GrooveIndex.__FILE_FORMAT)
+        families_offset = rows_offset + len(rows_data) * struct.calcsize(GrooveIndex.__ROW_FORMAT)
+        variations_offset = families_offset + len(families_data) * struct.calcsize(GrooveIndex.__FAMILY_FORMAT)
+        terms_offset = variations_offset + variation_count * struct.calcsize(GrooveIndex.__VARIATION_FORMAT)
+        postings_offset = terms_offset + len(terms_data) * struct.calcsize(GrooveIndex.__TERM_FORMAT)
+        strings_offset = postings_offset + len(postings_data) * struct.calcsize(GrooveIndex.__POSTING_FORMAT)
+        header = struct.pack(GrooveIndex.__HEADER_FORMAT, GrooveIndex.__MAGIC, GrooveIndex.VERSION,
+                             len(files_data), len(rows_data), len(families_data), variation_count, len(terms_data),
+                             files_offset, rows_offset, families_offset, variations_offset, terms_offset,
+                             postings_offset, strings_offset)
+        tmp_name = file_name + '.tmp'
+        f = file(tmp_name, 'wb')
+        try:
+            f.write(header)
+            f.write(''.join(files_data))
+            f.write(''.join(rows_data))
+            f.write(''.join(families_data))
+            f.write(''.join(variations_data))
+            f.write(''.join(terms_data))
+            f.write(''.join(postings_data))
+            f.write(pool.get_data())
+        finally:
+            f.close()
+        os.rename(tmp_name, file_name)
+
+    @staticmethod
+    def __get_postings(rows):
+        """
+        Returns dictionary term -> {row number: weight} of the search terms of the grooves.
+
+        The weight is the sum of the weights of the fields containing the term.
+        """
+        postings = {}
+        for row_num, row in enumerate(rows):
+            for field_num, weight in enumerate(GrooveIndex.__FIELD_WEIGHTS):
+                for term in get_search_terms(row[field_num]):
+                    term_postings = postings.setdefault(term, {})
+                    term_postings[row_num] = term_postings.get(row_num, 0) + weight
+        return postings
+
+
+def get_search_terms(text):
+    """
+    Split text into lower case search terms.
+
+    Words written in camel case are also split into their parts, e.g. 'SwingSus' gives
+    'swingsus', 'swing' and 'sus'.
+    """
+    terms = set()
+    for word in re.findall('[A-Za-z0-9]+', text):
+        terms.add(word.lower())
+        for part in re.findall('[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+', word):
+            terms.add(part.lower())
+    return terms
+
+
+def group_families(rows):
+    """
+    Group the sorted groove rows into families shown in the groove selection dialog.
+
+    Returns list of (first row number, [variation row numbers]).
+    """
+    families = []
+    variations = None
+    prefix = None
+    march_variations = None
+    for row_num, row in enumerate(rows):
+        gname = row[0]
+        if gname.startswith('MilIntro') and march_variations is not None:
+            # hack for MilIntro2, MilIntro4 to put them under March
+            march_variations.append(row_num)
+        elif row_num == 0 \
+                or not gname.upper().startswith(prefix) \
+                or gname.startswith('Metronome'):   # metronome hack
+            variations = []
+            families.append((row_num, variations))
+            prefix = gname.upper()
+            # March hack
+            if gname == 'March':
+                march_variations = variations
+        else:
+            variations.append(row_num)
+    return families
+
+
+class _StringPool(object):
+    """ Stores every distinct string once. """
+
+    def __init__(self):
+        self.__offsets = {}
+        self.__data = []
+        self.__size = 0
+
+    def add(self, value):
+        """ Returns (offset, length) of the string in the pool. """
+        offset = self.__offsets.get(value)
+        if offset is None:
+            offset = self.__offsets[value] = self.__size
+            self.__data.append(value)
+            self.__size += len(value)
+        return offset, len(value)
+
+    def get_data(self):
+        return ''.join(self.__data)
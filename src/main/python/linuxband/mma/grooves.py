@@ -20,152 +20,295 @@
 import fnmatch
 import logging
 import os
-import pickle
+import sys
+import tempfile
+import threading
+import traceback
 
-import gtk
+import gobject
+
+try:
+    import multiprocessing
+except ImportError:
+    # python < 2.6, the grooves are parsed sequentially
+    multiprocessing = None
 
 from linuxband.glob import Glob
 from linuxband.mma.bar_info import BarInfo
-from linuxband.mma.parse import parse
+from linuxband.mma.groove_index import GrooveIndex
+from linuxband.mma.grooves_model import GroovesModel
+from linuxband.mma.parse import parse, parse_header
 
 
 class Grooves(object):
 
-    __grooves_cache_file = Glob.CONFIG_DIR + '/grooves.cache'
+    __grooves_index_file = Glob.CONFIG_DIR + '/grooves.index'
+
+    # parse groove files by a process pool only if there are at least that many of them
+    __PARALLEL_MIN_FILES = 32
+    __PARALLEL_CHUNK_SIZE = 8
 
-    def __init__(self, config):
+    def __init__(self, config, index_file=__grooves_index_file):
         self.__config = config
+        self.__index_file = index_file
+        self.__index = None
         self.__grooves_model = None
+        self.__variations_models = {}
+        self.__ready = threading.Event()
+        # serializes writing of the index file
+        self.__load_lock = threading.Lock()
+        # number of the last started loading, results of the older ones are dropped
+        self.__loading = 0
 
     def load_grooves(self, use_cache):
+        """
+        Load grooves from /usr/share/mma/lib/stdlib (configurable).
+
+        With use_cache only the groove files changed since the groove index was written are parsed,
+        otherwise all the groove files are parsed again.
+        """
+        self.__loading += 1
+        self.__set_index(self.__load_index(use_cache), self.__loading)
+
+    def load_grooves_in_background(self, use_cache):
+        """
+        Load grooves in a background thread, see load_grooves.
+
+        The grooves are taken over in the gobject main loop, is_ready() returns True then.
+        """
+        self.__ready.clear()
+        self.__loading += 1
+        thread = threading.Thread(target=self.__load_in_background, args=(use_cache, self.__loading))
+        thread.setDaemon(True)
+        thread.start()
+
+    def is_ready(self):
+        return self.__ready.isSet()
+
+    def __load_in_background(self, use_cache, loading):
+        try:
+            index = self.__load_index(use_cache)
+        except:
+            logging.exception("Failed to load grooves")
+            index = None
+        gobject.idle_add(self.__set_index, index, loading)
+
+    def __set_index(self, index, loading):
+        if loading != self.__loading:
+            if index: index.close()
+            return False
+        if self.__index:
+            # the models of the previous index must not be used any more
+            self.__index.close()
+        if index:
+            logging.info("Loaded %d groove patterns from '%s'" % (index.get_row_count(), self.__config.get_mma_grooves_path()))
+        self.__index = index
         self.__grooves_model = None
+        self.__variations_models = {}
+        self.__ready.set()
+        return False
+
+    def __load_index(self, use_cache):
+        """
+        Scan the groove files, update the index file and return the opened index.
+
+        May be run in a background thread, only errors are logged above the debug level.
+        """
+        self.__load_lock.acquire()
+        try:
+            return self.__do_load_index(use_cache)
+        finally:
+            self.__load_lock.release()
+
+    def __do_load_index(self, use_cache):
+        index = None
         if use_cache:
-            self.__grooves_model = self.__load_grooves_from_cache()
-        if not self.__grooves_model:
-            self.__grooves_model, grooves_list = self.__load_grooves()
-            self.__cache_grooves(grooves_list)
+            index = self.__open_index()
+        cached_stamps = {}
+        if index:
+            cached_stamps = index.get_file_stamps()
+        path = self.__config.get_mma_grooves_path()
+        stamps, to_parse = self.__scan_grooves(path, cached_stamps)
+        logging.debug("Parsing %d of %d groove files in '%s'" % (len(to_parse), len(stamps), path))
+        if to_parse or len(stamps) != len(cached_stamps):
+            groove_files = {}
+            if index:
+                cached_files = index.get_grooves_by_file()
+                index.close()
+                for full_name in stamps.keys():
+                    if full_name in cached_files and cached_files[full_name][0] == stamps[full_name]:
+                        groove_files[full_name] = cached_files[full_name]
+            for full_name, grooves in zip(to_parse, self.__load_groove_files(to_parse)):
+                groove_files[full_name] = (stamps[full_name], grooves)
+            index = self.__write_index(groove_files)
+        return index
 
     def get_grooves_model(self):
-        return self.__grooves_model
-
-    def __groove_compare(self, x, y):
-        a = x[0].upper()
-        b = y[0].upper()
-        if a > b:
-            return 1
-        elif a == b:
-            return 0
-        else:  # x<y
-            return -1
-
-    def __create_grooves_model(self, grooves_list):
         """
-        The model is used for Groove selection dialog.
+        The model of groove families for the groove selection dialog.
         """
-        grooves_model = gtk.ListStore(str, str, str, str, str, str, gtk.ListStore)
-        sub_liststore = None
-        pgroove = None
-        march_sub_liststore = None
-        for index, groove in enumerate(grooves_list):
-            if groove[0].startswith('MilIntro'):
-                # hack for MilIntro2, MilIntro4 to put them under March
-                march_sub_liststore.append(groove)
-            elif index == 0 \
-                    or not groove[0].upper().startswith(pgroove) \
-                    or groove[0].startswith('Metronome'):   # metronome hack    
-                sub_liststore = gtk.ListStore(str, str, str, str, str, str)
-                grooves_model.append(groove + [sub_liststore])
-                pgroove = groove[0].upper()
-                # March hack
-                if groove[0] == 'March':
-                    march_sub_liststore = sub_liststore
+        if self.__grooves_model is None:
+            index = self.__index
+            if index:
+                self.__grooves_model = GroovesModel(index, index.get_family_count(), index.get_family)
             else:
-                sub_liststore.append(groove)
-        return grooves_model
+                self.__grooves_model = GroovesModel(None, 0, None)
+        return self.__grooves_model
 
-    def __load_grooves(self):
-        """
-        Load grooves from /usr/share/mma/lib/stdlib (configurable).
+    def get_variations_model(self, family_num):
+        """ The model of the groove variations of the family. """
+        variations_model = self.__variations_models.get(family_num)
+        if variations_model is None:
+            index = self.__index
+            get_row_num = lambda variation_num: index.get_variation(family_num, variation_num)
+            variations_model = GroovesModel(index, index.get_variation_count(family_num), get_row_num)
+            self.__variations_models[family_num] = variations_model
+        return variations_model
 
-        Sort grooves and store them in grooves_list
-        Call __create_grooves_model()
-        """
-        grooves_list = []
-        self.__do_load_grooves(grooves_list, self.__config.get_mma_grooves_path())
-        grooves_list.sort(self.__groove_compare)
-        return self.__create_grooves_model(grooves_list), grooves_list
+    def search(self, text):
+        """ The model of grooves matching the text, the best matches first. """
+        index = self.__index
+        if not index:
+            return GroovesModel(None, 0, None)
+        row_nums = index.search(text)
+        return GroovesModel(index, len(row_nums), row_nums.__getitem__)
 
-    def __do_load_grooves(self, grooves_list, path):
+    def __scan_grooves(self, path, cached_stamps):
         """
-        Load grooves and recurse into subdirectories.
+        Find groove files in path and its subdirectories.
+
+        Returns dictionary full_name -> (mtime, size) of the groove files found and list of
+        the new and modified files which need to be parsed.
         """
-        for dirname, dirnames, filenames in os.walk(path):
+        stamps = {}
+        to_parse = []
+        for dirname, dirnames, filenames in os.walk(path): #@UnusedVariable
             for name in filenames:
                 if fnmatch.fnmatch(name, '*.mma'):
                     full_name = os.path.join(dirname, name)
-                    song_data = self.__parseGrooves(full_name)
-                    if not song_data: continue
-                    song_bar_info = song_data.get_bar_info_all()
-                    doc = author = time = ''
-                    for line in song_bar_info[0].get_lines():
-                        action = line[0]
-                        if action == Glob.A_BEGIN_BLOCK and line[1] == Glob.A_DOC:
-                            doc = BarInfo.get_doc_value(line)
-                        elif action == Glob.A_AUTHOR:
-                            author = BarInfo.get_author_value(line)
-                        elif action == Glob.A_TIME:
-                            time = BarInfo.get_time_value(line)
-                        elif action == Glob.A_DEF_GROOVE:
-                            gname, gdesc = BarInfo.get_defgroove_value(line)
-                            grooves_list.append([gname, doc, gdesc, author, time, full_name])
-            for name in dirnames:
-                path = os.path.join(dirname, name)
-                self.__do_load_grooves(grooves_list, path)
-
-    def __parseGrooves(self, file_name):
-        song_data = None
-        logging.debug("Opening groove file '%s'" % file_name)
-        try:
-            mma_file = file(file_name, 'r')
-            try:
-                song_data = parse(mma_file)
-            except ValueError:
-                logging.exception("Failed to parse the file.")
-            mma_file.close()
-        except:
-            logging.exception("Failed to load grooves from file '" + file_name + "'")
-        return song_data
+                    try:
+                        st = os.stat(full_name)
+                    except OSError:
+                        logging.exception("Failed to stat groove file '" + full_name + "'")
+                        continue
+                    stamp = stamps[full_name] = (st.st_mtime, st.st_size)
+                    if cached_stamps.get(full_name) != stamp:
+                        to_parse.append(full_name)
+        to_parse.sort()
+        return stamps, to_parse
 
-    def __load_grooves_from_cache(self):
+    def __load_groove_files(self, names):
         """
-        Load grooves from file or cache.
-        
-        Call createGroovesModel()
+        Parse the groove files, in parallel if there are enough of them and more CPUs available.
+
+        Returns the grooves of each file in the order of names.
         """
-        fname = Grooves.__grooves_cache_file
-        try:
-            infile = file(fname, 'r')
+        results = None
+        if multiprocessing and len(names) >= Grooves.__PARALLEL_MIN_FILES:
             try:
-                grooves_list = pickle.load(infile)
-            finally:
-                infile.close()
-        except:
-            logging.exception("Unable to load grooves from cache '" + fname + "'")
-            return
-        logging.info("Loaded %d groove patterns from cache '%s'" % (len(grooves_list), fname))
-        return self.__create_grooves_model(grooves_list)
+                processes = multiprocessing.cpu_count()
+            except NotImplementedError:
+                processes = 1
+            if processes > 1:
+                try:
+                    pool = multiprocessing.Pool(processes)
+                    try:
+                        results = pool.map(load_groove_file, names, Grooves.__PARALLEL_CHUNK_SIZE)
+                    finally:
+                        pool.close()
+                        pool.join()
+                except:
+                    logging.exception("Parallel parsing of groove files failed, parsing them sequentially")
+        if results is None:
+            results = [load_groove_file(full_name) for full_name in names]
+        # the errors are logged here as the pool processes must not log
+        for grooves, error in results: #@UnusedVariable
+            if error: logging.error(error)
+        return [grooves for grooves, error in results] #@UnusedVariable
 
-    def __cache_grooves(self, grooves_list):
+    def __open_index(self):
+        fname = self.__index_file
+        if not os.path.exists(fname):
+            return None
+        try:
+            index = GrooveIndex(fname)
+        except ValueError:
+            logging.debug("Groove index '%s' is outdated or damaged, rebuilding it" % fname)
+            return None
+        except EnvironmentError:
+            logging.exception("Unable to load grooves from index '" + fname + "'")
+            return None
+        logging.debug("Loaded %d groove patterns from index '%s'" % (index.get_row_count(), fname))
+        return index
+
+    def __write_index(self, groove_files):
         """
-        Store the grooves_list into cache file.
+        Store the groove files dictionary full_name -> ((mtime, size), grooves) into the index file and open it.
         """
-        fname = Grooves.__grooves_cache_file
-        logging.info("Stored %d groove patterns in cache '%s'" % (len(grooves_list), fname))
+        fname = self.__index_file
         try:
-            outfile = file(fname, 'w')
-            try:
-                pickle.dump(grooves_list, outfile, True)
-            finally:
-                outfile.close()
+            GrooveIndex.write(fname, groove_files)
+            logging.debug("Stored %d groove files in index '%s'" % (len(groove_files), fname))
+            return self.__open_index()
         except:
-            logging.exception("Unable to store grooves into cache '" + fname + "'")
+            logging.exception("Unable to store grooves into index '" + fname + "'")
+        # keep the grooves at least for this session, the index stays mapped after removing the file
+        fd, fname = tempfile.mkstemp('.index', 'linuxband-grooves')
+        os.close(fd)
+        try:
+            GrooveIndex.write(fname, groove_files)
+            return GrooveIndex(fname)
+        finally:
+            os.remove(fname)
+
+
+def load_groove_file(full_name):
+    """
+    Returns the grooves defined in the file as [gname, doc, gdesc, author, time, full_name] lists
+    and the error message or None.
+
+    Module level function so that it can be run by a multiprocessing pool. It must not log,
+    the pool is forked from a background thread and the child may inherit a logging lock
+    held by another thread, logging would then deadlock.
+    """
+    grooves = []
+    try:
+        lines = _parse_grooves(full_name)
+    except:
+        excType, excValue = sys.exc_info()[:2]
+        error = ''.join(traceback.format_exception_only(excType, excValue)).strip()
+        return grooves, "Failed to load grooves from file '%s': %s" % (full_name, error)
+    doc = author = time = ''
+    for line in lines:
+        action = line[0]
+        if action == Glob.A_BEGIN_BLOCK and line[1] == Glob.A_DOC:
+            doc = BarInfo.get_doc_value(line)
+        elif action == Glob.A_AUTHOR:
+            author = BarInfo.get_author_value(line)
+        elif action == Glob.A_TIME:
+            time = BarInfo.get_time_value(line)
+        elif action == Glob.A_DEF_GROOVE:
+            gname, gdesc = BarInfo.get_defgroove_value(line)
+            grooves.append([gname, doc, gdesc, author, time, full_name])
+    return grooves, None
+
+
+def _parse_grooves(file_name):
+    """
+    Returns the lines preceding the first chord line of the groove file.
+
+    Only the header is read, the whole file is parsed only if it contains chord lines.
+    """
+    mma_file = file(file_name, 'r')
+    try:
+        lines = parse_header(mma_file, _GROOVE_ACTIONS)
+        if lines is None:
+            mma_file.seek(0)
+            lines = parse(mma_file).get_bar_info_all()[0].get_lines()
+    finally:
+        mma_file.close()
+    return lines
+
+
+# directives describing the grooves
+_GROOVE_ACTIONS = Glob.A_DOC, Glob.A_AUTHOR, Glob.A_TIME, Glob.A_DEF_GROOVE
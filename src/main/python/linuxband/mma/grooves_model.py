@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import gtk
+
+
+class GroovesModel(gtk.GenericTreeModel):
+    """
+    List of grooves read from the groove index when the tree view asks for them.
+
+    The columns are gname, doc, gdesc, author, time and full_name. The row references
+    are the positions in the list, get_row_num maps them to the rows of the index.
+    """
+
+    __COLUMNS = 6
+
+    def __init__(self, index, count, get_row_num):
+        gtk.GenericTreeModel.__init__(self)
+        self.__index = index
+        self.__count = count
+        self.__get_row_num = get_row_num
+
+    def on_get_flags(self):
+        return gtk.TREE_MODEL_LIST_ONLY | gtk.TREE_MODEL_ITERS_PERSIST
+
+    def on_get_n_columns(self):
+        return GroovesModel.__COLUMNS
+
+    def on_get_column_type(self, index):
+        return str
+
+    def on_get_iter(self, path):
+        return self.__valid(path[0])
+
+    def on_get_path(self, rowref):
+        return (rowref,)
+
+    def on_get_value(self, rowref, column):
+        # the tree view shows only the name, the long doc is decoded when the groove is selected
+        return self.__index.get_row_value(self.__get_row_num(rowref), column)
+
+    def on_iter_next(self, rowref):
+        return self.__valid(rowref + 1)
+
+    def on_iter_children(self, parent):
+        if parent is None:
+            return self.__valid(0)
+        return None
+
+    def on_iter_has_child(self, rowref):
+        return False
+
+    def on_iter_n_children(self, rowref):
+        if rowref is None:
+            return self.__count
+        return 0
+
+    def on_iter_nth_child(self, parent, n):
+        if parent is None:
+            return self.__valid(n)
+        return None
+
+    def on_iter_parent(self, child):
+        return None
+
+    def __valid(self, rowref):
+        if 0 <= rowref < self.__count:
+            return rowref
+        return None
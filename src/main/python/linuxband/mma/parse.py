@@ -28,6 +28,9 @@ are completely handled here.
 
 """
 
+import cStringIO
+import logging
+
 from linuxband.glob import Glob
 from linuxband.mma.bar_chords import BarChords
 from linuxband.mma.bar_info import BarInfo
@@ -44,19 +47,156 @@ def parse(inpath):
     """
     song_bar_info = []
     song_bar_chords = []
-    song_bar_count = 0
     bar_number = 0
     bar_info = BarInfo()
     bar_chords = BarChords()
 
+    for line, action in read_lines(inpath):
+
+        if action is None:
+            bar_info.add_line(line)
+            continue
+
+        ### Gotta be a chord data line!
+        wline = line
+        l, eol = wline
+
+        """ A data line can have an optional bar number at the start
+            of the line. Makes debugging input easier. The next
+            block strips leading integers off the line. Note that
+            a line number on a line by itself it okay.
+        """
+
+        before_number = ''
+        if action.isdigit():   # isdigit() matches '1', '1234' but not '1a'!
+            l2 = l.lstrip()
+            before_number_len = len(l) - len(l2)
+            before_number = l[0:before_number_len]
+            l = l2
+            numstr = l.split()[0]
+            bar_chords.set_number(int(numstr))
+            l = l[len(numstr):] # remove number
+            if len(l.strip()) == 0: # ignore empty lines
+                bar_info.add_line([ Glob.A_UNKNOWN, wline[0] + wline[1] ])
+                continue
+
+        """ We now have a valid line. It'll look something like:
+
+            'Cm', '/', 'z', 'F#@4.5' { lyrics } [ solo ] * 2 
+            
+
+            Special processing in needed for 'z' options in chords. A 'z' can
+            be of the form 'CHORDzX', 'z!' or just 'z'.
+        """
+        after_number = None
+        last_chord = []
+        ctable = []
+        i = 0
+        solo_count = 0
+        lyrics_count = 0
+        mismatched_solo = "Mismatched {}s for solo found in chord line"
+        mismatched_lyrics = "Mismatched []s for lyrics found in chord line"
+        while True:
+            chars = ''
+            while i < len(l):
+                ch = l[i]
+                if ch == '{':
+                    """ Extract solo(s) from line ... this is anything in {}s.
+                        The solo data is pushed into RIFFs and discarded from
+                        the current line.
+                    """
+                    solo_count += 1
+                elif ch == '[':
+                    """ Set lyrics from [stuff] in the current line.
+                        NOTE: lyric.extract() inserts previously created
+                        data from LYRICS SET and inserts the chord names
+                        if that flag is active.
+
+                    """
+                    lyrics_count += 1
+                elif ch == '}':
+                    solo_count -= 1
+                    if solo_count < 0:
+                        raise ValueError(mismatched_solo)
+                elif ch == ']':
+                    lyrics_count -= 1
+                    if lyrics_count < 0:
+                        raise ValueError(mismatched_lyrics)
+                elif ch == '*':
+                    """ A bar can have an optional repeat count. This must
+                        be at the end of bar in the form '* xx'.
+                    """
+                    pass
+                elif ch in '\t\n\\ 0123456789':  # white spaces, \ and repeat count
+                    pass
+                elif solo_count == 0 and lyrics_count == 0:  # found beginning of the chord
+                    break
+                chars += ch
+                i += 1
+            if i == len(l): # no more chord is coming
+                if solo_count != 0:
+                    raise ValueError(mismatched_solo)
+                if lyrics_count != 0:
+                    raise ValueError(mismatched_lyrics)
+                if after_number is None:
+                    after_number = chars
+                else:
+                    last_chord.append(chars)
+                    ctable.append(last_chord)
+                break
+            else:  # chord beginning
+                if after_number is None:
+                    after_number = chars
+                else:
+                    last_chord.append(chars)
+                    ctable.append(last_chord)
+                chord_begin = i
+                # find the end of the chord
+                while i < len(l):
+                    if l[i] in '{}[]*\t\n\\ ':
+                        break
+                    i += 1
+                # chord examples: '/', 'z', 'Am7@2', 'Am6zC@3'
+                c = l[chord_begin:i]
+                last_chord = [ c ]
+        # the trailing string of the last chord can possibly include '\n' after which
+        # it would be difficult to add further chords. Therefore move the trailing string
+        # of the last chord to eol
+        eol = last_chord[1] + eol
+        last_chord[1] = ''
+
+        bar_chords.set_before_number(before_number)
+        bar_chords.set_after_number(after_number)
+        bar_chords.set_eol(eol)
+        bar_chords.set_chords(ctable)
+
+        song_bar_info.append(bar_info)
+        song_bar_chords.append(bar_chords)
+
+        bar_number = bar_number + 1
+        bar_info = BarInfo()
+        bar_chords = BarChords()
+
+    song_bar_info.append(bar_info)  # song_bar_info has always one element more then song_bar_chords
+    return SongData(song_bar_info, song_bar_chords, bar_number)
+
+
+def read_lines(inpath):
+    """
+    Read the mma input line by line, a wrapped line or a block is read as one line.
+
+    Yields tuples (line, action). The chord data lines are yielded with the action (the first
+    word of the line in upper case) and the line is the joined wrapped line [content, comment],
+    it's up to the caller to parse the bar number and the chords. All the other lines are
+    yielded with None and the line is the list of the line action and the line text or its
+    tokens, as stored in BarInfo.
+    """
     while True:
         curline = inpath.readline()
 
         # EOF
         if not curline:
-            song_bar_info.append(bar_info)  # song_bar_info has always one element more then song_bar_chords
-            song_bar_count = bar_number
-            return SongData(song_bar_info, song_bar_chords, song_bar_count)
+            return
 
         """ convert 0xa0 (non-breakable space) to 0x20 (regular space).
         """
@@ -64,7 +204,7 @@ def parse(inpath):
 
         # empty line
         if curline.rstrip('\n').strip() == '':
-            bar_info.add_line([Glob.A_UNKNOWN, curline])
+            yield [Glob.A_UNKNOWN, curline], None
             continue
 
         l = curline.split()
@@ -73,7 +213,7 @@ def parse(inpath):
         if l[0][0] == '$':
             wline = get_wrapped_line(inpath, curline)
             wline.insert(0, Glob.A_UNKNOWN)
-            bar_info.add_line(wline)
+            yield wline, None
             continue
 
 
@@ -104,21 +244,21 @@ def parse(inpath):
                 begin_block = tokens
             begin_block.insert(0, Glob.A_BEGIN_BLOCK)
             begin_block.insert(1, block_action)
-            bar_info.add_line(begin_block)
+            yield begin_block, None
             continue
 
         # parse MSET block
         if action == 'MSET':
             mset_block = parse_mset_block(inpath, curline)
             mset_block.insert(0, Glob.A_UNKNOWN)
-            bar_info.add_line(mset_block)
+            yield mset_block, None
             continue
 
         # parse IF - ENDIF block
         if action == 'IF':
             if_block = parse_if_block(inpath, curline)
             if_block.insert(0, Glob.A_UNKNOWN)
-            bar_info.add_line(if_block)
+            yield if_block, None
             continue
 
         # supported commands
@@ -126,14 +266,14 @@ def parse(inpath):
             wline = get_wrapped_line_join(inpath, curline)
             tokens = parse_supported_action(action, wline)
             tokens.insert(0, action)
-            bar_info.add_line(tokens)
+            yield tokens, None
             continue
 
         # if the command is in the simple function table
         if action in simple_funcs:
             wline = get_wrapped_line(inpath, curline)
             wline.insert(0, Glob.A_UNKNOWN)
-            bar_info.add_line(wline)
+            yield wline, None
             continue
 
         """ We have several possibilities ...
@@ -164,7 +304,7 @@ def parse(inpath):
                 if not curline:
                     raise ValueError("Reached EOF, Sequence {}s do not match")
             wline.insert(0, Glob.A_UNKNOWN)
-            bar_info.add_line(wline)
+            yield wline, None
             continue
 
         # join the wrapped line into one line
@@ -173,127 +313,118 @@ def parse(inpath):
         if wline[0].replace('\\\n', '').strip() == '':
             # line is a comment or empty wrapped line
             act = Glob.A_REMARK if wline[1].strip() else Glob.A_UNKNOWN
-            bar_info.add_line([act, wline[0], wline[1]])
+            yield [act, wline[0], wline[1]], None
             continue
 
-        l, eol = wline
-        ### Gotta be a chord data line!
+        # chord data line
+        yield wline, action
 
-        """ A data line can have an optional bar number at the start
-            of the line. Makes debugging input easier. The next
-            block strips leading integers off the line. Note that
-            a line number on a line by itself it okay.
-        """
 
-        before_number = ''
-        if action.isdigit():   # isdigit() matches '1', '1234' but not '1a'!
-            l2 = l.lstrip()
-            before_number_len = len(l) - len(l2)
-            before_number = l[0:before_number_len]
-            l = l2
-            numstr = l.split()[0]
-            bar_chords.set_number(int(numstr))
-            l = l[len(numstr):] # remove number
-            if len(l.strip()) == 0: # ignore empty lines
-                bar_info.add_line([ Glob.A_UNKNOWN, wline[0] + wline[1] ])
-                continue
+def parse_incremental(mma_data, song_data):
+    """
+    Parse the mma_data string reusing the unchanged bars of song_data.
 
-        """ We now have a valid line. It'll look something like:
+    The parser starts afresh after every chord line, so a bar (BarInfo and
+    BarChords) whose text has not changed parses into the same objects again.
+    The unchanged bars are matched at the beginning and at the end of the song
+    and only the text in between is tokenized. If the changed region cannot be
+    parsed on its own (e.g. an unterminated block), the whole text is parsed.
 
-            'Cm', '/', 'z', 'F#@4.5' { lyrics } [ solo ] * 2 
-            
+    The unchanged bars are copied, song_data keeps its own bars until the returned
+    song replaces it.
+    """
+    old_bar_count = song_data.get_bar_count()
+    old_bar_info = song_data.get_bar_info_all()
+    old_bar_chords = song_data.get_bar_chords_all()
+    segments = []
+    for i in range(0, old_bar_count):
+        segments.append(''.join(old_bar_info[i].get_as_string_list() + old_bar_chords[i].get_as_string_list()))
+    tail = ''.join(old_bar_info[old_bar_count].get_as_string_list())
+
+    # unchanged bars at the beginning
+    start = 0
+    prefix = 0
+    while prefix < old_bar_count:
+        segment = segments[prefix]
+        if not segment.endswith('\n') or not mma_data.startswith(segment, start):
+            break
+        start += len(segment)
+        prefix += 1
+
+    # unchanged bars at the end, the trailing bar_info must be unchanged too
+    end = len(mma_data)
+    suffix = 0
+    reuse_tail = len(mma_data) - len(tail) >= start and mma_data.endswith(tail) \
+        and is_line_start(mma_data, len(mma_data) - len(tail), start)
+    if reuse_tail:
+        end = len(mma_data) - len(tail)
+        while prefix + suffix < old_bar_count:
+            segment = segments[old_bar_count - 1 - suffix]
+            segment_start = end - len(segment)
+            if segment_start < start or not mma_data.startswith(segment, segment_start) \
+                    or not is_line_start(mma_data, segment_start, start):
+                break
+            end = segment_start
+            suffix += 1
+
+    if prefix == 0 and not reuse_tail:
+        return parse(cStringIO.StringIO(mma_data))
+
+    try:
+        middle = parse(cStringIO.StringIO(mma_data[start:end]))
+    except ValueError:
+        logging.debug("Changed region is not self-contained, parsing the whole song")
+        return parse(cStringIO.StringIO(mma_data))
+
+    song_bar_info = [bar_info.copy() for bar_info in old_bar_info[:prefix]] + middle.get_bar_info_all()
+    song_bar_chords = [bar_chords.copy() for bar_chords in old_bar_chords[:prefix]] + middle.get_bar_chords_all()
+    if reuse_tail:
+        # lines following the last changed chord line belong to the first reused bar_info
+        if suffix > 0:
+            reused = old_bar_info[old_bar_count - suffix]
+        else:
+            reused = old_bar_info[old_bar_count]
+        leading = song_bar_info.pop()
+        if leading.get_lines():
+            bar_info = BarInfo()
+            for line in leading.get_lines() + reused.get_lines():
+                bar_info.add_line(line)
+            reused = bar_info
+        else:
+            reused = reused.copy()
+        song_bar_info.append(reused)
+        song_bar_info.extend([bar_info.copy() for bar_info in old_bar_info[old_bar_count - suffix + 1:]])
+        song_bar_chords.extend([bar_chords.copy() for bar_chords in old_bar_chords[old_bar_count - suffix:]])
+    logging.debug("Reused %i bars, parsed %i bars", prefix + suffix, middle.get_bar_count())
+    return SongData(song_bar_info, song_bar_chords, len(song_bar_chords))
 
-            Special processing in needed for 'z' options in chords. A 'z' can
-            be of the form 'CHORDzX', 'z!' or just 'z'.
-        """
-        after_number = None
-        last_chord = []
-        ctable = []
-        i = 0
-        solo_count = 0
-        lyrics_count = 0
-        mismatched_solo = "Mismatched {}s for solo found in chord line"
-        mismatched_lyrics = "Mismatched []s for lyrics found in chord line"
-        while True:
-            chars = ''
-            while i < len(l):
-                ch = l[i]
-                if ch == '{':
-                    """ Extract solo(s) from line ... this is anything in {}s.
-                        The solo data is pushed into RIFFs and discarded from
-                        the current line.
-                    """
-                    solo_count += 1
-                elif ch == '[':
-                    """ Set lyrics from [stuff] in the current line.
-                        NOTE: lyric.extract() inserts previously created
-                        data from LYRICS SET and inserts the chord names
-                        if that flag is active.
 
-                    """
-                    lyrics_count += 1
-                elif ch == '}':
-                    solo_count -= 1
-                    if solo_count < 0:
-                        raise ValueError(mismatched_solo)
-                elif ch == ']':
-                    lyrics_count -= 1
-                    if lyrics_count < 0:
-                        raise ValueError(mismatched_lyrics)
-                elif ch == '*':
-                    """ A bar can have an optional repeat count. This must
-                        be at the end of bar in the form '* xx'.
-                    """
-                    pass
-                elif ch in '\t\n\\ 0123456789':  # white spaces, \ and repeat count
-                    pass
-                elif solo_count == 0 and lyrics_count == 0:  # found beginning of the chord
-                    break
-                chars += ch
-                i += 1
-            if i == len(l): # no more chord is coming
-                if solo_count != 0:
-                    raise ValueError(mismatched_solo)
-                if lyrics_count != 0:
-                    raise ValueError(mismatched_lyrics)
-                if after_number is None:
-                    after_number = chars
-                else:
-                    last_chord.append(chars)
-                    ctable.append(last_chord)
-                break
-            else:  # chord beginning
-                if after_number is None:
-                    after_number = chars
-                else:
-                    last_chord.append(chars)
-                    ctable.append(last_chord)
-                chord_begin = i
-                # find the end of the chord
-                while i < len(l):
-                    if l[i] in '{}[]*\t\n\\ ':
-                        break
-                    i += 1
-                # chord examples: '/', 'z', 'Am7@2', 'Am6zC@3'
-                c = l[chord_begin:i]
-                last_chord = [ c ]
-        # the trailing string of the last chord can possibly include '\n' after which
-        # it would be difficult to add further chords. Therefore move the trailing string
-        # of the last chord to eol
-        eol = last_chord[1] + eol
-        last_chord[1] = ''
+def parse_header(inpath, actions):
+    """
+    Read the lines preceding the first chord line and return those of the given actions.
 
-        bar_chords.set_before_number(before_number)
-        bar_chords.set_after_number(after_number)
-        bar_chords.set_eol(eol)
-        bar_chords.set_chords(ctable)
+    A faster alternative to parse() when only the global settings are needed, e.g. the groove
+    documentation. The lines are read by read_lines() as by parse() and only the lines of the given
+    supported actions (or block actions) are kept. Returns None if the input contains a chord line,
+    use parse() then.
+    """
+    lines = []
+    for line, action in read_lines(inpath):
+        if action is None:
+            if line[0] in actions or (line[0] == Glob.A_BEGIN_BLOCK and line[1] in actions):
+                lines.append(line)
+            continue
+        if action.isdigit():
+            l = line[0].lstrip()
+            if len(l[len(l.split()[0]):].strip()) == 0:
+                continue  # bar number on a line by itself
+        return None
+    return lines
 
-        song_bar_info.append(bar_info)
-        song_bar_chords.append(bar_chords)
 
-        bar_number = bar_number + 1
-        bar_info = BarInfo()
-        bar_chords = BarChords()
+def is_line_start(data, pos, start):
+    """ True if a line of data begins at pos. Position start is always a line beginning. """
+    return pos == start or data[pos - 1] == '\n'
 
 
 def get_wrapped_line(inpath, curline):
@@ -17,23 +17,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import cStringIO
 import logging
 
 from linuxband.mma.bar_info import BarInfo
-from linuxband.mma.parse import parse
+from linuxband.mma.compile_job import CompileJob
+from linuxband.mma.parse import parse_incremental
 from linuxband.mma.song_data import SongData
 
 
 class Song(object):
 
     def __init__(self, midi_generator):
+        self.__generation = 0
+        self.__change_listeners = []
         self.__clear_song()
         self.__midi_generator = midi_generator
 
     def get_data(self):
         return self.__song_data
 
+    def get_revision(self):
+        """ Changes whenever the song is changed or replaced. """
+        return (self.__generation, self.__song_data.get_revision())
+
+    def add_change_listener(self, listener):
+        """ The listener is called without arguments whenever the revision changes. """
+        self.__change_listeners.append(listener)
+
     def load_from_file(self, file_name):
         logging.info("Loading file '%s'", file_name)
         try:
@@ -47,22 +57,74 @@ class Song(object):
             return -2
         self.__pending_mma_data = mma_data
         self.__song_data.set_save_needed(False)
+        self.__replaced()
 
     def load_from_string(self, mma_data):
         self.__pending_mma_data = mma_data
         self.__song_data.set_save_needed(True)
+        self.__replaced()
 
     def compile_song(self):
-        if not self.__song_data.is_save_needed() and self.__pending_mma_data == None and self.__invalid_mma_data == None:
+        job = self.create_compile_job()
+        job.run(self.__midi_generator)
+        self.finish_compile_job(job)
+        return job.get_result()
+
+    def create_compile_job(self, generate_midi=False, bars=None):
+        """
+        Prepare the compilation of the song, the job can be run in a background thread.
+
+        Pending or invalid mma data are parsed here. If generate_midi is True the playback
+        midi data with marks for tracking are generated by the job, see get_playback_midi_data.
+        """
+        mma_data = self.__pending_mma_data
+        if mma_data is None:
+            mma_data = self.__invalid_mma_data
+        revision = self.get_revision()
+        if mma_data is not None:
+            try:
+                song_data = parse_incremental(mma_data, self.__song_data)
+            except ValueError:
+                logging.exception("Failed to parse the file.")
+                return CompileJob(revision, mma_data, parse_failed=True)
+            mma_data_marks = song_data.write_to_string_with_midi_marks(bars) if generate_midi else None
+            return CompileJob(revision, mma_data, mma_data_marks, song_data,
+                              line_offset=song_data.get_mma_line_offset(bars))
+        if not generate_midi and not self.__song_data.is_save_needed():
             logging.debug('No compilation needed')
-            return self.__last_compile_result
-        if self.__pending_mma_data is None:
-            mma_data = self.write_to_string()
-            res = self.__midi_generator.check_mma_syntax(mma_data)
-        else:
-            res = self.__do_compile(self.__pending_mma_data)
+            return CompileJob(revision, None, result=self.__last_compile_result)
+        mma_data_marks = self.__song_data.write_to_string_with_midi_marks(bars) if generate_midi else None
+        return CompileJob(revision, self.__song_data.write_to_string(), mma_data_marks,
+                          line_offset=self.__song_data.get_mma_line_offset(bars))
+
+    def finish_compile_job(self, job):
+        """
+        Take over the result of the finished job.
+
+        Returns False if the song changed since the job was created, the result is dropped then.
+        """
+        if job.get_revision() != self.get_revision():
+            logging.debug('Song changed during compilation, dropping the result')
+            return False
+        if job.get_mma_data() is None:
+            return True
+        res = job.get_result()
+        self.__last_compile_result = res
+        if job.get_song_data() is None and not job.is_parse_failed():
+            return True
+        mma_data = job.get_mma_data()
+        if res > 0 or res == -1:
+            self.__clear_song()
+            self.__invalid_mma_data = mma_data
+            self.__song_data.set_save_needed(True)
+            self.__last_compile_result = res
+        elif job.is_syntax_ok():
+            # take over the song even if MMA failed to generate the midi data
+            self.__invalid_mma_data = None
             self.__pending_mma_data = None
-        return res
+            self.__set_song_data(job.get_song_data())
+        # otherwise MMA could not be run, the mma data are compiled again next time
+        return True
 
     def write_to_mma_file(self, file_name):
         mma_data = self.write_to_string()
@@ -83,14 +145,19 @@ class Song(object):
         else:
             return self.__invalid_mma_data
 
-    def get_playback_midi_data(self):
+    def get_playback_midi_data(self, bars=None):
         """ 
-        Get midi file which will be sent to the client.
+        Compile the song and get midi file which will be sent to the client.
         
-        Than create mma file with markers for tracking and generate the resulting midi from it.
+        Create mma file with markers for tracking and generate the resulting midi from it.
+        The song is checked by the same MMA run, the error line is taken from its output. Returns the compile result and the midi data.
+
+        If bars (the first and the last bar number) are given, the midi file contains only those bars.
         """
-        mma_data_marks = self.__song_data.write_to_string_with_midi_marks()
-        return self.__midi_generator.generate_smf(mma_data_marks)
+        job = self.create_compile_job(True, bars)
+        job.run(self.__midi_generator)
+        self.finish_compile_job(job)
+        return job.get_result(), job.get_midi_data()
 
     def __clear_song(self):
         """
@@ -101,28 +168,23 @@ class Song(object):
         
         bar_count = number of bar_chords in the song, number of bar_info is bar_count + 1
         """
-        self.__song_data = SongData([BarInfo()], [], 0)
         self.__invalid_mma_data = None
         self.__pending_mma_data = None
         self.__last_compile_result = None
+        self.__set_song_data(SongData([BarInfo()], [], 0))
 
-    def __do_compile(self, mma_data):
-        res = self.__last_compile_result = self.__midi_generator.check_mma_syntax(mma_data)
-        if res == 0:
-            mma_file = cStringIO.StringIO(mma_data)
-            try:
-                self.__song_data = parse(mma_file)
-            except ValueError:
-                logging.exception("Failed to parse the file.")
-                res = -1
-            mma_file.close()
-        if res > 0 or res == -1:
-            self.__clear_song()
-            self.__invalid_mma_data = mma_data
-            self.__song_data.set_save_needed(True)
-        else:
-            self.__invalid_mma_data = None
-        return res
+    def __set_song_data(self, song_data):
+        self.__song_data = song_data
+        song_data.set_change_listener(self.__changed)
+        self.__replaced()
+
+    def __replaced(self):
+        self.__generation += 1
+        self.__changed()
+
+    def __changed(self):
+        for listener in self.__change_listeners:
+            listener()
 
     def __do_write_to_file(self, file_name, data):
         logging.info('Opening output file %s', file_name)
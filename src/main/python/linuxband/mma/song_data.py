@@ -17,7 +17,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import copy
 import logging
 
 from linuxband.glob import Glob
@@ -38,6 +37,8 @@ class SongData(object):
         self.__bar_count = bar_count
         self.__beats_per_bar = 4  # TODO Beats/bar, set with TIME
         self.__save_needed = False
+        self.__revision = 0
+        self.__change_listener = None
         for bar_info in self.__bar_info:
             bar_info.set_song_data(self)
         for bar_chord in self.__bar_chords:
@@ -46,6 +47,9 @@ class SongData(object):
     def get_bar_info_all(self):
         return self.__bar_info
 
+    def get_bar_chords_all(self):
+        return self.__bar_chords
+
     def get_bar_count(self):
         return self.__bar_count
 
@@ -53,20 +57,22 @@ class SongData(object):
         return self.__beats_per_bar
 
     def set_bar_info(self, bar_num, bar_info):
-        self.__bar_info[bar_num] = copy.deepcopy(bar_info)
-        self.__save_needed = True
+        bar_info = self.__bar_info[bar_num] = bar_info.copy()
+        bar_info.set_song_data(self)
+        self.__modified()
 
     def get_bar_info(self, bar_num):
         return self.__bar_info[bar_num]
 
     def set_bar_chords(self, bar_num, bar_chords):
         """ Replaces chords in the bar and fixes the bar number. """
-        bar_chords = self.__bar_chords[bar_num] = copy.deepcopy(bar_chords)
+        bar_chords = self.__bar_chords[bar_num] = bar_chords.copy()
+        bar_chords.set_song_data(self)
         if bar_num > 0:
             prev = self.__bar_chords[bar_num - 1].get_number()
             if prev:
                 bar_chords.set_number(prev + 1)
-        self.__save_needed = True
+        self.__modified()
 
     def get_bar_chords(self, bar_num):
         return self.__bar_chords[bar_num]
@@ -79,7 +85,15 @@ class SongData(object):
 
     def changed(self):
         logging.debug('Song changed')
-        self.__save_needed = True
+        self.__modified()
+
+    def get_revision(self):
+        """ Number of changes made to the song data, used to detect outdated compilations. """
+        return self.__revision
+
+    def set_change_listener(self, listener):
+        """ The listener is called without arguments whenever the song data change. """
+        self.__change_listener = listener
 
     def create_bar_info(self):
         bar_info = BarInfo()
@@ -113,7 +127,7 @@ class SongData(object):
                 bar_info.pop()
                 self.__bar_count -= 1
                 i = i + 1
-        self.__save_needed = True
+        self.__modified()
 
     def get_title(self):
         lines = self.__bar_info[0].get_lines()
@@ -129,12 +143,11 @@ class SongData(object):
         # get first line
         lines = bar_info.get_lines()
         if len(lines) == 0 or lines[0][0] != Glob.A_REMARK:
-            line = [Glob.A_REMARK, ""]
-            bar_info.insert_line(line)
+            bar_info.insert_line([Glob.A_REMARK, "// " + title + "\n"])
         else:
-            line = lines[0]
-        line[-1] = "// " + title + "\n"
-        self.__save_needed = True
+            # the line may be shared with a copy of the bar
+            bar_info.replace_line(lines[0], lines[0][:-1] + ["// " + title + "\n"])
+        self.__modified()
 
     def write_to_string(self):
         mma_array = []
@@ -144,27 +157,39 @@ class SongData(object):
         mma_array.extend(self.__bar_info[self.__bar_count].get_as_string_list())
         return ''.join(mma_array)
 
-    def write_to_string_with_midi_marks(self):
+    def write_to_string_with_midi_marks(self, bars=None):
         """
         Write the mma file which will be compiled by mma and played in midi player.
 
         We use macros to wrap chords. It allows the tracking of which bar is played.
+
+        If bars (the first and the last bar number) are given, only those bars are written.
+        The bar info of the preceding bars is kept so that the groove, tempo and other settings
+        are in effect at the first bar. Their chords are replaced by empty lines to keep the line
+        numbers. Repetitions are left out as the player plays every selected bar once,
+        unless the bars cover the whole song.
         """
+        first, last = self.__get_bar_range(bars)
+        without_repeats = first > 0 or last < self.__bar_count - 1
         mma_array = []
         # write header with macro definitions
-        for i in range(0, self.__bar_count):
+        for i in range(first, last + 1):
             mma_array.extend("MSet MacroBar%i\n" % i)
             mma_array.extend("MidiMark BAR%i\n" % i)
             mma_array.extend("MidiMark $_LineNum\n")
             mma_array.extend(self.__bar_chords[i].get_as_string_list())
-            if i == self.__bar_count - 1:
+            if i == last:
                 mma_array.extend("MidiMark END\n")
             mma_array.extend("MSetEnd\n")  # 5 lines
         # write the song
-        for i in range(0, self.__bar_count):
-            mma_array.extend(self.__bar_info[i].get_as_string_list())
+        for i in range(0, first):
+            mma_array.extend(self.__bar_info[i].get_as_string_list(without_repeats))
+            mma_array.extend("\n")
+        for i in range(first, last + 1):
+            mma_array.extend(self.__bar_info[i].get_as_string_list(without_repeats))
             mma_array.extend("$MacroBar%i\n" % i)
-        mma_array.extend(self.__bar_info[self.__bar_count].get_as_string_list())
+        if last == self.__bar_count - 1:
+            mma_array.extend(self.__bar_info[self.__bar_count].get_as_string_list(without_repeats))
         return ''.join(mma_array)
 
     def write_tokens_debug(self):
@@ -174,5 +199,18 @@ class SongData(object):
             self.__bar_chords[i].show_debug()
         self.__bar_info[self.__bar_count].show_debug()
 
-    def get_mma_line_offset(self):
-        return self.__bar_count * SongData.__LINES_PER_BAR + SongData.__LINES_ADD
+    def get_mma_line_offset(self, bars=None):
+        first, last = self.__get_bar_range(bars)
+        return (last - first + 1) * SongData.__LINES_PER_BAR + SongData.__LINES_ADD
+
+    def __get_bar_range(self, bars):
+        """ The first and the last bar to be written, the whole song if bars are out of the song. """
+        if bars is None or bars[0] > bars[1] or bars[0] < 0 or bars[1] >= self.__bar_count:
+            return 0, self.__bar_count - 1
+        return bars
+
+    def __modified(self):
+        self.__save_needed = True
+        self.__revision += 1
+        if self.__change_listener:
+            self.__change_listener()
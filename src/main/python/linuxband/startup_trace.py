@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import __builtin__
+import logging
+import sys
+import time
+
+
+class StartupTrace(object):
+    """
+    Records the wall clock time of the startup phases and of the module imports.
+
+    Enabled by the --trace-startup command line option. The end of each phase is
+    marked by calling phase(), finish() stops tracing and logs the report.
+    """
+
+    # imports faster than that are not reported (s)
+    __MIN_IMPORT_TIME = 0.005
+    # nested imports are reported up to this depth
+    __MAX_IMPORT_DEPTH = 2
+
+    __enabled = False
+    __start = 0
+    __last = 0
+    __phases = []
+    __imports = []
+    __import_depth = 0
+    __original_import = None
+
+    @staticmethod
+    def enable(trace_imports=True):
+        StartupTrace.__enabled = True
+        StartupTrace.__start = StartupTrace.__last = time.time()
+        StartupTrace.__phases = []
+        StartupTrace.__imports = []
+        if trace_imports and StartupTrace.__original_import is None:
+            StartupTrace.__original_import = __builtin__.__import__
+            __builtin__.__import__ = StartupTrace.__traced_import
+
+    @staticmethod
+    def is_enabled():
+        return StartupTrace.__enabled
+
+    @staticmethod
+    def phase(name):
+        """ Mark the end of the phase started by the previous call. """
+        if not StartupTrace.__enabled: return
+        now = time.time()
+        StartupTrace.__phases.append((name, now - StartupTrace.__last))
+        StartupTrace.__last = now
+
+    @staticmethod
+    def get_phases():
+        """ List of (phase name, duration in seconds). """
+        return list(StartupTrace.__phases)
+
+    @staticmethod
+    def get_total():
+        return StartupTrace.__last - StartupTrace.__start
+
+    @staticmethod
+    def finish():
+        """ Stop tracing, log the report and return it. """
+        if not StartupTrace.__enabled: return ''
+        StartupTrace.__enabled = False
+        if StartupTrace.__original_import is not None:
+            __builtin__.__import__ = StartupTrace.__original_import
+            StartupTrace.__original_import = None
+        report = StartupTrace.get_report()
+        for line in report.splitlines():
+            logging.info(line)
+        return report
+
+    @staticmethod
+    def get_report():
+        lines = ["Startup trace, total %.3f s" % StartupTrace.get_total()]
+        for name, duration in StartupTrace.__phases:
+            lines.append("  %-30s %8.3f s" % (name, duration))
+        if StartupTrace.__imports:
+            lines.append("Slowest imports")
+            for depth, name, duration in StartupTrace.__imports:
+                lines.append("  %-30s %8.3f s" % ('  ' * depth + name, duration))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def __traced_import(name, *args, **kwargs):
+        original_import = StartupTrace.__original_import
+        if name in sys.modules or original_import is None:
+            return (original_import or __builtin__.__import__)(name, *args, **kwargs)
+        depth = StartupTrace.__import_depth
+        imports = StartupTrace.__imports
+        position = len(imports)
+        StartupTrace.__import_depth = depth + 1
+        start = time.time()
+        try:
+            return original_import(name, *args, **kwargs)
+        finally:
+            duration = time.time() - start
+            StartupTrace.__import_depth = depth
+            if depth <= StartupTrace.__MAX_IMPORT_DEPTH and duration >= StartupTrace.__MIN_IMPORT_TIME:
+                # keep the nested imports after their parent
+                imports.insert(position, (depth, name, duration))
@@ -0,0 +1,96 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from linuxband.midi.mma2smf import MidiGenerator
+
+# stands for the mma program, never writes midi data and fails on the songs containing ERROR
+FAKE_MMA = """#!%s
+import sys
+data = sys.stdin.read()
+sys.stdout.write('runs\\n')
+open(sys.argv[0] + '.runs', 'a').write('%%s\\n' %% ' '.join(sys.argv[2:]))
+if 'ERROR' in data:
+    sys.stdout.write('ERROR:<Line 3><File:/proc/self/fd/0>\\n')
+    sys.exit(1)
+"""
+
+
+class FakeConfig(object):
+
+    def __init__(self, mma_path):
+        self.mma_path = mma_path
+
+    def get_mma_path(self):
+        return self.mma_path
+
+    def get_mma_grooves_path(self):
+        return os.path.dirname(self.mma_path)
+
+    def get_mma_worker(self):
+        return False
+
+
+class TestMidiGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.mma_path = os.path.join(self.dir, 'mma')
+        outfile = file(self.mma_path, 'w')
+        try:
+            outfile.write(FAKE_MMA % sys.executable)
+        finally:
+            outfile.close()
+        os.chmod(self.mma_path, 0755)
+        self.generator = MidiGenerator(FakeConfig(self.mma_path))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_error_located_by_one_run(self):
+        start = time.time()
+        self.assertEqual(self.generator.generate_smf('1 C\n2 G\n3 ERROR\n'), (3, ''))
+        # MMA exits without opening the midi pipe, its exit is noticed at once
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(self.__get_runs(), ['-f'])
+
+    def test_no_midi_output(self):
+        start = time.time()
+        self.assertEqual(self.generator.generate_smf('1 C\n'), (-2, ''))
+        self.assertTrue(time.time() - start < 1)
+
+    def test_check_mma_syntax(self):
+        self.assertEqual(self.generator.check_mma_syntax('1 C\n2 G\n3 ERROR\n'), 3)
+        self.assertEqual(self.generator.check_mma_syntax('1 C\n'), 0)
+        self.assertEqual(self.__get_runs(), ['-n', '-n'])
+
+    def __get_runs(self):
+        """ The options of the fake mma runs. """
+        infile = file(self.mma_path + '.runs', 'r')
+        try:
+            return [line.split()[0] for line in infile]
+        finally:
+            infile.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
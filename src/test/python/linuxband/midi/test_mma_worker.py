@@ -0,0 +1,137 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from linuxband.midi.mma_worker import MmaWorker
+
+# stands for the MMA program, writes its pid and hangs on the songs containing SLEEP
+FAKE_MMA_MAIN = """
+import os, sys, time
+data = open(sys.argv[1]).read()
+if 'SLEEP' in data:
+    open(os.path.join(os.path.dirname(sys.argv[0]), 'mma.pid'), 'w').write(str(os.getpid()))
+    time.sleep(30)
+if '-f' in sys.argv:
+    open(sys.argv[sys.argv.index('-f') + 1], 'wb').write('MThd' + data)
+"""
+
+
+class TestMmaWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.mma_path = os.path.join(self.dir, 'mma')
+        self.__write_file(self.mma_path, '#!%s\n' % sys.executable)
+        os.mkdir(os.path.join(self.dir, 'MMA'))
+        self.__write_file(os.path.join(self.dir, 'MMA', '__init__.py'), '')
+        self.__write_file(os.path.join(self.dir, 'MMA', 'main.py'), FAKE_MMA_MAIN)
+        # the worker creates its temporary directories here
+        self.tmp_dir = os.path.join(self.dir, 'tmp')
+        os.mkdir(self.tmp_dir)
+        self.tmpdir_env = os.environ.get('TMPDIR')
+        os.environ['TMPDIR'] = self.tmp_dir
+        self.worker = MmaWorker(self.mma_path)
+
+    def tearDown(self):
+        self.worker.shutdown()
+        if self.tmpdir_env is None:
+            del os.environ['TMPDIR']
+        else:
+            os.environ['TMPDIR'] = self.tmpdir_env
+        shutil.rmtree(self.dir)
+
+    def test_generate(self):
+        self.assertEqual(self.worker.run('1 C\n', False), (0, '', 'MThd1 C\n'))
+        self.assertEqual(self.worker.run('1 G\n', True), (0, '', ''))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_cancel(self):
+        self.assertEqual(self.worker.run('1 C\n', False)[0], 0)
+        thread = threading.Thread(target=self.__cancel_when_running)
+        thread.start()
+        try:
+            reply = self.worker.run('SLEEP\n', False)
+        finally:
+            thread.join()
+        self.assertEqual(reply[0], -signal.SIGTERM)
+        # the MMA child is killed and the temporary files removed
+        self.assertFalse(self.__is_running(self.mma_pid))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+        # a new worker is started for the next song
+        self.assertEqual(self.worker.run('1 C\n', False), (0, '', 'MThd1 C\n'))
+
+    def test_shutdown_while_running(self):
+        thread = threading.Thread(target=self.worker.run, args=('SLEEP\n', False))
+        thread.setDaemon(True)
+        thread.start()
+        self.__wait_for_mma_pid()
+        self.worker.cancel()
+        thread.join()
+        self.worker.shutdown()
+        self.assertFalse(self.__is_running(self.mma_pid))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def __cancel_when_running(self):
+        self.__wait_for_mma_pid()
+        self.worker.cancel()
+
+    def __wait_for_mma_pid(self):
+        pid_file = os.path.join(self.dir, 'mma.pid')
+        deadline = time.time() + 10
+        while not os.path.exists(pid_file) or not os.path.getsize(pid_file):
+            self.assertTrue(time.time() < deadline)
+            time.sleep(0.01)
+        infile = file(pid_file, 'r')
+        try:
+            self.mma_pid = int(infile.read())
+        finally:
+            infile.close()
+
+    def __is_running(self, pid):
+        """ The killed process may still wait to be reaped by init. """
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            try:
+                os.kill(pid, 0)
+            except OSError:
+                return False
+            stat = file('/proc/%i/stat' % pid, 'r')
+            try:
+                if stat.read().split(')')[-1].split()[0] == 'Z':
+                    return False
+            finally:
+                stat.close()
+            time.sleep(0.01)
+        return True
+
+    def __write_file(self, file_name, data):
+        outfile = file(file_name, 'w')
+        try:
+            outfile.write(data)
+        finally:
+            outfile.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+from linuxband.midi.smf_cache import SmfCache
+
+
+class FakeConfig(object):
+
+    def __init__(self, mma_path, grooves_path):
+        self.mma_path = mma_path
+        self.grooves_path = grooves_path
+
+    def get_mma_path(self):
+        return self.mma_path
+
+    def get_mma_grooves_path(self):
+        return self.grooves_path
+
+
+class TestSmfCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # mma/bin/mma, mma/lib/stdlib/*.mma and mma/includes/*.mma
+        self.grooves_path = self.__make_dir('lib', 'stdlib')
+        self.include_path = self.__make_dir('includes')
+        self.mma_path = os.path.join(self.__make_dir('bin'), 'mma')
+        self.__write_file(self.mma_path, '#!/usr/bin/python\n')
+        self.__write_file(os.path.join(self.grooves_path, 'swing.mma'), 'DefGroove Swing\n')
+        self.config = FakeConfig(self.mma_path, self.grooves_path)
+        self.cache_dir = os.path.join(self.dir, 'smf-cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_put(self):
+        cache = SmfCache(self.config, self.cache_dir)
+        self.assertEqual(cache.get('1 C\n'), None)
+        cache.put('1 C\n', 'MThd C')
+        cache.put('1 G\n', 'MThd G')
+        self.assertEqual(cache.get('1 C\n'), 'MThd C')
+        self.assertEqual(cache.get('1 G\n'), 'MThd G')
+        # a new session finds the midi data too
+        self.assertEqual(SmfCache(self.config, self.cache_dir).get('1 C\n'), 'MThd C')
+
+    def test_key_depends_on_mma(self):
+        cache = SmfCache(self.config, self.cache_dir)
+        cache.put('1 C\n', 'MThd C')
+        # the groove library is scanned again when the grooves are reloaded from another path
+        other_grooves_path = self.__make_dir('lib', 'other')
+        self.config.grooves_path = other_grooves_path
+        self.assertEqual(cache.get('1 C\n'), None)
+        self.config.grooves_path = self.grooves_path
+        self.assertEqual(cache.get('1 C\n'), 'MThd C')
+        # the program and the groove library are not scanned again in the same session
+        self.__write_file(os.path.join(self.grooves_path, 'swing.mma'), 'DefGroove Swing\nDefGroove SwingSus\n')
+        self.__write_file(self.mma_path, '#!/usr/bin/python\n# new version\n')
+        self.assertEqual(cache.get('1 C\n'), 'MThd C')
+        self.assertEqual(SmfCache(self.config, self.cache_dir).get('1 C\n'), None)
+
+    def test_key_depends_on_included_files(self):
+        include_file = os.path.join(self.include_path, 'intro.mma')
+        self.__write_file(include_file, '1 C\n')
+        cache = SmfCache(self.config, self.cache_dir)
+        mma_data = 'Tempo 120\n  include intro\n2 G\n'
+        cache.put(mma_data, 'MThd intro')
+        self.assertEqual(cache.get(mma_data), 'MThd intro')
+        self.__write_file(include_file, '1 C\n2 F\n')
+        self.assertEqual(cache.get(mma_data), None)
+        os.remove(include_file)
+        self.assertEqual(cache.get(mma_data), None)
+
+    def test_least_recently_used_files_removed(self):
+        cache = SmfCache(self.config, self.cache_dir, 2500)
+        cache.put('1 C\n', 'C' * 1000)
+        cache.put('1 G\n', 'G' * 1000)
+        self.__set_mtime('1 C\n', 1000)
+        self.__set_mtime('1 G\n', 2000)
+        # reading marks the file as recently used
+        self.assertEqual(cache.get('1 C\n'), 'C' * 1000)
+        cache.put('1 F\n', 'F' * 1000)
+        self.assertEqual(cache.get('1 G\n'), None)
+        self.assertEqual(cache.get('1 C\n'), 'C' * 1000)
+        self.assertEqual(cache.get('1 F\n'), 'F' * 1000)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def __set_mtime(self, mma_data, mtime):
+        """ Backdate the cache file of mma_data, the only .mid file with the given content. """
+        cache = SmfCache(self.config, self.cache_dir)
+        midi_data = cache.get(mma_data)
+        for name in os.listdir(self.cache_dir):
+            full_name = os.path.join(self.cache_dir, name)
+            infile = file(full_name, 'rb')
+            try:
+                found = infile.read() == midi_data
+            finally:
+                infile.close()
+            if found:
+                os.utime(full_name, (mtime, mtime))
+
+    def __make_dir(self, *names):
+        dirname = os.path.join(self.dir, 'mma', *names)
+        os.makedirs(dirname)
+        return dirname
+
+    def __write_file(self, file_name, data):
+        outfile = file(file_name, 'w')
+        try:
+            outfile.write(data)
+        finally:
+            outfile.close()
+
+
+if __name__ == '__main__':
+    # When this module is executed from the command-line, run all its tests
+    unittest.main()
@@ -0,0 +1,68 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from linuxband.glob import Glob
+from linuxband.mma.bar_info import BarInfo
+from linuxband.mma.song_data import SongData
+
+
+class TestBarInfo(unittest.TestCase):
+
+    def setUp(self):
+        self.__bar_info = BarInfo()
+        self.__song_data = SongData([ self.__bar_info ], [], 0)
+        self.__groove = BarInfo.create_event(Glob.A_GROOVE)
+        self.__tempo = BarInfo.create_event(Glob.A_TEMPO)
+        self.__bar_info.add_event(self.__groove)
+        self.__bar_info.add_event(self.__tempo)
+
+    def test_copy_on_write(self):
+        bar_info = self.__bar_info
+        copied = bar_info.copy()
+        assert copied.get_lines() is bar_info.get_lines()
+        # changing the copy leaves the original alone
+        repeat = BarInfo.create_event(Glob.A_REPEAT)
+        copied.add_event(repeat)
+        copied.move_event_backwards(self.__tempo)
+        assert copied.get_events() == [self.__tempo, self.__groove, repeat]
+        assert bar_info.get_events() == [self.__groove, self.__tempo]
+        assert bar_info.get_lines() == [self.__groove, self.__tempo]
+        # and the other way round
+        bar_info.remove_event(self.__groove)
+        assert bar_info.get_events() == [self.__tempo]
+        assert copied.get_events() == [self.__tempo, self.__groove, repeat]
+
+    def test_set_bar_info(self):
+        other = SongData([ BarInfo() ], [], 0)
+        other.set_bar_info(0, self.__bar_info)
+        pasted = other.get_bar_info(0)
+        assert pasted is not self.__bar_info
+        pasted.remove_event(self.__tempo)
+        assert other.get_revision() == 2
+        assert self.__bar_info.get_events() == [self.__groove, self.__tempo]
+
+    def test_set_title_leaves_copy_alone(self):
+        self.__song_data.set_title('Old')
+        copied = self.__bar_info.copy()
+        self.__song_data.set_title('New')
+        assert copied.get_lines()[0] == [Glob.A_REMARK, '// Old\n']
+        assert self.__bar_info.get_lines()[0] == [Glob.A_REMARK, '// New\n']
+        assert self.__bar_info.get_lines()[0] is not copied.get_lines()[0]
+
+if __name__ == '__main__':
+    unittest.main()
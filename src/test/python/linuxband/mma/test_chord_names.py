@@ -0,0 +1,42 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import cStringIO
+
+import unittest
+from linuxband.mma.chord_names import ChordNames
+from linuxband.mma.chord_table import chordlist
+
+
+class TestChordNames(unittest.TestCase):
+
+    def test_names(self):
+        names = ChordNames.get_names()
+        self.assertEqual(list(names), sorted(names))
+        self.assertEqual(len(names), 21 * len(chordlist))
+        self.assertTrue(ChordNames.get_names() is names)
+
+    def test_find_prefix(self):
+        names = ChordNames.get_names()
+        for prefix in ['', 'C', 'Cm', 'C#', 'Bbm7', 'G7(', 'Ab13', 'H', 'Cxyz']:
+            start, end = ChordNames.find_prefix(prefix)
+            expected = [name for name in names if name.startswith(prefix)]
+            self.assertEqual(list(names[start:end]), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import cStringIO
+
+import unittest
+from linuxband.mma.chord_parser import ChordParser
+
+
+class TestChordParser(unittest.TestCase):
+
+    def test_valid(self):
+        self.assertEqual(ChordParser.parse('C'), ('C', 'M', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('F#m7b5'), ('F#', 'm7b5', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('Bbmaj7/D'), ('Bb', 'M7', 'D', 0, None, None))
+        self.assertEqual(ChordParser.parse('E&7>1@2.5'), ('E&', '7', None, 1, 2.5, None))
+        self.assertEqual(ChordParser.parse('Am6zC@3'), ('A', 'm6', None, 0, 3.0, 'zC'))
+        self.assertEqual(ChordParser.parse('z!'), (None, None, None, 0, None, 'z!'))
+        self.assertEqual(ChordParser.parse('/'), (None, None, None, 0, None, None))
+
+    def test_roman_numerals(self):
+        self.assertEqual(ChordParser.parse('I'), ('I', 'M', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('IV7'), ('IV', '7', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('bVII'), ('bVII', 'M', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('ii'), ('ii', 'm', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('ii7@3'), ('ii', 'm7', None, 0, 3.0, None))
+        self.assertEqual(ChordParser.parse('#ivm7b5'), ('#iv', 'm7b5', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('viio7'), ('vii', 'dim7', None, 0, None, None))
+        self.assertEqual(ChordParser.parse('V7/vii'), ('V', '7', 'vii', 0, None, None))
+
+    def test_invalid(self):
+        for chord in ['H7', 'Cxyz', 'C/X', 'C>a', 'C@0', 'C@x', 'Cz!', 'CzQ', '', 'm7', 'VIII', 'IIx', 'bb']:
+            self.assertRaises(ValueError, ChordParser.parse, chord)
+        self.assertEqual(ChordParser.get_error('C7'), None)
+        self.assertEqual(ChordParser.get_error('Cxy'), "Unknown chord type 'xy'")
+        # the error is remembered too
+        self.assertEqual(ChordParser.get_error('Cxy'), "Unknown chord type 'xy'")
+
+    def test_memo_size(self):
+        for i in range(0, 3000):
+            ChordParser.parse('C@%d' % (i + 1))
+        self.assertEqual(ChordParser.parse('C@1'), ('C', 'M', None, 0, 1.0, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+from linuxband.mma.groove_index import GrooveIndex
+
+GROOVE_FILES = {
+    '/lib/march.mma': ((1000.5, 120), [
+        ['March', 'Marching.', 'Basic march.', 'Bob', '4', '/lib/march.mma'],
+        ['MarchEnd', 'Marching.', 'Ending.', 'Bob', '4', '/lib/march.mma']]),
+    '/lib/milintro.mma': ((2000.25, 80), [
+        ['MilIntro2', 'Intro.', 'Two bars.', 'Bob', '4', '/lib/milintro.mma']]),
+    '/lib/swing.mma': ((3000.0, 200), [
+        ['Swing', 'Swinging.', 'Basic swing, no sustained chords.', 'Al', '4', '/lib/swing.mma'],
+        ['SwingSus', 'Swinging.', 'Sustained.', 'Al', '4', '/lib/swing.mma']]),
+    '/lib/empty.mma': ((4000.0, 0), []),
+}
+
+
+class TestGrooveIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.dir, 'grooves.index')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        GrooveIndex.write(self.file_name, GROOVE_FILES)
+        index = GrooveIndex(self.file_name)
+        try:
+            self.assertEqual(index.get_row_count(), 5)
+            self.assertEqual(index.get_grooves_by_file(), GROOVE_FILES)
+            self.assertEqual(index.get_file_stamps()['/lib/swing.mma'], (3000.0, 200))
+            for row_num in range(0, index.get_row_count()):
+                row = index.get_row(row_num)
+                self.assertEqual([index.get_row_value(row_num, column) for column in range(0, 6)], row)
+        finally:
+            index.close()
+
+    def test_families(self):
+        GrooveIndex.write(self.file_name, GROOVE_FILES)
+        index = GrooveIndex(self.file_name)
+        try:
+            families = []
+            for i in range(0, index.get_family_count()):
+                variations = [index.get_row(index.get_variation(i, j))[0]
+                              for j in range(0, index.get_variation_count(i))]
+                families.append((index.get_row(index.get_family(i))[0], variations))
+            # MilIntro grooves belong to the March family
+            self.assertEqual(families, [('March', ['MarchEnd', 'MilIntro2']), ('Swing', ['SwingSus'])])
+        finally:
+            index.close()
+
+    def test_search(self):
+        GrooveIndex.write(self.file_name, GROOVE_FILES)
+        index = GrooveIndex(self.file_name)
+        try:
+            names = lambda text: [index.get_row(row_num)[0] for row_num in index.search(text)]
+            # camel case parts are searchable, name matches rank before description matches
+            self.assertEqual(names('sus'), ['SwingSus', 'Swing'])
+            self.assertEqual(names('Bob INTRO'), ['MilIntro2'])
+            self.assertEqual(names('mar'), ['March', 'MarchEnd'])
+            self.assertEqual(names('waltz'), [])
+            self.assertEqual(names(' '), [])
+        finally:
+            index.close()
+
+    def test_invalid_file(self):
+        f = file(self.file_name, 'wb')
+        f.write('pickled grooves' * 10)
+        f.close()
+        self.assertRaises(ValueError, GrooveIndex, self.file_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
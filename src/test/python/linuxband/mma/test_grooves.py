@@ -0,0 +1,144 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from linuxband.mma import grooves
+from linuxband.mma.groove_index import GrooveIndex
+from linuxband.mma.grooves import Grooves
+
+
+class FakeConfig(object):
+
+    def __init__(self, grooves_path):
+        self.grooves_path = grooves_path
+
+    def get_mma_grooves_path(self):
+        return self.grooves_path
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestGrooves(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.grooves_path = os.path.join(self.dir, 'stdlib')
+        os.mkdir(self.grooves_path)
+        self.index_file = os.path.join(self.dir, 'grooves.index')
+        self.__write_groove_file('swing.mma', 'Swing', 'SwingSus')
+        self.__write_groove_file('waltz.mma', 'Waltz')
+        self.grooves = Grooves(FakeConfig(self.grooves_path), self.index_file)
+        # record the parsed files
+        self.parsed = []
+        self.load_groove_file = grooves.load_groove_file
+        def load_groove_file(full_name):
+            self.parsed.append(os.path.basename(full_name))
+            return self.load_groove_file(full_name)
+        grooves.load_groove_file = load_groove_file
+
+    def tearDown(self):
+        grooves.load_groove_file = self.load_groove_file
+        shutil.rmtree(self.dir)
+
+    def test_only_changed_files_parsed(self):
+        self.grooves.load_grooves(True)
+        self.assertEqual(sorted(self.parsed), ['swing.mma', 'waltz.mma'])
+        self.assertEqual(self.__get_groove_names(), ['Swing', 'SwingSus', 'Waltz'])
+        # nothing changed
+        self.parsed = []
+        self.grooves.load_grooves(True)
+        self.assertEqual(self.parsed, [])
+        # touch one file, add one and remove one
+        swing = os.path.join(self.grooves_path, 'swing.mma')
+        st = os.stat(swing)
+        os.utime(swing, (st.st_atime, st.st_mtime + 10))
+        self.__write_groove_file('tango.mma', 'Tango')
+        os.remove(os.path.join(self.grooves_path, 'waltz.mma'))
+        self.grooves.load_grooves(True)
+        self.assertEqual(sorted(self.parsed), ['swing.mma', 'tango.mma'])
+        self.assertEqual(self.__get_groove_names(), ['Swing', 'SwingSus', 'Tango'])
+        # without the cache all the files are parsed again
+        self.parsed = []
+        self.grooves.load_grooves(False)
+        self.assertEqual(sorted(self.parsed), ['swing.mma', 'tango.mma'])
+        self.assertEqual(self.__get_groove_names(), ['Swing', 'SwingSus', 'Tango'])
+
+    def test_broken_file(self):
+        broken = os.path.join(self.grooves_path, 'broken.mma')
+        outfile = file(broken, 'w')
+        try:
+            outfile.write('Begin Doc\n  Never ends.\n')
+        finally:
+            outfile.close()
+        handler = RecordingHandler()
+        logging.getLogger().addHandler(handler)
+        try:
+            # the function run by the pool processes reports the error instead of logging it
+            file_grooves, error = self.load_groove_file(broken)
+            self.assertEqual(file_grooves, [])
+            self.assertTrue(broken in error)
+            self.assertEqual(handler.records, [])
+            self.grooves.load_grooves(True)
+        finally:
+            logging.getLogger().removeHandler(handler)
+        self.assertEqual(self.__get_groove_names(), ['Swing', 'SwingSus', 'Waltz'])
+        self.assertEqual([record.getMessage() for record in handler.records if record.levelno == logging.ERROR], [error])
+
+    def test_previous_index_closed(self):
+        # the groove window keeps the model of the index until it is shown again
+        models = []
+        for i in range(0, 3): #@UnusedVariable
+            self.grooves.load_grooves(False)
+            models.append(self.grooves.get_grooves_model())
+        maps = file('/proc/self/maps', 'r')
+        try:
+            mapped = [line for line in maps if self.index_file in line]
+        finally:
+            maps.close()
+        self.assertEqual(len(mapped), 1)
+
+    def __get_groove_names(self):
+        index = GrooveIndex(self.index_file)
+        try:
+            return [index.get_row(row_num)[0] for row_num in range(0, index.get_row_count())]
+        finally:
+            index.close()
+
+    def __write_groove_file(self, name, *gnames):
+        outfile = file(os.path.join(self.grooves_path, name), 'w')
+        try:
+            outfile.write('Doc Test grooves.\n')
+            for gname in gnames:
+                outfile.write('DefGroove %s  The %s groove.\n' % (gname, gname))
+        finally:
+            outfile.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
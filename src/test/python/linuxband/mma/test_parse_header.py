@@ -0,0 +1,74 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import cStringIO
+import unittest
+from linuxband.glob import Glob
+from linuxband.mma.parse import parse, parse_header
+
+ACTIONS = Glob.A_DOC, Glob.A_AUTHOR, Glob.A_TIME, Glob.A_DEF_GROOVE
+
+GROOVE = """// Groove library file
+Begin Doc
+  A swing groove, nested
+  Begin
+  End
+  blocks are fine.
+End
+Author Bob \\
+   van der Poel
+Time 4   // four beats
+SeqSize 2
+Drum-Snare Sequence { 1 0 90; \\
+   3 0 90 } \\
+   { 2 0 90 }
+MSet Fill
+  Drum-Snare Off
+MSetEnd
+If Def Fill
+  Chord Off
+EndIf
+$Fill
+DefGroove Swing   Basic swing with \\
+   a walking bass.
+Groove Swing
+Volume mf
+DefGroove SwingSus Sustained.
+"""
+
+
+class TestParseHeader(unittest.TestCase):
+
+    def test_same_as_parse(self):
+        lines = parse_header(cStringIO.StringIO(GROOVE), ACTIONS)
+        expected = [line for line in parse(cStringIO.StringIO(GROOVE)).get_bar_info_all()[0].get_lines()
+                    if line[0] in ACTIONS or line[0] == Glob.A_BEGIN_BLOCK]
+        self.assertEqual(lines, expected)
+        self.assertEqual(len(lines), 5)
+
+    def test_chord_line(self):
+        # a bar number on a line by itself is not a chord line
+        self.assertEqual(parse_header(cStringIO.StringIO(GROOVE + '3\n'), ACTIONS),
+                         parse_header(cStringIO.StringIO(GROOVE), ACTIONS))
+        self.assertEqual(parse_header(cStringIO.StringIO(GROOVE + '3 C\n'), ACTIONS), None)
+
+    def test_unterminated_block(self):
+        self.assertRaises(ValueError, parse_header, cStringIO.StringIO('Begin Doc\n text\n'), ACTIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
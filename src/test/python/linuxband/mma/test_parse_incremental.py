@@ -0,0 +1,133 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import cStringIO
+import unittest
+from linuxband.mma.parse import parse, parse_incremental
+
+SONG = """// Song title
+Groove Swing
+Tempo 120
+1 C  Am  \\
+   F  G  // wrapped
+2 Dm7 / G7 /
+Repeat
+3 C / / /
+Begin Doc
+  Documentation block.
+End
+4 F / G /
+RepeatEnd
+5 C
+// the end
+"""
+
+
+class TestParseIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.__song_data = parse(cStringIO.StringIO(SONG))
+
+    def __assert_same_as_parse(self, mma_data, song_data):
+        expected = parse(cStringIO.StringIO(mma_data))
+        assert song_data.write_to_string() == mma_data
+        assert song_data.get_bar_count() == expected.get_bar_count()
+        for i in range(0, expected.get_bar_count()):
+            assert song_data.get_bar_info(i).get_lines() == expected.get_bar_info(i).get_lines()
+            assert song_data.get_bar_info(i).get_events() == expected.get_bar_info(i).get_events()
+            assert song_data.get_bar_chords(i).get_chords() == expected.get_bar_chords(i).get_chords()
+            assert song_data.get_bar_chords(i).get_number() == expected.get_bar_chords(i).get_number()
+        count = expected.get_bar_count()
+        assert song_data.get_bar_info(count).get_lines() == expected.get_bar_info(count).get_lines()
+
+    def __assert_reused(self, song_data, bar_num):
+        """ The bar was copied from the old song, not parsed again. """
+        bar_info = song_data.get_bar_info(bar_num)
+        old_bar_info = self.__song_data.get_bar_info(bar_num)
+        assert bar_info is not old_bar_info
+        assert bar_info.get_lines() is old_bar_info.get_lines()
+        if bar_num < song_data.get_bar_count():
+            bar_chords = song_data.get_bar_chords(bar_num)
+            old_bar_chords = self.__song_data.get_bar_chords(bar_num)
+            assert bar_chords is not old_bar_chords
+            assert bar_chords.get_chords() == old_bar_chords.get_chords()
+
+    def test_unchanged(self):
+        song_data = parse_incremental(SONG, self.__song_data)
+        self.__assert_same_as_parse(SONG, song_data)
+        for i in range(0, 6):
+            self.__assert_reused(song_data, i)
+
+    def test_chord_changed(self):
+        mma_data = SONG.replace('3 C / / /', '3 Cmaj7 / E7 /')
+        song_data = parse_incremental(mma_data, self.__song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+        self.__assert_reused(song_data, 0)
+        self.__assert_reused(song_data, 1)
+        assert song_data.get_bar_info(2).get_lines() is not self.__song_data.get_bar_info(2).get_lines()
+        self.__assert_reused(song_data, 3)
+        self.__assert_reused(song_data, 4)
+
+    def test_event_inserted_before_reused_bar(self):
+        mma_data = SONG.replace('Begin Doc', 'Tempo 90\nBegin Doc')
+        song_data = parse_incremental(mma_data, self.__song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+        assert song_data.get_bar_info(3).get_tempo() is not None
+        assert song_data.get_bar_chords(3).get_chords() == self.__song_data.get_bar_chords(3).get_chords()
+        self.__assert_reused(song_data, 4)
+
+    def test_reused_bars_stay_in_old_song(self):
+        mma_data = SONG.replace('3 C / / /', '3 Cmaj7 / E7 /')
+        song_data = parse_incremental(mma_data, self.__song_data)
+        revision = song_data.get_revision()
+        old_revision = self.__song_data.get_revision()
+        self.__song_data.get_bar_info(0).add_event(['TEMPO', 'Tempo', ' ', '90', '\n'])
+        assert song_data.get_revision() == revision
+        assert self.__song_data.get_revision() == old_revision + 1
+        assert song_data.get_bar_info(0).get_tempo()[3] == '120'
+        self.__song_data.get_bar_chords(4).set_chord(0, 'G7')
+        assert song_data.get_revision() == revision
+        assert song_data.get_bar_chords(4).get_chords()[0][0] == 'C'
+
+    def test_bars_added_and_removed(self):
+        mma_data = SONG.replace('2 Dm7 / G7 /\n', '2 Dm7 / G7 /\n2a Em\nA7\n')
+        song_data = parse_incremental(mma_data, self.__song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+        mma_data = SONG.replace('2 Dm7 / G7 /\n', '')
+        song_data = parse_incremental(mma_data, self.__song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+
+    def test_unterminated_block(self):
+        # the block opened in the changed region swallows the following bars
+        mma_data = SONG + 'MSetEnd\n'
+        song_data = parse(cStringIO.StringIO(mma_data))
+        mma_data = mma_data.replace('5 C\n', 'MSet Macro\n5 C\n')
+        song_data = parse_incremental(mma_data, song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+        assert song_data.get_bar_count() == 4
+
+    def test_end_changed(self):
+        mma_data = SONG + '6 G7\n'
+        song_data = parse_incremental(mma_data, self.__song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+        mma_data = SONG[:-len('// the end\n')]
+        song_data = parse_incremental(mma_data, self.__song_data)
+        self.__assert_same_as_parse(mma_data, song_data)
+
+if __name__ == '__main__':
+    # When this module is executed from the command-line, run all its tests
+    unittest.main()
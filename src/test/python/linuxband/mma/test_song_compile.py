@@ -0,0 +1,145 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from linuxband.mma.song import Song
+
+SONG = """// Song title
+Tempo 120
+1 C  Am
+2 Dm7 / G7 /
+"""
+
+
+class FakeMidiGenerator(object):
+    """ Stands for MMA, reports an error on the given line. """
+
+    def __init__(self, error_line=0, generate_error=0):
+        self.error_line = error_line
+        self.generate_error = generate_error
+        self.runs = 0
+
+    def check_mma_syntax(self, mma_data):
+        self.runs += 1
+        return self.error_line
+
+    def generate_smf(self, mma_data):
+        self.runs += 1
+        if self.error_line > 0:
+            # the song is preceded by the macros in the data with midi marks
+            return (self.error_line + len(mma_data.splitlines()) - len(SONG.splitlines()), '')
+        if self.error_line or self.generate_error: return (self.generate_error or -2, '')
+        return (0, 'MThd' + mma_data)
+
+
+class TestSongCompile(unittest.TestCase):
+
+    def test_compile(self):
+        song = Song(FakeMidiGenerator())
+        song.load_from_string(SONG)
+        self.assertEqual(song.compile_song(), 0)
+        self.assertEqual(song.get_data().get_bar_count(), 2)
+        self.assertEqual(song.write_to_string(), SONG)
+
+    def test_playback_midi_locates_error(self):
+        generator = FakeMidiGenerator(3)
+        song = Song(generator)
+        song.load_from_string(SONG)
+        res, midi_data = song.get_playback_midi_data()
+        self.assertEqual(res, 3)
+        self.assertEqual(midi_data, '')
+        self.assertEqual(generator.runs, 1)
+        self.assertEqual(song.write_to_string(), SONG)
+
+    def test_mma_data_kept_when_midi_generation_fails(self):
+        generator = FakeMidiGenerator(generate_error=-2)
+        song = Song(generator)
+        song.load_from_string(SONG)
+        res, midi_data = song.get_playback_midi_data()
+        self.assertEqual(res, -2)
+        self.assertEqual(midi_data, '')
+        generator.generate_error = 0
+        res, midi_data = song.get_playback_midi_data()
+        self.assertEqual(res, 0)
+        self.assertEqual(song.get_data().get_bar_count(), 2)
+        self.assertEqual(song.write_to_string(), SONG)
+
+    def test_mma_data_kept_when_mma_fails(self):
+        generator = FakeMidiGenerator(-2, -2)
+        song = Song(generator)
+        song.load_from_string(SONG)
+        self.assertEqual(song.compile_song(), -2)
+        generator.error_line = 0
+        self.assertEqual(song.compile_song(), 0)
+        self.assertEqual(song.get_data().get_bar_count(), 2)
+        self.assertEqual(song.write_to_string(), SONG)
+
+    def test_job_dropped_when_song_changed(self):
+        generator = FakeMidiGenerator()
+        song = Song(generator)
+        song.load_from_string(SONG)
+        song.compile_song()
+        job = song.create_compile_job(True)
+        job.run(generator)
+        song.get_data().get_bar_chords(0).set_chord(1, 'G')
+        self.assertFalse(song.finish_compile_job(job))
+        job = song.create_compile_job(True)
+        job.run(generator)
+        self.assertTrue(song.finish_compile_job(job))
+        self.assertEqual(job.get_result(), 0)
+        self.assertTrue('G' in job.get_midi_data())
+
+    def test_cancelled_job_not_run(self):
+        generator = FakeMidiGenerator()
+        song = Song(generator)
+        song.load_from_string(SONG)
+        job = song.create_compile_job(True)
+        job.cancel()
+        job.run(generator)
+        self.assertEqual(generator.runs, 0)
+        self.assertEqual(job.get_result(), None)
+
+    def test_change_listener(self):
+        generator = FakeMidiGenerator()
+        song = Song(generator)
+        revisions = []
+        song.add_change_listener(lambda: revisions.append(song.get_revision()))
+        song.load_from_string(SONG)
+        song.compile_song()
+        self.assertEqual(len(revisions), 2)
+        song.get_data().get_bar_chords(0).set_chord(1, 'G')
+        self.assertEqual(len(revisions), 3)
+        song.get_data().change_bar_count(3)
+        self.assertEqual(revisions[-1], song.get_revision())
+        # no compilation needed, the song is not replaced
+        count = len(revisions)
+        song.compile_song()
+        self.assertEqual(len(revisions), count)
+
+    def test_no_compilation_needed(self):
+        generator = FakeMidiGenerator()
+        song = Song(generator)
+        song.load_from_string(SONG)
+        song.compile_song()
+        song.get_data().set_save_needed(False)
+        runs = generator.runs
+        self.assertEqual(song.compile_song(), 0)
+        self.assertEqual(generator.runs, runs)
+
+
+if __name__ == '__main__':
+    unittest.main()
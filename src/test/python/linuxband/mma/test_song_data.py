@@ -0,0 +1,83 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import cStringIO
+import unittest
+from linuxband.mma.parse import parse
+
+SONG = """// Title
+Tempo 120
+1 C
+Repeat
+2 G
+RepeatEnd
+3 F
+// end
+"""
+
+
+class TestSongData(unittest.TestCase):
+
+    def setUp(self):
+        self.song_data = parse(cStringIO.StringIO(SONG))
+
+    def __assert_line_numbers(self, bars, first, last):
+        """ The macro of every written bar is on the line of its chords in the song, moved by the offset. """
+        lines = self.song_data.write_to_string_with_midi_marks(bars).splitlines()
+        offset = self.song_data.get_mma_line_offset(bars)
+        song_lines = SONG.splitlines()
+        for i in range(first, last + 1):
+            chords = ''.join(self.song_data.get_bar_chords(i).get_as_string_list()).rstrip('\n')
+            self.assertEqual(lines[song_lines.index(chords) + offset], '$MacroBar%i' % i)
+        self.assertEqual(lines[offset - 2], 'MidiMark END')
+
+    def test_whole_song(self):
+        mma_data = self.song_data.write_to_string_with_midi_marks()
+        self.assertEqual(mma_data, ''.join(
+            ['MSet MacroBar%i\nMidiMark BAR%i\nMidiMark $_LineNum\n%i %s\n' % (i, i, i + 1, chord)
+             + ('MidiMark END\n' if i == 2 else '') + 'MSetEnd\n'
+             for i, chord in enumerate(['C', 'G', 'F'])])
+            + '// Title\nTempo 120\n$MacroBar0\nRepeat\n$MacroBar1\nRepeatEnd\n$MacroBar2\n// end\n')
+        self.assertEqual(self.song_data.get_mma_line_offset(), 16)
+        self.__assert_line_numbers(None, 0, 2)
+        # all the bars selected, the repetitions are played
+        self.assertEqual(self.song_data.write_to_string_with_midi_marks((0, 2)), mma_data)
+        self.assertEqual(self.song_data.get_mma_line_offset((0, 2)), 16)
+
+    def test_bars_at_end(self):
+        mma_data = self.song_data.write_to_string_with_midi_marks((1, 2))
+        self.assertEqual(mma_data.split('MSetEnd\n')[-1],
+                         '// Title\nTempo 120\n\n\n$MacroBar1\n\n$MacroBar2\n// end\n')
+        self.assertEqual(self.song_data.get_mma_line_offset((1, 2)), 11)
+        self.__assert_line_numbers((1, 2), 1, 2)
+
+    def test_bars_in_middle(self):
+        mma_data = self.song_data.write_to_string_with_midi_marks((1, 1))
+        self.assertEqual(mma_data, 'MSet MacroBar1\nMidiMark BAR1\nMidiMark $_LineNum\n2 G\nMidiMark END\nMSetEnd\n'
+                         '// Title\nTempo 120\n\n\n$MacroBar1\n')
+        self.assertEqual(self.song_data.get_mma_line_offset((1, 1)), 6)
+        self.__assert_line_numbers((1, 1), 1, 1)
+
+    def test_bars_out_of_song(self):
+        mma_data = self.song_data.write_to_string_with_midi_marks()
+        self.assertEqual(self.song_data.write_to_string_with_midi_marks((1, 3)), mma_data)
+        self.assertEqual(self.song_data.write_to_string_with_midi_marks((2, 1)), mma_data)
+        self.assertEqual(self.song_data.get_mma_line_offset((1, 3)), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
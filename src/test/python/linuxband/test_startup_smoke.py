@@ -0,0 +1,128 @@
+# Copyright (c) 2012 Ales Nosek <ales.nosek@gmail.com>
+#
+# This file is part of LinuxBand.
+#
+# LinuxBand is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import cStringIO
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from linuxband.startup_trace import StartupTrace
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../../main/config/default.mma')
+
+
+class FakeMidiGenerator(object):
+
+    def check_mma_syntax(self, mma_data):
+        return 0
+
+
+class TestStartupSmoke(unittest.TestCase):
+    """
+    Smoke check of the startup steps which don't need gtk.
+
+    The GUI startup is not covered, run linuxband with --trace-startup to measure it.
+    The steps are compared with reference workloads run in the same process, not with
+    fixed times, so that a slow or loaded machine slows down both. The limits are
+    generous, the test catches regressions like parsing all grooves or importing heavy
+    modules at startup.
+    """
+
+    # limits relative to parsing a song of __REFERENCE_BARS bars
+    LIMITS = {
+        'import song modules': 50,
+        'open template song': 5,
+    }
+    # opening the groove index must take at most this part of decoding all of it
+    INDEX_LIMIT = 0.5
+
+    __REFERENCE_BARS = 400
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_startup_steps(self):
+        index_file = os.path.join(self.dir, 'grooves.index')
+        self.write_groove_index(index_file)
+
+        StartupTrace.enable()
+        from linuxband.mma.chord_table import chordlist #@UnusedImport
+        from linuxband.mma.groove_index import GrooveIndex
+        from linuxband.mma.song import Song
+        StartupTrace.phase('import song modules')
+        song = Song(FakeMidiGenerator())
+        song.load_from_file(TEMPLATE_FILE)
+        self.assertEqual(song.compile_song(), 0)
+        StartupTrace.phase('open template song')
+        index = GrooveIndex(index_file)
+        index.get_file_stamps()
+        for i in range(0, min(index.get_family_count(), 30)):
+            index.get_row(index.get_family(i))
+        index.close()
+        StartupTrace.phase('open groove index')
+        report = StartupTrace.finish()
+        phases = dict(StartupTrace.get_phases())
+
+        reference = self.__measure(self.__parse_song)
+        for name, limit in TestStartupSmoke.LIMITS.items():
+            self.assertTrue(phases[name] <= limit * reference,
+                            "Phase '%s' slower than %d song parses (%.3f s)\n%s" % (name, limit, reference, report))
+        decode_index = self.__measure(lambda: self.__decode_index(index_file))
+        self.assertTrue(phases['open groove index'] <= TestStartupSmoke.INDEX_LIMIT * decode_index,
+                        "Opening the groove index is not faster than decoding it (%.3f s)\n%s" % (decode_index, report))
+
+    def __measure(self, workload):
+        """ The best of three runs, a run may be slowed down by other processes. """
+        durations = []
+        for i in range(0, 3): #@UnusedVariable
+            start = time.time()
+            workload()
+            durations.append(time.time() - start)
+        return min(durations)
+
+    def __parse_song(self):
+        from linuxband.mma.parse import parse
+        mma_data = ''.join(['%i C Am F G7\n' % (i + 1) for i in range(0, TestStartupSmoke.__REFERENCE_BARS)])
+        parse(cStringIO.StringIO(mma_data))
+
+    def __decode_index(self, file_name):
+        """ What the startup did before the grooves were indexed: read all of them. """
+        from linuxband.mma.groove_index import GrooveIndex
+        index = GrooveIndex(file_name)
+        try:
+            index.get_grooves_by_file()
+        finally:
+            index.close()
+
+    def write_groove_index(self, file_name):
+        """ Index of the size of the MMA standard library. """
+        from linuxband.mma.groove_index import GrooveIndex
+        groove_files = {}
+        for i in range(0, 400):
+            path = '/lib/groove%d.mma' % i
+            doc = 'Documentation of groove %d, a rather long text. ' % i * 5
+            rows = [['Groove%dVar%d' % (i, j), doc, 'Variation %d.' % j, 'Author', '4', path] for j in range(0, 8)]
+            groove_files[path] = ((i, 1000), rows)
+        GrooveIndex.write(file_name, groove_files)
+
+
+if __name__ == '__main__':
+    unittest.main()